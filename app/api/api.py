@@ -1,5 +1,8 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.metrics import registry
+from app.api.v1.endpoints import auth, debug
 from app.api.v1.system import dict_type, dict_data
 from app.api.v1.ai import chat_conversation, chat_message, api_key, model, chat_role
 
@@ -10,9 +13,18 @@ api_router = APIRouter()
 async def health_check():
     return {"status": "healthy", "service": "AI Support API"}
 
+# Metrics (Prometheus 文本格式)
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Include routers
 api_router.include_router(auth.router, prefix="/auth", tags=["认证管理"])
 
+# 请求链路追踪（默认不挂载）
+if settings.DEBUG_TRACES_ENABLED:
+    api_router.include_router(debug.router)
+
 # 系统管理路由
 api_router.include_router(dict_type.router, prefix="/system", tags=["系统管理"])
 api_router.include_router(dict_data.router, prefix="/system", tags=["系统管理"])
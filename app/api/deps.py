@@ -6,10 +6,11 @@ from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.tracing import tracer
 from app.core.security import verify_password
 from app.db.session import SessionLocal
-from app.models.user import SystemUser  # 修改这里
-from app.schemas.user_schema import TokenPayload
+from app.schemas.user_schema import TokenPayload, UserPrincipal
+from app.services.user_service import UserService
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
@@ -23,9 +24,13 @@ def get_db() -> Generator:
         db.close()
 
 def get_current_user(
-    db: Session = Depends(get_db),
     token: str = Depends(reusable_oauth2)
-) -> SystemUser:  # 修改这里
+) -> UserPrincipal:
+    """
+    校验令牌并返回当前用户信息
+
+    用户信息按用户ID短时缓存，命中时不访问数据库，也不创建数据库会话。
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=["HS256"]
@@ -36,20 +41,21 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = db.query(SystemUser).filter(SystemUser.id == token_data.sub).first()  # 修改这里
+    with tracer.span("auth.get_principal", user_id=token_data.sub):
+        user = UserService.get_principal(token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 def get_current_active_user(
-    current_user: SystemUser = Depends(get_current_user),  # 修改这里
-) -> SystemUser:  # 修改这里
-    if not current_user.status:
+    current_user: UserPrincipal = Depends(get_current_user),
+) -> UserPrincipal:
+    if not current_user.is_active():
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 def get_current_user_id(
-    current_user: SystemUser = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> int:
     """获取当前用户ID"""
     return current_user.id
\ No newline at end of file
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.deps import get_current_user_id
+from app.core.metrics import CHAT_SSE_DURATION
 from app.services.ai.chat_message import ChatMessageService
+from app.services.ai.chat_stream import ChatStream, StreamResumeExpired, chat_stream_manager
 from app.schemas.ai.chat_message import (
     ChatMessageCreate, ChatMessageUpdate, ChatMessagePageReq, ChatMessageSendReq, ChatMessageSendResp, ChatMessageResp
 )
@@ -11,115 +13,81 @@ from typing import List
 from fastapi.responses import StreamingResponse
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat-message", tags=["AI聊天消息管理"])
 
 @router.post("/send", response_model=ResponseModel[ChatMessageSendResp])
-def send_message(
+async def send_message(
     message_in: ChatMessageSendReq,
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """发送消息并获取AI回复"""
     logger.info(f"/chat-message/send 入参: conversation_id={message_in.conversation_id}, user_id={user_id}, role_id={message_in.role_id}, use_context={message_in.use_context}")
-    resp = ChatMessageService.send_message(db=db, message_in=message_in, user_id=user_id)
+    resp = await ChatMessageService.asend_message(db=db, message_in=message_in, user_id=user_id)
     logger.info(f"/chat-message/send 出参: ok, conversation_id={message_in.conversation_id}")
     return resp
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 禁止反向代理缓冲，保证增量内容即时到达
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*"
+}
+
+async def _sse_events(stream: ChatStream, after_seq: int = 0, endpoint: str = "send"):
+    """将生成事件编码为 SSE，事件 id 为 "<generation_id>:<序号>"，供客户端断线后续传"""
+    start = time.perf_counter()
+    try:
+        async for seq, data in stream.subscribe(after_seq=after_seq):
+            yield f"id: {stream.generation_id}:{seq}\ndata: {json.dumps(data)}\n\n"
+    except StreamResumeExpired:
+        yield f"data: {json.dumps({'error': '续传位置已过期，请重新获取消息', 'type': 'error'})}\n\n"
+    finally:
+        # 包括客户端中途断开的连接
+        CHAT_SSE_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+
+def _sse_response(stream: ChatStream, after_seq: int = 0, endpoint: str = "send") -> StreamingResponse:
+    return StreamingResponse(
+        _sse_events(stream, after_seq, endpoint),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Generation-Id": stream.generation_id}
+    )
+
 @router.post("/send-stream")
-def send_message_stream(
+async def send_message_stream(
     message_in: ChatMessageSendReq,
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """流式发送消息并获取AI回复"""
-    # 检查对话是否存在且属于当前用户
-    from app.crud.ai.chat_conversation import chat_conversation
-    db_conversation = chat_conversation.get(db, id=message_in.conversation_id)
-    if not db_conversation:
+    stream = await ChatMessageService.start_message_stream(db=db, message_in=message_in, user_id=user_id)
+    return _sse_response(stream)
+
+@router.get("/send-stream/resume")
+async def resume_message_stream(
+    last_event_id: str = Header(..., description="最后收到的事件 id，格式为 <generation_id>:<序号>"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """断线后从 Last-Event-ID 之后继续接收流式回复"""
+    generation_id, _, seq = last_event_id.partition(":")
+    if not seq.isdigit():
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="对话不存在"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Last-Event-ID 格式错误"
         )
     
-    if db_conversation.user_id != user_id:
+    stream = chat_stream_manager.get(generation_id)
+    if not stream or stream.user_id != user_id:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="无权限在此对话中发送消息"
-        )
-    
-    # 创建用户消息
-    from app.crud.ai.chat_message import chat_message
-    user_msg = chat_message.create_user_message(
-        db=db,
-        conversation_id=message_in.conversation_id,
-        user_id=user_id,
-        content=message_in.content,
-        model_id=db_conversation.model_id,
-        model=db_conversation.model,
-        role_id=message_in.role_id
-    )
-    
-    def generate_stream():
-        full_response = ""
-        try:
-            from app.services.ai.chat import ChatService
-            # 获取AI回复的完整内容
-            complete_ai_response = ChatService.stream_ai_response(
-                db=db,
-                conversation_id=message_in.conversation_id,
-                user_message=message_in.content,
-                model_id=db_conversation.model_id,
-                system_message=db_conversation.system_message,
-                temperature=db_conversation.temperature,
-                max_tokens=db_conversation.max_tokens,
-                use_context=message_in.use_context,
-                max_contexts=db_conversation.max_contexts
-            )
-            
-            # 将完整的响应拆分成小块进行流式发送
-            chunk_size = 10 # 可以调整这个块大小
-            for i in range(0, len(complete_ai_response), chunk_size):
-                chunk = complete_ai_response[i:i+chunk_size]
-                full_response += chunk # 累积完整的响应
-                # 发送SSE格式的数据
-                yield f"data: {json.dumps({'content': chunk, 'type': 'chunk'})}\n\n"
-            
-        except Exception as e:
-            # 如果AI回复失败，删除用户消息
-            chat_message.remove(db, id=user_msg.id)
-            error_msg = f"AI回复失败: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            yield f"data: {json.dumps({'error': error_msg, 'type': 'error'})}\n\n"
-            return # 退出生成器
-        
-        # 在流式响应结束后，创建AI回复消息
-        ai_msg = chat_message.create_ai_message(
-            db=db,
-            conversation_id=message_in.conversation_id,
-            user_id=user_id,
-            content=full_response,
-            model_id=db_conversation.model_id,
-            model=db_conversation.model,
-            reply_id=user_msg.id,
-            role_id=db_conversation.role_id
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="生成记录不存在或已过期"
         )
-        
-        # 发送完成信号
-        yield f"data: {json.dumps({'content': '', 'type': 'done', 'message_id': ai_msg.id})}\n\n"
-    
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*"
-        }
-    )
+    return _sse_response(stream, after_seq=int(seq), endpoint="resume")
 
 @router.get("/list/{conversation_id}", response_model=ResponseModel[List[ChatMessageResp]])
 def get_message_list(
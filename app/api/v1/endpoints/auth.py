@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.api import deps
 from app.core import security
 from app.services.user_service import UserService
+from app.services.login_info_writer import login_info_writer
 from app.schemas.user_schema import (
     UserLoginRequest, 
     UserRegisterRequest, 
@@ -21,13 +22,12 @@ router = APIRouter()
 @router.post("/login", response_model=LoginResponse)
 async def login(
     login_data: UserLoginRequest,
-    request: Request,
-    db: Session = Depends(deps.get_db)
+    request: Request
 ):
     """用户登录"""
     try:
-        # 验证用户
-        user = UserService.authenticate_user(login_data.username, login_data.password)
+        # 验证用户（查询与密码校验都不在事件循环中执行）
+        user = await UserService.aauthenticate_user(login_data.username, login_data.password)
         
         if not user:
             raise HTTPException(
@@ -38,9 +38,9 @@ async def login(
         # 生成访问令牌
         access_token = security.create_access_token(user.id)
         
-        # 更新登录信息
+        # 更新登录信息（后台批量写入）
         client_ip = request.client.host if request.client else "unknown"
-        UserService.update_login_info(user.id, client_ip)
+        login_info_writer.submit(user.id, client_ip)
         
         # 构建响应数据
         user_response = UserResponse(
@@ -71,13 +71,12 @@ async def login(
 
 @router.post("/register", response_model=RegisterResponse)
 async def register(
-    register_data: UserRegisterRequest,
-    db: Session = Depends(deps.get_db)
+    register_data: UserRegisterRequest
 ):
     """用户注册"""
     try:
         # 创建用户
-        new_user = UserService.create_user(register_data)
+        new_user = await UserService.acreate_user(register_data)
         
         if not new_user:
             raise HTTPException(status_code=400, detail="用户创建失败，用户名可能已存在")
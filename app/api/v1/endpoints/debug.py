@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.api.deps import get_current_user_id
+from app.core.tracing import tracer
+from app.schemas.common.response import ResponseModel
+from typing import List
+
+router = APIRouter(prefix="/debug", tags=["调试"])
+
+@router.get("/traces", response_model=ResponseModel[List[dict]])
+def list_traces(
+    limit: int = Query(20, ge=1, le=200, description="返回数量"),
+    min_duration_ms: float = Query(0, ge=0, description="最小耗时（毫秒）"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """最近请求中耗时最长的若干个，包含完整的 span 树"""
+    traces = tracer.buffer.slowest(limit=limit, min_duration_ms=min_duration_ms)
+    return ResponseModel(data=[trace.to_dict() for trace in traces])
+
+@router.get("/traces/{trace_id}", response_model=ResponseModel[dict])
+def get_trace(
+    trace_id: str,
+    user_id: int = Depends(get_current_user_id)
+):
+    """按 trace id（响应头 X-Trace-Id）查看单个请求"""
+    trace = tracer.buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="trace 不存在或已被淘汰")
+    return ResponseModel(data=trace.to_dict())
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.services.system.dict_data import DictDataService
@@ -6,7 +6,8 @@ from app.schemas.system.dict_data import (
     DictDataCreate, DictDataUpdate, DictDataResp, DictDataPageReq, DictDataSimpleResp
 )
 from app.schemas.common.response import ResponseModel, PageResult
-from typing import List
+from app.utils.http import etag_response
+from typing import Dict, List
 
 router = APIRouter(prefix="/dict-data", tags=["字典数据管理"])
 
@@ -52,11 +53,24 @@ def get_dict_data_page(
 
 @router.get("/simple-list", response_model=ResponseModel[List[DictDataSimpleResp]])
 def get_simple_dict_data_list(
+    request: Request,
     dict_type: str = None,
     db: Session = Depends(get_db)
 ):
-    """获得全部字典数据列表（用于前端缓存）"""
-    return DictDataService.get_dict_data_list(db=db, dict_type=dict_type)
+    """获得全部字典数据列表（用于前端缓存，支持 If-None-Match）"""
+    body, etag = DictDataService.get_dict_data_list(db=db, dict_type=dict_type)
+    return etag_response(request, body, etag)
+
+@router.get("/simple-list-by-types", response_model=ResponseModel[Dict[str, List[DictDataSimpleResp]]])
+def get_simple_dict_data_by_types(
+    request: Request,
+    types: List[str] = Query(..., description="字典类型，可重复传入或以逗号分隔"),
+    db: Session = Depends(get_db)
+):
+    """批量获得多个类型的字典数据，前端启动时一次请求加载全部所需字典（支持 If-None-Match）"""
+    dict_types = [t.strip() for item in types for t in item.split(",") if t.strip()]
+    body, etag = DictDataService.get_dict_data_by_types(db=db, dict_types=dict_types)
+    return etag_response(request, body, etag)
 
 @router.get("/get-by-type-and-value", response_model=ResponseModel[DictDataResp])
 def get_dict_data_by_type_and_value(
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.services.system.dict_type import DictTypeService
 from app.schemas.system.dict_type import (
-    DictTypeCreate, DictTypeUpdate, DictTypeResp, DictTypePageReq
+    DictTypeCreate, DictTypeUpdate, DictTypeResp, DictTypePageReq, DictTypeSimpleResp
 )
 from app.schemas.common.response import ResponseModel, PageResult
+from app.utils.http import etag_response
 from typing import List
 
 router = APIRouter(prefix="/dict-type", tags=["字典类型管理"])
@@ -57,3 +58,12 @@ def get_dict_type_by_type(
 ):
     """根据类型获取字典类型"""
     return DictTypeService.get_dict_type_by_type(db=db, type=type)
+
+@router.get("/simple-list", response_model=ResponseModel[List[DictTypeSimpleResp]])
+def get_simple_dict_type_list(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """获得全部启用的字典类型列表（用于前端缓存，支持 If-None-Match）"""
+    body, etag = DictTypeService.get_simple_dict_type_list(db=db)
+    return etag_response(request, body, etag)
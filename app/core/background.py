@@ -0,0 +1,85 @@
+"""
+后台批量写入
+
+请求只把记录放入有界队列即返回，后台线程每 flush_interval 秒取出队列中的全部记录，交给 write 一次处理，
+不占用请求本身的耗时。线程在第一次提交时启动；stop 时按 flush_on_stop 决定是否处理剩余记录。
+"""
+import logging
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackgroundBatchWriter(ABC, Generic[T]):
+    """后台批量写入器的基类，子类实现 write"""
+
+    # 停止时是否处理队列中剩余的记录
+    flush_on_stop = True
+
+    def __init__(self, name: str, flush_interval: float, max_queue_size: int):
+        self.name = name
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[T]" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _put(self, item: T) -> bool:
+        """放入队列，立即返回；队列已满时返回 False，由调用方决定如何记录"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return False
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self._flush_safely()
+        if self.flush_on_stop:
+            self._flush_safely()
+
+    def _flush_safely(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"{self.name} 写入失败: {str(e)}", exc_info=True)
+
+    def flush(self) -> int:
+        """处理当前队列中的全部记录，返回 write 的结果"""
+        batch: List[T] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return 0
+        return self.write(batch)
+
+    @abstractmethod
+    def write(self, batch: List[T]) -> int:
+        """处理一批记录（按提交顺序），返回写入的数量"""
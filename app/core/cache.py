@@ -0,0 +1,356 @@
+"""
+缓存抽象
+
+业务代码只依赖 Cache / CacheNamespace，底层后端由 CACHE_BACKEND 决定：
+- local：进程内 LRU，适合单 worker 或开发环境，发布/订阅只在本进程内生效；
+- redis：Redis 协议（需要安装 redis 包），多个 worker、多台机器共享同一份缓存，
+  失效消息通过 Redis 发布/订阅广播到所有进程。
+
+命名空间带版本号：CacheNamespace.invalidate_all() 递增版本号即可让整个命名空间失效，
+无需逐个删除键；旧版本的键随 TTL 过期。
+
+缓存是加速手段而不是数据源，后端异常只记录日志并按未命中处理，不影响业务请求。
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 失效消息回调：(命名空间, 键)，键为 None 表示整个命名空间失效
+InvalidateCallback = Callable[[str, Optional[str]], None]
+
+
+class CacheBackend(ABC):
+    """缓存后端接口，键为字符串，值为 bytes"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> None:
+        ...
+
+    @abstractmethod
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class LocalCacheBackend(CacheBackend):
+    """进程内 LRU 缓存"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        # 计数器（命名空间版本号）单独保存、不参与 LRU 淘汰：版本号被淘汰后会回到 0，旧版本的数据重新可见
+        self._counters: Dict[str, int] = {}
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is not None:
+                return str(counter).encode()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._counters.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._counters.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            if key not in self._counters:
+                entry = self._entries.pop(key, None)
+                self._counters[key] = int(entry[0]) if entry is not None else 0
+            self._counters[key] += 1
+            return self._counters[key]
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis 后端，需要安装 redis 包"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis 需要安装 redis 包") from e
+        self._client = redis.Redis.from_url(url)
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._pubsub = None
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*keys)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+    def publish(self, channel: str, message: str) -> None:
+        self._client.publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            callbacks = self._subscribers.get(channel)
+            if callbacks is not None:
+                callbacks.append(callback)
+                return
+            self._subscribers[channel] = [callback]
+            if self._pubsub is None:
+                self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{channel: self._dispatch})
+            if self._listener is None:
+                # 后台线程接收失效消息
+                self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _dispatch(self, message: dict) -> None:
+        channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+        data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                callback(data)
+            except Exception:
+                logger.exception(f"处理缓存失效消息失败: {channel}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener.join(timeout=5)
+                self._listener = None
+            if self._pubsub is not None:
+                self._pubsub.close()
+                self._pubsub = None
+        self._client.close()
+
+
+class CacheNamespace:
+    """带版本号的缓存命名空间"""
+
+    def __init__(self, cache: "Cache", name: str, ttl: Optional[float]):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self._callbacks: List[InvalidateCallback] = []
+        self._lock = threading.Lock()
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.cache.prefix}:{self.name}:__version__"
+
+    def version(self) -> int:
+        """当前版本号；本地记住一段时间，版本变化主要依靠失效消息及时同步"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked_at < self.cache.version_check_interval:
+                return self._version
+        raw = self.cache._call("get", self._version_key)
+        version = int(raw) if raw else 0
+        with self._lock:
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def _key(self, key: str) -> str:
+        return f"{self.cache.prefix}:{self.name}:v{self.version()}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache._call("get", self._key(key))
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.cache._call("set", self._key(key), value, ttl if ttl is not None else self.ttl)
+
+    def get_json(self, key: str) -> Any:
+        raw = self.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set(key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), ttl)
+
+    def get_or_set(self, key: str, loader: Callable[[], bytes], ttl: Optional[float] = None) -> bytes:
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: str) -> None:
+        """删除一个键，并通知其他进程"""
+        self.cache._call("delete", self._key(key))
+        self.cache._publish(self.name, key)
+
+    def invalidate_all(self) -> int:
+        """递增版本号使整个命名空间失效，并通知其他进程"""
+        version = self.cache._call("incr", self._version_key)
+        if version is not None:
+            with self._lock:
+                self._version = version
+                self._version_checked_at = time.monotonic()
+        self.cache._publish(self.name, None, version)
+        return version or 0
+
+    def on_invalidate(self, callback: InvalidateCallback) -> None:
+        """注册失效回调（本进程与其他进程发出的失效都会触发），用于同步进程内的派生数据"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def _handle_invalidation(self, key: Optional[str], version: Optional[int]) -> None:
+        if key is None:
+            with self._lock:
+                if version is None:
+                    self._version = None
+                elif self._version is None or version > self._version:
+                    self._version = version
+                    self._version_checked_at = time.monotonic()
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(self.name, key)
+            except Exception:
+                logger.exception(f"缓存失效回调执行失败: {self.name}")
+
+
+class Cache:
+    """缓存入口"""
+
+    def __init__(self, backend: CacheBackend, prefix: str, default_ttl: Optional[float] = None,
+                 version_check_interval: float = 5.0):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.version_check_interval = version_check_interval
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._subscribed = False
+        self._lock = threading.Lock()
+
+    @property
+    def _channel(self) -> str:
+        return f"{self.prefix}:invalidate"
+
+    def namespace(self, name: str, ttl: Optional[float] = None) -> CacheNamespace:
+        """获取命名空间，同名命名空间只创建一次"""
+        with self._lock:
+            ns = self._namespaces.get(name)
+            if ns is None:
+                ns = CacheNamespace(self, name, ttl if ttl is not None else self.default_ttl)
+                self._namespaces[name] = ns
+            subscribe = not self._subscribed
+            self._subscribed = True
+        if subscribe:
+            self._call("subscribe", self._channel, self._on_message)
+        return ns
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call("get", f"{self.prefix}:{key}")
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._call("set", f"{self.prefix}:{key}", value, ttl if ttl is not None else self.default_ttl)
+
+    def delete(self, key: str) -> None:
+        self._call("delete", f"{self.prefix}:{key}")
+
+    def close(self) -> None:
+        self._call("close")
+
+    def _call(self, method: str, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            logger.warning(f"缓存操作 {method} 失败: {e}")
+            return None
+
+    def _publish(self, namespace: str, key: Optional[str], version: Optional[int] = None) -> None:
+        message = json.dumps({"ns": namespace, "key": key, "version": version})
+        self._call("publish", self._channel, message)
+
+    def _on_message(self, message: str) -> None:
+        try:
+            data = json.loads(message)
+        except ValueError:
+            logger.warning(f"无法解析缓存失效消息: {message!r}")
+            return
+        with self._lock:
+            ns = self._namespaces.get(data.get("ns"))
+        if ns is not None:
+            ns._handle_invalidation(data.get("key"), data.get("version"))
+
+
+def create_cache_backend() -> CacheBackend:
+    """根据配置创建缓存后端"""
+    backend = settings.CACHE_BACKEND.lower()
+    if backend == "redis":
+        logger.info("使用 Redis 缓存后端")
+        return RedisCacheBackend(settings.REDIS_URL)
+    if backend != "local":
+        logger.warning(f"未知的缓存后端 {settings.CACHE_BACKEND}，使用进程内缓存")
+    return LocalCacheBackend(max_size=settings.CACHE_LOCAL_MAX_SIZE)
+
+
+cache = Cache(
+    backend=create_cache_backend(),
+    prefix=settings.CACHE_PREFIX,
+    default_ttl=settings.CACHE_DEFAULT_TTL,
+    version_check_interval=settings.CACHE_VERSION_CHECK_INTERVAL,
+)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -21,6 +21,15 @@ class Settings(BaseSettings):
     # JWT
     SECRET_KEY: str = "your-secret-key"  # 请在生产环境中修改
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # 已认证用户信息的缓存时间（秒），修改密码/状态时立即失效
+    USER_PRINCIPAL_CACHE_TTL: float = 60.0
+    # bcrypt 成本因子：每加 1 单次哈希耗时翻倍，登录吞吐量减半；修改后旧哈希在用户下次登录时自动升级
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    # 密码哈希线程池大小（bcrypt 计算期间释放 GIL），0 表示使用 CPU 核数
+    PASSWORD_HASH_WORKERS: int = 0
+    # 登录信息异步批量写入
+    LOGIN_INFO_FLUSH_INTERVAL: float = 1.0  # 秒
+    LOGIN_INFO_QUEUE_SIZE: int = 10000  # 队列满时丢弃新的登录信息
 
     # AI Model Settings
     # DeepSeek 模型配置
@@ -36,6 +45,83 @@ class Settings(BaseSettings):
     MODEL_API_KEY: str = "your-zhipu-api-key"
     MODEL_BASE_URL: str = "https://open.bigmodel.cn/api/paas/v4"
 
+    # 模型实例缓存的最大数量（LRU 淘汰）
+    MODEL_CACHE_MAX_SIZE: int = 64
+
+    # 模型平台共享 HTTP 连接池
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 60.0  # 空闲长连接保留秒数
+    HTTP_POOL_HTTP2: bool = True  # 需要安装 h2，未安装时自动使用 HTTP/1.1
+    HTTP_DNS_CACHE_TTL: int = 300  # DNS 解析结果缓存秒数，0 表示不缓存
+
+    # 可续传的流式生成
+    CHAT_STREAM_BUFFER_SIZE: int = 4096  # 每次生成保留的事件数量
+    CHAT_STREAM_RESUME_GRACE: float = 30.0  # 客户端全部断开后等待重连的秒数，超时取消生成
+    CHAT_STREAM_RETENTION: float = 60.0  # 生成结束后缓冲区保留的秒数
+    # 流式回复增量持久化：开始即创建消息，按时间/字节阈值批量追加内容
+    CHAT_STREAM_CHECKPOINT: bool = True
+    CHAT_STREAM_CHECKPOINT_INTERVAL: float = 1.0  # 秒
+    CHAT_STREAM_CHECKPOINT_BYTES: int = 2048
+
+    # 进程内的对话上下文缓存（按对话 LRU，由 CRUDChatMessage 写穿更新）
+    CHAT_CONTEXT_CACHE_SIZE: int = 1024  # 缓存的对话数量，0 表示关闭
+    CHAT_CONTEXT_CACHE_DEPTH: int = 50  # 每个对话最多缓存的消息数量
+    CHAT_CONTEXT_CACHE_TTL: float = 300.0  # 秒，限制多 worker 部署时的数据陈旧时间
+    # 按 token 预算组装上下文：在 max_contexts 条以内从最新的消息往前填充，
+    # 不超过 上下文窗口 - 回复预留 - 系统提示 - 当前消息
+    CHAT_TOKENIZER_ENCODING: str = "cl100k_base"  # tiktoken 编码，为空或无法加载时按字符数估算
+    CHAT_TOKENIZER_LOAD_TIMEOUT: float = 10.0  # 启动时等待分词器加载的最长秒数，超时后在后台继续加载
+    CHAT_TOKEN_COUNT_CACHE_SIZE: int = 20000  # 按消息编号缓存 token 数的消息数量，0 表示不缓存
+    CHAT_CONTEXT_REPLY_RESERVE: int = 1024  # 模型未设置 max_tokens 时为回复预留的 token 数
+    MODEL_CONTEXT_WINDOW_DEFAULT: int = 8192
+    # 各模型的上下文窗口，按模型标识的最长前缀匹配
+    MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+        "glm-4": 128000,
+        "deepseek": 65536,
+        "qwen": 32768,
+        "moonshot-v1-8k": 8192,
+        "moonshot-v1-32k": 32768,
+        "moonshot-v1-128k": 131072,
+        "gpt-3.5-turbo": 16385,
+        "gpt-4": 8192,
+        "gpt-4-turbo": 128000,
+        "gpt-4o": 128000,
+    }
+    # 对话摘要记忆（对话或角色开启 summary_memory 时生效）：较早的消息由后台增量合并为摘要，
+    # 提示词为 摘要 + 最近的消息
+    CHAT_SUMMARY_RECENT_MESSAGES: int = 10  # 保留原文、不合并进摘要的最近消息数量
+    CHAT_SUMMARY_BATCH_MESSAGES: int = 10  # 最近消息之外积累到该数量时合并一次，0 表示关闭
+    CHAT_SUMMARY_MAX_TOKENS: int = 800  # 摘要的最大 token 数
+    CHAT_SUMMARY_QUEUE_SIZE: int = 1000  # 等待合并的对话数量，队列满时跳过，下一条回复时重新提交
+    # 流式调用请求平台在最后一个增量中返回用量（stream_options.include_usage），不支持的平台可关闭
+    MODEL_STREAM_USAGE: bool = True
+    # token 用量：按用户/模型/日期汇总，后台批量写入
+    TOKEN_USAGE_FLUSH_INTERVAL: float = 5.0  # 秒
+    TOKEN_USAGE_QUEUE_SIZE: int = 10000  # 队列满时丢弃新的用量记录
+    # 每个用户每天可用的 token 数（输入 + 输出），调用模型前检查，0 表示不限制；
+    # 检查的是调用前的已用量，单次调用可能超出少量
+    TOKEN_DAILY_QUOTA: int = 0
+    TOKEN_DAILY_QUOTA_OVERRIDES: Dict[int, int] = {}  # 按用户覆盖，如 {"1": 2000000}，0 表示不限制
+    # 对话配置快照缓存（对话/角色/模型/API 密钥，写入时失效）
+    CHAT_CONFIG_CACHE_TTL: float = 600.0  # 秒
+
+    # 缓存后端：local 为进程内 LRU；redis 为多 worker/多节点共享（需要安装 redis 包）
+    CACHE_BACKEND: str = "local"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_PREFIX: str = "stu_agent"
+    CACHE_DEFAULT_TTL: float = 300.0  # 秒
+    CACHE_LOCAL_MAX_SIZE: int = 10000  # local 后端最多保存的键数量
+    CACHE_VERSION_CHECK_INTERVAL: float = 5.0  # 命名空间版本号的本地记忆时间（秒），失效消息丢失时的兜底
+
+    # 请求链路追踪：每个请求及其中的数据库语句、模型调用记录为 span，最近的请求保存在内存中
+    TRACING_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 200  # 内存中保留的最近请求数量
+    TRACE_MAX_SPANS: int = 1000  # 单个请求最多记录的 span 数量，超出部分只计数
+    TRACE_EXPORT_FILE: Optional[str] = None  # OTLP JSON 导出文件（每行一个 ExportTraceServiceRequest），为空时不导出
+    # 是否挂载 /api/v1/debug/traces：trace 含 SQL 语句、用户与对话编号，任何登录用户都能查看，只在排查问题时临时开启
+    DEBUG_TRACES_ENABLED: bool = False
+
     class Config:
         env_file = ".env"
         case_sensitive = True
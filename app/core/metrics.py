@@ -0,0 +1,298 @@
+"""
+进程内指标统计，输出 Prometheus 文本格式
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认的耗时分桶（秒），覆盖毫秒级接口到分钟级的模型生成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple[str, ...]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Gauge:
+    """可增可减的瞬时值；设置了 set_function 时在输出时调用函数取值"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """输出时调用 function 取值（仅用于无标签的指标）"""
+        self._function = function
+
+    def get(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    """分桶统计，输出累积的 _bucket、_sum 与 _count"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> (各桶计数（非累积，最后一个为 +Inf）, 总和)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = entry
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """统计代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels) -> int:
+        value = self._values.get(self._key(labels))
+        return sum(value[0]) if value else 0
+
+    def get_sum(self, **labels) -> float:
+        value = self._values.get(self._key(labels))
+        return value[1][0] if value else 0.0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式输出全部指标"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# 流式对话结束状态：completed 正常完成，cancelled 客户端断开，failed 模型调用失败
+CHAT_STREAMS = registry.counter(
+    "ai_chat_streams_total",
+    "Number of /chat-message/send-stream generations by result",
+    ["result"],
+)
+
+# 对话上下文缓存：hit 命中，miss 回源数据库
+CHAT_CONTEXT_CACHE = registry.counter(
+    "ai_chat_context_cache_total",
+    "Number of chat context lookups by result",
+    ["result"],
+)
+
+# 对话配置缓存：part 为 conversation/role/model，result 为 hit 命中、miss 回源数据库
+CHAT_CONFIG_CACHE = registry.counter(
+    "ai_chat_config_cache_total",
+    "Number of chat config lookups by part and result",
+    ["part", "result"],
+)
+
+# 认证用户信息缓存：hit 命中，miss 回源数据库
+AUTH_USER_CACHE = registry.counter(
+    "auth_user_cache_total",
+    "Number of authenticated user lookups by result",
+    ["result"],
+)
+
+# HTTP 请求：route 为路由模板（如 /api/v1/ai/chat-message/send），未匹配路由的请求记为 unmatched；
+# 流式接口的耗时包含整个响应体的发送过程
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route and status code",
+    ["method", "route", "status"],
+)
+
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight",
+    "Number of HTTP requests currently being served",
+)
+
+# 数据库连接池：等待空闲连接（含新建连接）的耗时，以及当前借出的连接数
+DB_POOL_CHECKOUT_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "db_pool_checked_out",
+    "Number of connections currently checked out of the SQLAlchemy pool",
+)
+
+# 数据库语句执行耗时，operation 为语句的第一个关键字（SELECT/INSERT/UPDATE/DELETE ...）
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time by operation",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# 模型调用：mode 为 invoke（一次性返回）或 stream（流式）
+LLM_TIME_TO_FIRST_TOKEN = registry.histogram(
+    "ai_llm_time_to_first_token_seconds",
+    "Time from sending the LLM request to receiving the first content chunk",
+    ["platform", "model"],
+)
+
+LLM_GENERATION_DURATION = registry.histogram(
+    "ai_llm_generation_duration_seconds",
+    "Total LLM generation time by platform, model and mode",
+    ["platform", "model", "mode"],
+)
+
+# 生成速度：输出 token 数 / 首字后的生成耗时；平台未返回用量时按增量块数估算
+LLM_TOKENS_PER_SECOND = registry.histogram(
+    "ai_llm_tokens_per_second",
+    "LLM output tokens per second after the first token",
+    ["platform", "model"],
+    buckets=(1, 2.5, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400),
+)
+
+# SSE 连接持续时间：endpoint 为 send（新生成）或 resume（断线续传）
+CHAT_SSE_DURATION = registry.histogram(
+    "ai_chat_sse_duration_seconds",
+    "Duration of chat SSE connections by endpoint",
+    ["endpoint"],
+)
@@ -0,0 +1,293 @@
+"""
+轻量级请求链路追踪
+
+每个 HTTP 请求是一条 trace（TracingMiddleware 创建根 span），请求处理过程中：
+- tracer.span(name) 创建子 span 并设为当前 span，用于服务层的各个阶段；
+- tracer.start_span(name) 创建叶子 span（不设为当前 span），用于数据库语句、模型调用等，
+  可以跨越 await 与异步生成器的 yield 而不影响调用方的上下文。
+
+当前 span 保存在 contextvars 中，run_in_threadpool 与 asyncio.create_task 都会复制上下文，
+线程池中的数据库操作与后台生成任务会自动挂到发起它们的 span 下。
+没有进行中的 trace 时（后台线程、脚本）所有调用都是空操作。
+
+结束的 trace 放入内存环形缓冲区（开启 DEBUG_TRACES_ENABLED 后可在 /api/v1/debug/traces 按耗时查看），
+配置了 TRACE_EXPORT_FILE 时由后台线程按 OTLP JSON 格式追加写入文件。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from app.core.background import BackgroundBatchWriter
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# span 类型，取值与 OTLP 的 SpanKind 一致
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一段计时的操作"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """结束 span，重复调用时保留第一次的结果"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "name": self.name,
+            "start_offset_ms": round((self.start_ns - self.trace.root.start_ns) / 1e6, 3),
+            "duration_ms": None if self.duration_ms is None else round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """没有进行中的 trace 时 tracer.span() 返回的空 span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """一个请求内的全部 span"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any], max_spans: int):
+        self.trace_id = os.urandom(16).hex()
+        self.max_spans = max_spans
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.root = Span(self, name, None, KIND_SERVER, attributes)
+        self.spans: List[Span] = [self.root]
+
+    def add(self, name: str, parent: Span, kind: int, attributes: Dict[str, Any]) -> Optional[Span]:
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return None
+            span = Span(self, name, parent.span_id, kind, attributes)
+            self.spans.append(span)
+            return span
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms or 0.0
+
+    def snapshot(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    def to_dict(self) -> dict:
+        """按父子关系组织成树"""
+        spans = self.snapshot()
+        nodes = {span.span_id: {**span.to_dict(), "children": []} for span in spans}
+        for span in spans[1:]:
+            parent = nodes.get(span.parent_id)
+            if parent is not None:
+                parent["children"].append(nodes[span.span_id])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start_time": self.root.start_ns // 1_000_000,
+            "duration_ms": round(self.duration_ms, 3),
+            "span_count": len(spans),
+            "dropped_spans": self.dropped,
+            "root": nodes[self.root.span_id],
+        }
+
+
+class TraceBuffer:
+    """最近结束的 trace"""
+
+    def __init__(self, size: int):
+        self._traces: Deque[Trace] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, limit: int = 20, min_duration_ms: float = 0.0) -> List[Trace]:
+        with self._lock:
+            traces = [t for t in self._traces if t.duration_ms >= min_duration_ms]
+        traces.sort(key=lambda t: t.duration_ms, reverse=True)
+        return traces[:limit]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace: Trace, service_name: str) -> dict:
+    """转换为 OTLP/JSON 的 ExportTraceServiceRequest"""
+    spans = []
+    for span in trace.snapshot():
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            # 请求结束时仍未结束的 span（如被取消的生成）按请求结束时间记录
+            "endTimeUnixNano": str(span.end_ns or trace.root.end_ns or span.start_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class OTLPFileExporter(BackgroundBatchWriter[Trace]):
+    """后台线程把 trace 以 OTLP JSON 追加写入文件，每行一个请求；队列满时丢弃"""
+
+    def __init__(self, path: str, service_name: str, max_queue_size: int = 1000, flush_interval: float = 1.0):
+        super().__init__("trace-exporter", flush_interval, max_queue_size)
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, trace: Trace) -> None:
+        if not self._put(trace):
+            logger.warning(f"trace 导出队列已满，丢弃 trace {trace.trace_id}")
+
+    def write(self, batch: List[Trace]) -> int:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for trace in batch:
+                    f.write(json.dumps(to_otlp(trace, self.service_name), ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"trace 导出失败: {str(e)}")
+            return 0
+        return len(batch)
+
+
+class Tracer:
+    """创建 span 并在请求结束时收集 trace"""
+
+    def __init__(self, enabled: bool, buffer_size: int, max_spans: int,
+                 exporter: Optional[OTLPFileExporter] = None):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.buffer = TraceBuffer(buffer_size)
+        self.exporter = exporter
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """开始一条新的 trace，返回根 span；请求结束时放入缓冲区并导出"""
+        if not self.enabled:
+            yield None
+            return
+        root = Trace(name, attributes, self.max_spans).root
+        token = _current_span.set(root)
+        error = None
+        try:
+            yield root
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end(error)
+            self.buffer.add(root.trace)
+            if self.exporter is not None:
+                self.exporter.export(root.trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """在当前 span 下创建子 span，代码块内它成为当前 span；没有进行中的 trace 时返回空 span"""
+        span = self.start_span(name, KIND_INTERNAL, **attributes)
+        if span is None:
+            yield NOOP_SPAN
+            return
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end(error)
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, **attributes) -> Optional[Span]:
+        """在当前 span 下创建叶子 span，由调用方负责 end()；没有进行中的 trace 时返回 None"""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        return parent.trace.add(name, parent, kind, attributes)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    buffer_size=settings.TRACE_BUFFER_SIZE,
+    max_spans=settings.TRACE_MAX_SPANS,
+    exporter=OTLPFileExporter(settings.TRACE_EXPORT_FILE, settings.PROJECT_NAME) if settings.TRACE_EXPORT_FILE else None,
+)
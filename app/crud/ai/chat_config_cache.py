@@ -0,0 +1,73 @@
+"""
+对话配置缓存
+
+发送一条消息需要依次读取 对话 -> 角色 -> 模型 -> API 密钥，这几张表很少变化。
+这里把三部分分别缓存在 chat_config 命名空间中：
+
+- conversation:{id}  对话上的配置（所属用户、角色、模型、采样参数）
+- role:{id}          角色上的设定与模型
+- llm:{id}           模型及其 API 密钥的编号、地址，不可用时记录原因
+
+API 密钥本身不写入缓存（CACHE_BACKEND=redis 时缓存由多个服务共享），
+按密钥编号保存在进程内的 api_key_secrets 中。
+
+对话、角色、模型在写入后删除各自的键；API 密钥被多个模型引用，
+修改后递增命名空间版本号使全部配置失效，同时清空各进程内的密钥。失效通过缓存后端广播到所有 worker。
+"""
+import threading
+from typing import Callable, Dict, Optional
+
+from app.core.cache import cache
+from app.core.config import settings
+
+chat_config_cache = cache.namespace("chat_config", ttl=settings.CHAT_CONFIG_CACHE_TTL)
+
+
+class ApiKeySecrets:
+    """进程内的 API 密钥：密钥编号 -> 密钥，命名空间整体失效时清空"""
+
+    def __init__(self):
+        self._secrets: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        chat_config_cache.on_invalidate(self._on_invalidate)
+
+    def get(self, key_id: int, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        with self._lock:
+            if key_id in self._secrets:
+                return self._secrets[key_id]
+        secret = loader()
+        with self._lock:
+            self._secrets[key_id] = secret
+        return secret
+
+    def clear(self) -> None:
+        with self._lock:
+            self._secrets.clear()
+
+    def _on_invalidate(self, name: str, key: Optional[str]) -> None:
+        if key is None:
+            self.clear()
+
+
+api_key_secrets = ApiKeySecrets()
+
+
+def conversation_key(conversation_id: int) -> str:
+    return f"conversation:{conversation_id}"
+
+
+def role_key(role_id: int) -> str:
+    return f"role:{role_id}"
+
+
+def model_key(model_id: int) -> str:
+    # 旧版本以 model:{id} 缓存了 API 密钥，换用新键名，不再读取这些条目
+    return f"llm:{model_id}"
+
+
+def invalidate(key: Optional[str] = None) -> None:
+    """删除一个键；不传键时使整个命名空间失效"""
+    if key is None:
+        chat_config_cache.invalidate_all()
+    else:
+        chat_config_cache.delete(key)
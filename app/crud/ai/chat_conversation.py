@@ -1,29 +1,56 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
 from app.crud.base import CRUDBase
+from app.crud.ai import chat_config_cache
+from app.crud.ai.context_cache import context_cache
 from app.models.ai.chat_conversation import ChatConversation
-from app.schemas.ai.chat_conversation import ChatConversationCreate, ChatConversationUpdate
+from app.schemas.ai.chat_conversation import ChatConversationCreate, ChatConversationUpdate, ChatConversationPageReq
 
 class CRUDChatConversation(CRUDBase[ChatConversation, ChatConversationCreate, ChatConversationUpdate]):
+    # 不指定加载配置时不连接角色与模型（权限校验、发送消息等只用到本表字段）
+    load_profiles = {
+        # to_dict 需要角色头像/名称与模型名称
+        "list": lambda: (joinedload(ChatConversation.role), joinedload(ChatConversation.ai_model)),
+        "detail": lambda: (joinedload(ChatConversation.role), joinedload(ChatConversation.ai_model)),
+    }
     
-    def get_by_user_id(self, db: Session, *, user_id: int) -> List[ChatConversation]:
+    def get_by_user_id(self, db: Session, *, user_id: int, profile: str = "list") -> List[ChatConversation]:
         """根据用户ID获取对话列表"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.user_id == user_id,
             self.model.deleted == 0
         ).order_by(self.model.pinned.desc(), self.model.create_time.desc()).all()
     
-    def get_by_user_id_and_model(self, db: Session, *, user_id: int, model_id: int) -> List[ChatConversation]:
+    def get_page(self, db: Session, *, page: ChatConversationPageReq, user_id: int,
+                 profile: str = "list") -> Tuple[List[ChatConversation], Optional[int], Optional[str]]:
+        """分页获取用户的对话，置顶在前，按编号倒序"""
+        query = self.query(db, profile).filter(
+            self.model.user_id == user_id,
+            self.model.deleted == 0
+        )
+        if page.title:
+            query = query.filter(self.model.title.ilike(f"%{page.title}%"))
+        if page.model_id:
+            query = query.filter(self.model.model_id == page.model_id)
+        if page.role_id:
+            query = query.filter(self.model.role_id == page.role_id)
+        if page.pinned is not None:
+            query = query.filter(self.model.pinned == page.pinned)
+
+        return self.paginate(query, page, order_by=[(self.model.pinned, True), (self.model.id, True)])
+    
+    def get_by_user_id_and_model(self, db: Session, *, user_id: int, model_id: int,
+                                 profile: str = "list") -> List[ChatConversation]:
         """根据用户ID和模型ID获取对话列表"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.user_id == user_id,
             self.model.model_id == model_id,
             self.model.deleted == 0
         ).order_by(self.model.create_time.desc()).all()
     
-    def get_pinned_by_user_id(self, db: Session, *, user_id: int) -> List[ChatConversation]:
+    def get_pinned_by_user_id(self, db: Session, *, user_id: int, profile: str = "list") -> List[ChatConversation]:
         """获取用户置顶的对话"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.user_id == user_id,
             self.model.pinned == 1,
             self.model.deleted == 0
@@ -49,6 +76,19 @@ class CRUDChatConversation(CRUDBase[ChatConversation, ChatConversationCreate, Ch
         
         return conversation
     
+    def _after_write(self, db_obj: ChatConversation) -> None:
+        chat_config_cache.invalidate(chat_config_cache.conversation_key(db_obj.id))
+
+    def remove(self, db: Session, *, id: int) -> ChatConversation:
+        obj = super().remove(db, id=id)
+        context_cache.invalidate(id)
+        return obj
+
+    def soft_remove(self, db: Session, *, id: int) -> ChatConversation:
+        obj = super().soft_remove(db, id=id)
+        context_cache.invalidate(id)
+        return obj
+    
     def delete_by_user_id(self, db: Session, *, id: int, user_id: int) -> bool:
         """删除用户的对话（软删除）"""
         conversation = db.query(self.model).filter(
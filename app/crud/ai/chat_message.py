@@ -1,36 +1,120 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple, Union
+from sqlalchemy.orm import Session, joinedload, load_only, noload
 from app.crud.base import CRUDBase
+from app.crud.ai.context_cache import ContextMessage, context_cache
 from app.models.ai.chat_message import ChatMessage
-from app.schemas.ai.chat_message import ChatMessageCreate, ChatMessageUpdate
+from app.schemas.ai.chat_message import ChatMessageCreate, ChatMessageUpdate, ChatMessagePageReq
+from app.schemas.ai.token_usage import TokenUsage
 from sqlalchemy import func
+from datetime import datetime
 
 class CRUDChatMessage(CRUDBase[ChatMessage, ChatMessageCreate, ChatMessageUpdate]):
+    load_profiles = {
+        # 组装模型上下文：只读取类型与内容，不连接任何关联表
+        "context": lambda: (
+            load_only(ChatMessage.id, ChatMessage.type, ChatMessage.content),
+            noload(ChatMessage.conversation), noload(ChatMessage.role), noload(ChatMessage.ai_model),
+        ),
+        # 消息列表：to_dict 只用到本表字段
+        "list": lambda: (
+            noload(ChatMessage.conversation), noload(ChatMessage.role), noload(ChatMessage.ai_model),
+        ),
+        "detail": lambda: (
+            joinedload(ChatMessage.conversation), joinedload(ChatMessage.role), joinedload(ChatMessage.ai_model),
+        ),
+    }
     
-    def get_by_conversation_id(self, db: Session, *, conversation_id: int, limit: int = 50) -> List[ChatMessage]:
+    def get_by_conversation_id(self, db: Session, *, conversation_id: int, limit: int = 50,
+                               profile: str = "list") -> List[ChatMessage]:
         """根据对话ID获取消息列表"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.conversation_id == conversation_id,
             self.model.deleted == 0
         ).order_by(self.model.create_time.asc()).limit(limit).all()
     
-    def get_context_messages(self, db: Session, *, conversation_id: int, max_contexts: int = 10) -> List[ChatMessage]:
+    def get_context_messages(self, db: Session, *, conversation_id: int, max_contexts: int = 10,
+                             profile: str = "context") -> List[ChatMessage]:
         """获取对话的上下文消息"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.conversation_id == conversation_id,
             self.model.deleted == 0
         ).order_by(self.model.create_time.desc()).limit(max_contexts).all()
     
-    def get_by_user_id(self, db: Session, *, user_id: int) -> List[ChatMessage]:
+    def get_context_rows(self, db: Session, *, conversation_id: int, max_contexts: int = 10,
+                         exclude_id: Optional[int] = None) -> List[ContextMessage]:
+        """
+        获取对话的上下文消息（按时间从旧到新）
+
+        只查询 (id, type, content) 三列并直接返回元组，不构造 ORM 对象，
+        供每次调用模型前组装上下文使用。优先读取进程内的对话上下文缓存。
+
+        Args:
+            conversation_id: 对话编号
+            max_contexts: 最多返回的消息数量
+            exclude_id: 需要排除的消息编号（例如刚保存、将单独追加的用户消息）
+        """
+        def load(limit: int) -> List[ContextMessage]:
+            rows = db.query(self.model.id, self.model.type, self.model.content).filter(
+                self.model.conversation_id == conversation_id,
+                self.model.deleted == 0
+            ).order_by(self.model.create_time.desc(), self.model.id.desc()).limit(limit).all()
+            return [ContextMessage._make(row) for row in reversed(rows)]
+
+        return context_cache.get(conversation_id, max_contexts, exclude_id, load)
+
+    def get_rows_before(self, db: Session, *, conversation_id: int, before_id: int, after_id: Optional[int],
+                        limit: int) -> List[ContextMessage]:
+        """
+        获取对话中编号小于 before_id（且大于 after_id）的最近 limit 条消息（按时间从旧到新），
+        供开启摘要记忆时向前逐页读取摘要之后的消息，不经过上下文缓存
+        """
+        query = db.query(self.model.id, self.model.type, self.model.content).filter(
+            self.model.conversation_id == conversation_id,
+            self.model.deleted == 0,
+            self.model.id < before_id
+        )
+        if after_id is not None:
+            query = query.filter(self.model.id > after_id)
+        rows = query.order_by(self.model.id.desc()).limit(limit).all()
+        return [ContextMessage._make(row) for row in reversed(rows)]
+
+    def get_rows_after(self, db: Session, *, conversation_id: int, user_id: int, after_id: int,
+                       limit: int) -> List[ContextMessage]:
+        """获取对话中编号大于 after_id 的最早 limit 条消息（按时间从旧到新），供合并对话摘要使用"""
+        rows = db.query(self.model.id, self.model.type, self.model.content).filter(
+            self.model.conversation_id == conversation_id,
+            self.model.user_id == user_id,
+            self.model.deleted == 0,
+            self.model.id > after_id
+        ).order_by(self.model.id.asc()).limit(limit).all()
+        return [ContextMessage._make(row) for row in rows]
+
+    def get_by_user_id(self, db: Session, *, user_id: int, profile: str = "list") -> List[ChatMessage]:
         """根据用户ID获取消息列表"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.user_id == user_id,
             self.model.deleted == 0
         ).order_by(self.model.create_time.desc()).all()
     
-    def get_latest_message(self, db: Session, *, conversation_id: int) -> Optional[ChatMessage]:
+    def get_page(self, db: Session, *, page: ChatMessagePageReq, user_id: int,
+                 profile: str = "list") -> Tuple[List[ChatMessage], Optional[int], Optional[str]]:
+        """分页获取用户的消息，按编号倒序"""
+        query = self.query(db, profile).filter(
+            self.model.user_id == user_id,
+            self.model.deleted == 0
+        )
+        if page.conversation_id:
+            query = query.filter(self.model.conversation_id == page.conversation_id)
+        if page.type:
+            query = query.filter(self.model.type == page.type)
+        if page.user_id:
+            query = query.filter(self.model.user_id == page.user_id)
+
+        return self.paginate(query, page, order_by=[(self.model.id, True)])
+    
+    def get_latest_message(self, db: Session, *, conversation_id: int, profile: str = "list") -> Optional[ChatMessage]:
         """获取对话的最新消息"""
-        return db.query(self.model).filter(
+        return self.query(db, profile).filter(
             self.model.conversation_id == conversation_id,
             self.model.deleted == 0
         ).order_by(self.model.create_time.desc()).first()
@@ -61,12 +145,15 @@ class CRUDChatMessage(CRUDBase[ChatMessage, ChatMessageCreate, ChatMessageUpdate
             role_id=role_id,
             use_context=True
         )
-        return self.create(db, obj_in=message_data)
+        db_obj = self.create(db, obj_in=message_data)
+        context_cache.append(conversation_id, ContextMessage(db_obj.id, db_obj.type, db_obj.content))
+        return db_obj
     
     def create_ai_message(self, db: Session, *, conversation_id: int, user_id: int,
                          content: str, model_id: int, model: str, reply_id: Optional[int] = None,
-                         role_id: Optional[int] = None) -> ChatMessage:
-        """创建AI回复消息"""
+                         role_id: Optional[int] = None, finish_reason: Optional[str] = None,
+                         usage: Optional[TokenUsage] = None) -> ChatMessage:
+        """创建AI回复消息，usage 为本次生成的用量与耗时"""
         message_data = ChatMessageCreate(
             conversation_id=conversation_id,
             user_id=user_id,
@@ -76,8 +163,50 @@ class CRUDChatMessage(CRUDBase[ChatMessage, ChatMessageCreate, ChatMessageUpdate
             model_id=model_id,
             content=content,
             role_id=role_id,
-            use_context=True
+            use_context=True,
+            finish_reason=finish_reason,
+            **(usage.model_dump() if usage else {})
         )
-        return self.create(db, obj_in=message_data)
+        db_obj = self.create(db, obj_in=message_data)
+        # 流式回复先以空内容写入，结束时由 finish_streaming 更新为完整内容
+        context_cache.append(conversation_id, ContextMessage(db_obj.id, db_obj.type, db_obj.content))
+        return db_obj
+
+    def append_content(self, db: Session, *, id: int, content: str, finish_reason: Optional[str] = None,
+                       usage: Optional[TokenUsage] = None) -> None:
+        """在数据库端追加消息内容（流式生成的增量写入），可同时更新结束原因与用量"""
+        values = {self.model.update_time: datetime.now()}
+        if content:
+            values[self.model.content] = self.model.content + content
+        if finish_reason is not None:
+            values[self.model.finish_reason] = finish_reason
+        if usage is not None:
+            values.update({getattr(self.model, field): value for field, value in usage.model_dump().items()})
+        db.query(self.model).filter(self.model.id == id).update(values, synchronize_session=False)
+        db.commit()
+
+    def finish_streaming(self, db: Session, *, id: int, conversation_id: int, content: str,
+                         finish_reason: str, full_content: str, usage: Optional[TokenUsage] = None) -> None:
+        """写入流式回复剩余的内容、结束原因与用量，并把完整内容写穿到上下文缓存"""
+        self.append_content(db, id=id, content=content, finish_reason=finish_reason, usage=usage)
+        context_cache.replace(conversation_id, ContextMessage(id, "assistant", full_content))
+
+    def update(self, db: Session, *, db_obj: ChatMessage,
+               obj_in: Union[ChatMessageUpdate, Dict[str, Any]]) -> ChatMessage:
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        context_cache.invalidate(db_obj.conversation_id)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> ChatMessage:
+        obj = super().remove(db, id=id)
+        if obj is not None:
+            context_cache.discard_message(obj.conversation_id, obj.id)
+        return obj
+
+    def soft_remove(self, db: Session, *, id: int) -> ChatMessage:
+        obj = super().soft_remove(db, id=id)
+        if obj is not None:
+            context_cache.discard_message(obj.conversation_id, obj.id)
+        return obj
 
 chat_message = CRUDChatMessage(ChatMessage)
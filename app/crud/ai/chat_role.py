@@ -1,12 +1,19 @@
 from typing import List, Optional, Tuple
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_
 from app.crud.base import CRUDBase
+from app.crud.ai import chat_config_cache
 from app.models.ai.chat_role import ChatRole
 from app.schemas.ai.chat_role import ChatRoleCreate, ChatRoleUpdate, ChatRolePageReq
 
 class CRUDChatRole(CRUDBase[ChatRole, ChatRoleCreate, ChatRoleUpdate]):
+    # 响应中需要模型名称时预先连接模型
+    load_profiles = {
+        "list": lambda: (joinedload(ChatRole.ai_model),),
+        "detail": lambda: (joinedload(ChatRole.ai_model),),
+    }
+
     def _prepare_create_data(self, obj_in):
         """准备创建数据，将列表转换为JSON字符串"""
         data = super()._prepare_create_data(obj_in)
@@ -31,6 +38,9 @@ class CRUDChatRole(CRUDBase[ChatRole, ChatRoleCreate, ChatRoleUpdate]):
             data["tool_ids"] = json.dumps(data["tool_ids"] or [])
         return data
 
+    def _after_write(self, db_obj: ChatRole) -> None:
+        chat_config_cache.invalidate(chat_config_cache.role_key(db_obj.id))
+
     def get_by_name_and_user(self, db: Session, *, name: str, user_id: Optional[int]) -> Optional[ChatRole]:
         query = db.query(ChatRole).filter(ChatRole.name == name, ChatRole.deleted == 0)
         if user_id is not None:
@@ -40,8 +50,9 @@ class CRUDChatRole(CRUDBase[ChatRole, ChatRoleCreate, ChatRoleUpdate]):
     def get_category_list(self, db: Session) -> List[str]:
         return [item[0] for item in db.query(ChatRole.category).distinct().filter(ChatRole.deleted == 0).all() if item[0]]
     
-    def get_page(self, db: Session, *, page: ChatRolePageReq) -> Tuple[List[ChatRole], int]:
-        query = db.query(ChatRole).filter(ChatRole.deleted == 0)
+    def get_page(self, db: Session, *, page: ChatRolePageReq,
+                 profile: str = "list") -> Tuple[List[ChatRole], Optional[int], Optional[str]]:
+        query = self.query(db, profile).filter(ChatRole.deleted == 0)
         if page.name:
             query = query.filter(ChatRole.name.like(f"%{page.name}%"))
         if page.category:
@@ -51,9 +62,7 @@ class CRUDChatRole(CRUDBase[ChatRole, ChatRoleCreate, ChatRoleUpdate]):
         if page.status is not None:
             query = query.filter(ChatRole.status == page.status)
         
-        total = query.count()
-        items = query.order_by(ChatRole.sort).offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
-        return items, total
+        return self.paginate(query, page, order_by=[(ChatRole.sort, False)])
 
     def soft_delete(self, db: Session, *, id: int) -> ChatRole:
         """软删除聊天角色"""
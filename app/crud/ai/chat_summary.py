@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.crud.base import CRUDBase
+from app.models.ai.chat_summary import ChatSummary
+from app.schemas.ai.chat_summary import ChatSummaryCreate, ChatSummaryUpdate
+
+class CRUDChatSummary(CRUDBase[ChatSummary, ChatSummaryCreate, ChatSummaryUpdate]):
+
+    def get_by_conversation_id(self, db: Session, *, conversation_id: int) -> Optional[ChatSummary]:
+        return db.query(self.model).filter(self.model.conversation_id == conversation_id).first()
+
+    def save_summary(self, db: Session, *, conversation_id: int, content: str, last_message_id: int,
+                     folded: int, expected_last_message_id: Optional[int]) -> bool:
+        """
+        保存合并后的摘要（乐观并发）
+
+        只有摘要仍停留在 expected_last_message_id（首次生成时为 None）时才写入，
+        多个进程同时合并同一对话时只有一个成功，其余返回 False。
+        """
+        if expected_last_message_id is None:
+            db.add(self.model(
+                conversation_id=conversation_id, content=content,
+                last_message_id=last_message_id, message_count=folded
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+            return True
+
+        updated = db.query(self.model).filter(
+            self.model.conversation_id == conversation_id,
+            self.model.last_message_id == expected_last_message_id
+        ).update({
+            self.model.content: content,
+            self.model.last_message_id: last_message_id,
+            self.model.message_count: self.model.message_count + folded,
+            self.model.update_time: datetime.now(),
+        }, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+
+chat_summary = CRUDChatSummary(ChatSummary)
@@ -0,0 +1,170 @@
+"""
+对话上下文缓存
+
+每次调用模型前都要读取对话最近的 max_contexts 条消息，而这些消息大多是本进程几秒前刚写入的。
+这里按对话缓存最近的消息（LRU），由 CRUDChatMessage 在创建消息时写穿更新，
+在删除消息、删除对话时失效，活跃对话的上下文读取不再访问数据库。
+
+缓存位于进程内存中，多 worker 部署时其他进程的写入无法感知，依靠 TTL 限制数据陈旧时间。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.metrics import CHAT_CONTEXT_CACHE
+
+
+class ContextMessage(NamedTuple):
+    """组装模型上下文用的精简消息，只包含编号、类型与内容"""
+    id: int
+    type: str
+    content: str
+
+
+class _Entry:
+    __slots__ = ("messages", "complete", "capacity", "expires_at")
+
+    def __init__(self, messages: List[ContextMessage], complete: bool, capacity: int, expires_at: float):
+        self.messages = messages  # 按时间从旧到新
+        self.complete = complete  # 是否包含对话的全部消息
+        self.capacity = capacity
+        self.expires_at = expires_at
+
+
+class ContextCache:
+    """按对话划分的最近消息 LRU 缓存"""
+
+    def __init__(self, max_size: int, depth: int, ttl: float):
+        self.max_size = max_size
+        self.depth = depth
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # 正在从数据库加载的对话；加载期间发生写入则丢弃加载结果，避免缓存旧数据
+        self._loading: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(
+        self,
+        conversation_id: int,
+        max_contexts: int,
+        exclude_id: Optional[int],
+        loader: Callable[[int], List[ContextMessage]],
+    ) -> List[ContextMessage]:
+        """
+        获取对话最近的消息，未命中时通过 loader 从数据库加载
+
+        Args:
+            conversation_id: 对话编号
+            max_contexts: 需要的消息数量
+            exclude_id: 需要排除的消息编号
+            loader: 按给定数量加载最近消息的函数（结果按时间从旧到新）
+
+        Returns:
+            List[ContextMessage]: 按时间从旧到新的消息
+        """
+        need = max_contexts + (1 if exclude_id is not None else 0)
+        if not self.enabled:
+            return self._select(loader(need), max_contexts, exclude_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[conversation_id]
+                entry = None
+            if entry is not None and (entry.complete or len(entry.messages) >= need):
+                self._entries.move_to_end(conversation_id)
+                CHAT_CONTEXT_CACHE.inc(result="hit")
+                return self._select(entry.messages, max_contexts, exclude_id)
+
+            token = object()
+            self._loading[conversation_id] = token
+
+        CHAT_CONTEXT_CACHE.inc(result="miss")
+        try:
+            messages = loader(need)
+        except Exception:
+            with self._lock:
+                if self._loading.get(conversation_id) is token:
+                    del self._loading[conversation_id]
+            raise
+
+        with self._lock:
+            if self._loading.get(conversation_id) is not token:
+                return self._select(messages, max_contexts, exclude_id)
+            del self._loading[conversation_id]
+            self._entries[conversation_id] = _Entry(
+                messages=list(messages),
+                complete=len(messages) < need,
+                capacity=max(self.depth, need),
+                expires_at=now + self.ttl,
+            )
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return self._select(messages, max_contexts, exclude_id)
+
+    @staticmethod
+    def _select(messages: List[ContextMessage], max_contexts: int, exclude_id: Optional[int]) -> List[ContextMessage]:
+        if exclude_id is not None:
+            messages = [msg for msg in messages if msg.id != exclude_id]
+        if max_contexts <= 0:
+            return []
+        return list(messages[-max_contexts:])
+
+    def append(self, conversation_id: int, message: ContextMessage) -> None:
+        """写穿：新消息追加到已缓存的对话末尾（未缓存的对话不处理，下次读取时再加载）"""
+        with self._lock:
+            self._loading.pop(conversation_id, None)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            entry.messages.append(message)
+            if len(entry.messages) > entry.capacity:
+                del entry.messages[:len(entry.messages) - entry.capacity]
+                entry.complete = False
+
+    def replace(self, conversation_id: int, message: ContextMessage) -> None:
+        """更新已缓存的消息内容（例如流式回复结束时写入完整内容）"""
+        with self._lock:
+            self._loading.pop(conversation_id, None)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            for index, cached in enumerate(entry.messages):
+                if cached.id == message.id:
+                    entry.messages[index] = message
+                    return
+            # 消息不在缓存中（例如写入时对话尚未缓存），无法确定位置，直接失效
+            del self._entries[conversation_id]
+
+    def discard_message(self, conversation_id: int, message_id: int) -> None:
+        """消息被删除：整体失效，下次读取时重新加载以补足被删除的位置"""
+        with self._lock:
+            self._loading.pop(conversation_id, None)
+            entry = self._entries.get(conversation_id)
+            if entry is not None and any(msg.id == message_id for msg in entry.messages):
+                del self._entries[conversation_id]
+
+    def invalidate(self, conversation_id: int) -> None:
+        with self._lock:
+            self._loading.pop(conversation_id, None)
+            self._entries.pop(conversation_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loading.clear()
+            self._entries.clear()
+
+
+context_cache = ContextCache(
+    max_size=settings.CHAT_CONTEXT_CACHE_SIZE,
+    depth=settings.CHAT_CONTEXT_CACHE_DEPTH,
+    ttl=settings.CHAT_CONTEXT_CACHE_TTL,
+)
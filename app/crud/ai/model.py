@@ -2,10 +2,14 @@ from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from app.crud.base import CRUDBase
+from app.crud.ai import chat_config_cache
 from app.models.ai.model import Model
 from app.schemas.ai.model import ModelCreate, ModelUpdate, ModelPageReq
 
 class CRUDModel(CRUDBase[Model, ModelCreate, ModelUpdate]):
+    def _after_write(self, db_obj: Model) -> None:
+        chat_config_cache.invalidate(chat_config_cache.model_key(db_obj.id))
+
     def get_by_name(self, db: Session, *, name: str) -> Optional[Model]:
         return db.query(Model).filter(Model.name == name, Model.deleted == 0).first()
     
@@ -22,7 +26,7 @@ class CRUDModel(CRUDBase[Model, ModelCreate, ModelUpdate]):
             conditions.append(Model.user_id == user_id)
         return db.query(Model).filter(and_(*conditions)).order_by(Model.sort.desc()).all()
     
-    def get_page(self, db: Session, *, page: ModelPageReq, user_id: int) -> Tuple[List[Model], int]:
+    def get_page(self, db: Session, *, page: ModelPageReq, user_id: int) -> Tuple[List[Model], Optional[int], Optional[str]]:
         query = db.query(Model).filter(Model.deleted == 0, Model.user_id == user_id)
         if page.name:
             query = query.filter(Model.name.like(f"%{page.name}%"))
@@ -33,12 +37,7 @@ class CRUDModel(CRUDBase[Model, ModelCreate, ModelUpdate]):
         if page.status is not None:
             query = query.filter(Model.status == page.status)
         
-        # 添加排序
-        query = query.order_by(Model.sort.desc())
-        
-        total = query.count()
-        items = query.offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
-        return items, total
+        return self.paginate(query, page, order_by=[(Model.sort, True)])
 
     def soft_delete(self, db: Session, *, id: int) -> Model:
         """软删除模型"""
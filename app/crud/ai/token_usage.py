@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Dict, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.crud.base import CRUDBase
+from app.models.ai.token_usage import ChatTokenUsage
+from app.schemas.ai.token_usage import ChatTokenUsageCreate, ChatTokenUsageUpdate
+
+# 汇总键：(用户编号, 模型编号, 统计日期)
+UsageKey = Tuple[int, int, date]
+# 累加的字段
+USAGE_FIELDS = ("request_count", "prompt_tokens", "completion_tokens", "total_latency_ms")
+
+class CRUDChatTokenUsage(CRUDBase[ChatTokenUsage, ChatTokenUsageCreate, ChatTokenUsageUpdate]):
+
+    def add_usages(self, db: Session, usages: Dict[UsageKey, Dict[str, int]]) -> None:
+        """
+        在一个事务中累加一批用量：已有的汇总行在数据库端原地累加，不存在时插入
+
+        多个 worker 同时插入同一汇总行时唯一约束冲突，回滚后重试一次（此时全部走累加）
+        """
+        for attempt in range(2):
+            try:
+                for (user_id, model_id, stat_date), values in usages.items():
+                    updated = db.query(self.model).filter(
+                        self.model.user_id == user_id,
+                        self.model.model_id == model_id,
+                        self.model.stat_date == stat_date,
+                    ).update(
+                        {getattr(self.model, field): getattr(self.model, field) + values.get(field, 0) for field in USAGE_FIELDS},
+                        synchronize_session=False
+                    )
+                    if not updated:
+                        db.add(self.model(
+                            user_id=user_id, model_id=model_id, stat_date=stat_date,
+                            **{field: values.get(field, 0) for field in USAGE_FIELDS}
+                        ))
+                        db.flush()
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+
+    def get_user_tokens(self, db: Session, *, user_id: int, stat_date: date) -> int:
+        """用户某天在所有模型上的 token 总量"""
+        total = db.query(
+            func.coalesce(func.sum(self.model.prompt_tokens + self.model.completion_tokens), 0)
+        ).filter(
+            self.model.user_id == user_id,
+            self.model.stat_date == stat_date
+        ).scalar()
+        return int(total)
+
+chat_token_usage = CRUDChatTokenUsage(ChatTokenUsage)
@@ -1,8 +1,11 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, literal, or_
+from sqlalchemy.orm import Query, Session
 from app.db.session import Base
+from app.schemas.common.pagination import InvalidCursorError, decode_cursor, encode_cursor
 from app.schemas.common.response import PageParam
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -10,15 +13,29 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # 加载配置：名称 -> 返回查询选项（joinedload / load_only / noload 等）的函数，由子类按需声明。
+    # 模型上的关联关系默认按需加载，调用方通过 profile 选择要预先连接或裁剪的部分。
+    # 使用函数是为了在首次查询时才引用关联属性，避免导入 CRUD 模块时提前配置映射。
+    load_profiles: Dict[str, Callable[[], Sequence[Any]]] = {}
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
         """
         self.model = model
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
+    def query(self, db: Session, profile: Optional[str] = None) -> Query:
+        """创建查询，并应用指定的加载配置"""
+        query = db.query(self.model)
+        if profile is not None:
+            if profile not in self.load_profiles:
+                raise ValueError(f"{self.model.__name__} 没有名为 {profile} 的加载配置")
+            query = query.options(*self.load_profiles[profile]())
+        return query
+
+    def get(self, db: Session, id: Any, profile: Optional[str] = None) -> Optional[ModelType]:
         """获取单个记录（排除已删除的）"""
-        query = db.query(self.model).filter(self.model.id == id)
+        query = self.query(db, profile).filter(self.model.id == id)
         # 如果模型有 deleted 字段，则过滤掉已删除的记录
         if hasattr(self.model, 'deleted'):
             query = query.filter(self.model.deleted == 0)
@@ -26,15 +43,100 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
     def get_multi(
         self, db: Session, *, page: PageParam
-    ) -> tuple[List[ModelType], int]:
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str]]:
         """获取分页记录（排除已删除的）"""
         query = db.query(self.model)
         # 如果模型有 deleted 字段，则过滤掉已删除的记录
         if hasattr(self.model, 'deleted'):
             query = query.filter(self.model.deleted == 0)
-        total = query.count()
-        items = query.offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
-        return items, total
+        return self.paginate(query, page)
+
+    def paginate(
+        self,
+        query: Query,
+        page: PageParam,
+        order_by: Sequence[Tuple[Any, bool]] = (),
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str]]:
+        """
+        分页查询，同时支持页码分页和游标分页
+
+        排序键末尾会自动追加 id 作为唯一的决胜键，保证翻页稳定。
+        page.cursor 为 None 时按 pageNo 做 OFFSET 分页；否则按排序键做 keyset 分页，
+        直接从上一页最后一条记录之后开始读取，深分页不再扫描并丢弃前面的行，
+        且只在 page.withTotal 为真时才执行 COUNT。
+
+        Args:
+            query: 已经加好过滤条件的查询
+            page: 分页参数
+            order_by: 排序键列表，元素为 (列, 是否倒序)
+
+        Returns:
+            Tuple[List[ModelType], Optional[int], Optional[str]]: (记录列表, 总数, 下一页游标)
+        """
+        keys = [(column, descending) for column, descending in order_by if column is not self.model.id]
+        keys.append((self.model.id, any(descending for _, descending in order_by[:1])))
+        ordered = query.order_by(*[
+            column.desc() if descending else column.asc() for column, descending in keys
+        ])
+
+        if not page.is_cursor_mode():
+            total = query.order_by(None).count()
+            items = ordered.offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
+            return items, total, None
+
+        total = query.order_by(None).count() if page.withTotal else None
+        if page.cursor:
+            try:
+                values = decode_cursor(page.cursor)
+                if len(values) != len(keys):
+                    raise ValueError("游标与排序键不匹配")
+                condition = self._keyset_filter(keys, values)
+            except ValueError as e:
+                raise InvalidCursorError("无效的分页游标") from e
+            ordered = ordered.filter(condition)
+
+        # 多取一条用来判断是否还有下一页
+        rows = ordered.limit(page.pageSize + 1).all()
+        items = rows[:page.pageSize]
+        next_cursor = None
+        if len(rows) > page.pageSize:
+            last = items[-1]
+            next_cursor = encode_cursor([getattr(last, column.key) for column, _ in keys])
+        return items, total, next_cursor
+
+    @staticmethod
+    def _keyset_filter(keys: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+        """构造 (a, b, c) > (x, y, z) 形式的条件，按各列的排序方向展开为 OR 条件"""
+        # 以绑定参数比较，布尔列不能直接与 True/False 做大小比较
+        values = [
+            literal(CRUDBase._cursor_value(column, value), type_=column.type)
+            for (column, _), value in zip(keys, values)
+        ]
+        clauses = []
+        for i, (column, descending) in enumerate(keys):
+            equals = [keys[j][0] == values[j] for j in range(i)]
+            after = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*equals, after))
+        return or_(*clauses)
+
+    @staticmethod
+    def _cursor_value(column, value):
+        """游标中的时间以 ISO 字符串保存，比较前按列类型还原"""
+        if isinstance(value, str):
+            python_type = None
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                pass
+            if python_type is datetime:
+                return datetime.fromisoformat(value)
+            if python_type is date:
+                return date.fromisoformat(value)
+        return value
+
+    def _after_write(self, db_obj: ModelType) -> None:
+        """更新、删除、恢复记录后调用，子类可以重写此方法以失效相关缓存"""
+        pass
 
     def _prepare_create_data(self, obj_in: CreateSchemaType) -> Dict[str, Any]:
         """准备创建数据，子类可以重写此方法以自定义数据处理"""
@@ -66,6 +168,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        self._after_write(db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
@@ -73,6 +176,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = db.query(self.model).get(id)
         db.delete(obj)
         db.commit()
+        self._after_write(obj)
         return obj
     
     def soft_remove(self, db: Session, *, id: int) -> ModelType:
@@ -106,6 +210,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.add(obj)
             db.commit()
             db.refresh(obj)
+            self._after_write(obj)
         
         return obj
     
@@ -139,5 +244,6 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.add(obj)
             db.commit()
             db.refresh(obj)
+            self._after_write(obj)
         
         return obj
\ No newline at end of file
@@ -17,7 +17,11 @@ class CRUDDictData(CRUDBase[DictData, DictDataCreate, DictDataUpdate]):
     def get_multi_by_status(self, db: Session, *, status: int) -> List[DictData]:
         return db.query(DictData).filter(DictData.status == status, DictData.deleted == 0).all()
     
-    def get_page(self, db: Session, *, page: DictDataPageReq) -> Tuple[List[DictData], int]:
+    def get_all(self, db: Session) -> List[DictData]:
+        """获取全部未删除的字典数据，按类型、排序排列"""
+        return db.query(DictData).filter(DictData.deleted == 0).order_by(DictData.dict_type, DictData.sort, DictData.id).all()
+    
+    def get_page(self, db: Session, *, page: DictDataPageReq) -> Tuple[List[DictData], Optional[int], Optional[str]]:
         query = db.query(DictData).filter(DictData.deleted == 0)
         if page.label:
             query = query.filter(DictData.label.like(f"%{page.label}%"))
@@ -26,8 +30,6 @@ class CRUDDictData(CRUDBase[DictData, DictDataCreate, DictDataUpdate]):
         if page.status is not None:
             query = query.filter(DictData.status == page.status)
         
-        total = query.count()
-        items = query.order_by(DictData.dict_type, DictData.sort).offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
-        return items, total
+        return self.paginate(query, page, order_by=[(DictData.dict_type, False), (DictData.sort, False)])
 
 dict_data = CRUDDictData(DictData)
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
 from app.models.system.dict_type import DictType
@@ -11,7 +11,7 @@ class CRUDDictType(CRUDBase[DictType, DictTypeCreate, DictTypeUpdate]):
     def get_multi_by_status(self, db: Session, *, status: int) -> List[DictType]:
         return db.query(DictType).filter(DictType.status == status, DictType.deleted == 0).all()
     
-    def get_page(self, db: Session, *, page: DictTypePageReq) -> tuple[List[DictType], int]:
+    def get_page(self, db: Session, *, page: DictTypePageReq) -> Tuple[List[DictType], Optional[int], Optional[str]]:
         query = db.query(DictType).filter(DictType.deleted == 0)
         if page.name:
             query = query.filter(DictType.name.like(f"%{page.name}%"))
@@ -20,8 +20,6 @@ class CRUDDictType(CRUDBase[DictType, DictTypeCreate, DictTypeUpdate]):
         if page.status is not None:
             query = query.filter(DictType.status == page.status)
         
-        total = query.count()
-        items = query.offset((page.pageNo - 1) * page.pageSize).limit(page.pageSize).all()
-        return items, total
+        return self.paginate(query, page)
 
 dict_type = CRUDDictType(DictType)
@@ -0,0 +1,82 @@
+"""
+数据库指标与链路追踪
+
+- 连接池：InstrumentedQueuePool 统计从连接池取得连接的等待时间（连接池耗尽时即排队时间）；
+- 语句执行：监听 before/after_cursor_execute，按语句类型统计执行耗时，
+  请求处理中执行的语句同时记录为当前 span 的子 span。
+"""
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from app.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_WAIT, DB_QUERY_DURATION
+from app.core.tracing import KIND_CLIENT, tracer
+
+# 执行上下文上记录开始时间与 span 的属性名
+_START_ATTR = "_metrics_query_start"
+_SPAN_ATTR = "_trace_span"
+# span 中记录的 SQL 最大长度（不记录参数）
+MAX_STATEMENT_LENGTH = 1000
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录连接获取等待时间的 QueuePool"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    setattr(context, _START_ATTR, time.perf_counter())
+    operation = _operation(statement)
+    span = tracer.start_span(f"db {operation}", KIND_CLIENT, **{
+        "db.system": conn.dialect.name,
+        "db.operation": operation,
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+    })
+    if span is not None:
+        setattr(context, _SPAN_ATTR, span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    start = getattr(context, _START_ATTR, None)
+    if start is not None:
+        DB_QUERY_DURATION.observe(time.perf_counter() - start, operation=_operation(statement))
+    span = getattr(context, _SPAN_ATTR, None)
+    if span is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+        span.end()
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, _SPAN_ATTR, None)
+    if span is not None:
+        span.end(exception_context.original_exception)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为 engine 注册语句耗时与 span 监听"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def export_pool_metrics(engine: Engine) -> None:
+    """把 engine 连接池的借出连接数导出到进程唯一的指标上，只应由应用的主 engine 调用"""
+    if isinstance(engine.pool, QueuePool):
+        # engine.dispose() 会替换连接池，每次输出时重新读取
+        DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.db.instrumentation import InstrumentedQueuePool, export_pool_metrics, instrument_engine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,8 +14,11 @@ engine = create_engine(
     get_mysql_uri(),
     echo=False,  # 关闭 SQL 日志
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=3600,
+    poolclass=InstrumentedQueuePool  # 统计连接获取等待时间
 )
+instrument_engine(engine)
+export_pool_metrics(engine)
 
 # Create synchronous session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
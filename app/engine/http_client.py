@@ -0,0 +1,135 @@
+"""
+共享 HTTP 连接池
+
+deepseek、zhipu、tongyi、openai 等平台都是 OpenAI 兼容接口，
+这里按目标地址（scheme + host + port）维护一组共享的 httpx 同步/异步客户端，
+所有 ChatOpenAI 实例复用其中的长连接，避免每次请求重新建立 TCP/TLS 连接。
+"""
+import logging
+import socket
+import threading
+import time
+from typing import Dict, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 依赖 h2 包，未安装时退回 HTTP/1.1"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class DNSCache:
+    """getaddrinfo 结果缓存，只对连接池中注册过的主机生效"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._hosts: Set[str] = set()
+        self._entries: Dict[Tuple, Tuple[float, list]] = {}
+        self._lock = threading.Lock()
+        self._original_getaddrinfo = None
+
+    def install(self) -> None:
+        """替换 socket.getaddrinfo（同步与异步客户端都会经过这里解析域名）"""
+        if self._original_getaddrinfo is not None or self.ttl <= 0:
+            return
+        self._original_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = self._getaddrinfo
+
+    def add_host(self, host: str) -> None:
+        with self._lock:
+            self._hosts.add(host)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _getaddrinfo(self, host, port, *args, **kwargs):
+        if host not in self._hosts:
+            return self._original_getaddrinfo(host, port, *args, **kwargs)
+
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        result = self._original_getaddrinfo(host, port, *args, **kwargs)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+        return result
+
+
+class HttpClientPool:
+    """按目标地址划分的共享 httpx 客户端"""
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+        self._http2 = settings.HTTP_POOL_HTTP2 and _http2_available()
+        self._dns_cache = DNSCache(ttl=settings.HTTP_DNS_CACHE_TTL)
+        self._dns_cache.install()
+
+    @staticmethod
+    def _origin(base_url: str) -> str:
+        parts = urlsplit(base_url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+        )
+
+    def get_clients(self, base_url: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """
+        获取目标地址对应的共享客户端
+
+        Args:
+            base_url: 模型平台的 API 地址
+
+        Returns:
+            Tuple[httpx.Client, httpx.AsyncClient]: 同步客户端与异步客户端
+        """
+        origin = self._origin(base_url)
+        clients = self._clients.get(origin)
+        if clients is not None:
+            return clients
+
+        with self._lock:
+            clients = self._clients.get(origin)
+            if clients is None:
+                limits = self._limits()
+                clients = (
+                    httpx.Client(limits=limits, http2=self._http2),
+                    httpx.AsyncClient(limits=limits, http2=self._http2),
+                )
+                self._clients[origin] = clients
+                self._dns_cache.add_host(urlsplit(base_url).hostname)
+                logger.info(f"创建共享 HTTP 连接池: {origin} (http2={self._http2})")
+        return clients
+
+    async def aclose(self) -> None:
+        """关闭所有连接（应用退出时调用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client, async_client in clients:
+            client.close()
+            await async_client.aclose()
+        self._dns_cache.clear()
+
+
+http_client_pool = HttpClientPool()
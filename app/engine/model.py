@@ -1,11 +1,15 @@
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+import threading
 from langchain_openai import ChatOpenAI
 from sqlalchemy.orm import Session
 from app.models.ai.model import Model
 from app.models.ai.api_key import ApiKey
 from app.crud.ai.model import model as model_crud
 from app.crud.ai.api_key import api_key as api_key_crud
+from app.schemas.ai.chat_config import EffectiveChatConfig
 from app.core.config import settings
+from app.engine.http_client import http_client_pool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,16 +45,34 @@ class ModelFactory:
         }
     }
 
+    # 已创建的模型实例缓存（LRU），key 为 (平台, API密钥, 地址, 模型, 采样参数...)
+    _model_cache: "OrderedDict[Tuple, ChatOpenAI]" = OrderedDict()
+    _model_cache_lock = threading.Lock()
+
     @classmethod
-    def get_or_create_chat_model(cls, platform: str, api_key: str, url: str = None, model_name: str = None) -> ChatOpenAI:
+    def get_or_create_chat_model(cls,
+                                 platform: str,
+                                 api_key: str,
+                                 url: str = None,
+                                 model_name: str = None,
+                                 temperature: float = 0.7,
+                                 max_tokens: int = 2000,
+                                 timeout: int = 15,
+                                 **kwargs) -> ChatOpenAI:
         """
         根据平台创建或获取聊天模型实例（参考芋道项目模式）
+
+        相同配置的实例会被复用，以复用其底层 HTTP 连接。
         
         Args:
             platform: 平台名称 (支持任意平台，优先使用数据库配置)
             api_key: API密钥
             url: API地址（可选，使用默认值）
             model_name: 模型名称（可选，使用默认值）
+            temperature: 温度参数
+            max_tokens: 单条回复的最大 Token 数量
+            timeout: 请求超时时间（秒）
+            **kwargs: 其他透传给 ChatOpenAI 的参数（需可哈希）
             
         Returns:
             ChatOpenAI: 模型实例
@@ -70,20 +92,80 @@ class ModelFactory:
             # 如果都没有提供，给出友好的错误提示
             if not base_url or not model:
                 raise ValueError(f"平台 {platform} 未在配置中定义，请确保数据库中的API密钥和模型配置完整")
-        
+
+        cache_key = (
+            platform_lower, api_key, base_url, model,
+            temperature, max_tokens, timeout,
+            tuple(sorted(kwargs.items())),
+        )
+        with cls._model_cache_lock:
+            cached = cls._model_cache.get(cache_key)
+            if cached is not None:
+                cls._model_cache.move_to_end(cache_key)
+                logger.debug(f"复用 {platform} 模型实例: model={model}, base_url={base_url}")
+                return cached
+
         logger.info(f"创建 {platform} 模型实例: model={model}, base_url={base_url}")
         
-        return ChatOpenAI(
+        http_client, http_async_client = http_client_pool.get_clients(base_url)
+        llm = ChatOpenAI(
             model=model,
             api_key=api_key,
             base_url=base_url,
-            temperature=0.7,
-            max_tokens=2000,
-            timeout=15,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            # 流式调用时在最后一个增量中返回 token 用量
+            stream_usage=settings.MODEL_STREAM_USAGE,
+            **kwargs
         )
 
+        with cls._model_cache_lock:
+            # 并发创建时以先放入缓存的实例为准
+            cached = cls._model_cache.get(cache_key)
+            if cached is not None:
+                cls._model_cache.move_to_end(cache_key)
+                return cached
+            cls._model_cache[cache_key] = llm
+            while len(cls._model_cache) > settings.MODEL_CACHE_MAX_SIZE:
+                cls._model_cache.popitem(last=False)
+        return llm
+
+    @classmethod
+    def invalidate_cached_models(cls, api_key: str = None, model_name: str = None) -> int:
+        """
+        清除缓存的模型实例
+
+        Args:
+            api_key: 只清除使用该API密钥的实例（可选）
+            model_name: 只清除该模型标识的实例（可选）
+
+        两个参数都不传时清空全部缓存。
+
+        Returns:
+            int: 被清除的实例数量
+        """
+        with cls._model_cache_lock:
+            if api_key is None and model_name is None:
+                count = len(cls._model_cache)
+                cls._model_cache.clear()
+            else:
+                stale_keys = [
+                    key for key in cls._model_cache
+                    if (api_key is None or key[1] == api_key)
+                    and (model_name is None or key[3] == model_name)
+                ]
+                for key in stale_keys:
+                    del cls._model_cache[key]
+                count = len(stale_keys)
+        if count:
+            logger.info(f"清除了 {count} 个缓存的模型实例")
+        return count
+
     @classmethod
-    def create_model_by_id(cls, db: Session, model_id: int, user_id: int) -> ChatOpenAI:
+    def create_model_by_id(cls, db: Session, model_id: int, user_id: int, **overrides) -> ChatOpenAI:
         """
         根据模型ID创建AI模型实例（参考芋道项目的 AiModelServiceImpl.getChatModel）
         
@@ -91,6 +173,7 @@ class ModelFactory:
             db: 数据库会话
             model_id: 模型ID
             user_id: 用户ID
+            **overrides: 覆盖默认值的模型参数（如 temperature、max_tokens）
             
         Returns:
             ChatOpenAI: 模型实例
@@ -126,12 +209,37 @@ class ModelFactory:
         logger.info(f"找到API密钥配置: {api_key_config.name} (ID: {model_config.key_id})")
 
         # 3. 创建模型实例
-        return cls.get_or_create_chat_model(
-            platform=model_config.platform,
-            api_key=api_key_config.api_key,
-            url=api_key_config.url,
-            model_name=model_config.model
-        )
+        params = {
+            "platform": model_config.platform,
+            "api_key": api_key_config.api_key,
+            "url": api_key_config.url,
+            "model_name": model_config.model,
+        }
+        params.update(overrides)
+        return cls.get_or_create_chat_model(**params)
+
+    @classmethod
+    def create_model_from_config(cls, config: EffectiveChatConfig, **overrides) -> ChatOpenAI:
+        """
+        根据已解析的对话配置创建AI模型实例，不访问数据库
+
+        Args:
+            config: 对话配置快照
+            **overrides: 覆盖默认值的模型参数（如 temperature、max_tokens）
+
+        Returns:
+            ChatOpenAI: 模型实例
+        """
+        if config.error:
+            raise ValueError(config.error)
+        params = {
+            "platform": config.platform,
+            "api_key": config.api_key,
+            "url": config.api_url,
+            "model_name": config.llm_model,
+        }
+        params.update(overrides)
+        return cls.get_or_create_chat_model(**params)
 
     @classmethod
     def create_model_with_config(cls, 
@@ -151,27 +259,13 @@ class ModelFactory:
         Returns:
             ChatOpenAI: 模型实例
         """
-        # 创建基础模型
-        model = cls.create_model_by_id(db, model_id, user_id)
-        
-        # 如果有自定义配置，重新创建模型实例
-        if custom_config:
-            # 获取当前模型的配置
-            current_config = {
-                "model": model.model_name,
-                "api_key": model.openai_api_key,
-                "base_url": model.openai_api_base,
-                "temperature": getattr(model, 'temperature', 0.7),
-                "max_tokens": getattr(model, 'max_tokens', 2000),
-                "timeout": 15,
-            }
-            # 应用自定义配置
-            current_config.update(custom_config)
-            
-            # 重新创建模型实例
-            model = ChatOpenAI(**current_config)
-        
-        return model
+        overrides = dict(custom_config or {})
+        # 兼容 ChatOpenAI 的参数名
+        if "model" in overrides:
+            overrides["model_name"] = overrides.pop("model")
+        if "base_url" in overrides:
+            overrides["url"] = overrides.pop("base_url")
+        return cls.create_model_by_id(db, model_id, user_id, **overrides)
 
 def get_chat_openai_model(api_key: str = None):
     """
@@ -186,6 +280,7 @@ def get_chat_openai_model(api_key: str = None):
     if api_key is None:
         api_key = settings.MODEL_API_KEY
         
+    http_client, http_async_client = http_client_pool.get_clients(settings.MODEL_BASE_URL)
     model = ChatOpenAI(
         model=settings.MODEL_NAME,
         temperature=settings.MODEL_TEMPERATURE,
@@ -193,6 +288,8 @@ def get_chat_openai_model(api_key: str = None):
         base_url=settings.MODEL_BASE_URL,
         max_tokens=4096,  # 默认值
         timeout=60,
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
     return model
 
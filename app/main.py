@@ -1,7 +1,17 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.api import api_router
+from app.engine.http_client import http_client_pool
+from app.core.cache import cache
+from app.core.middleware import MetricsMiddleware, TracingMiddleware
+from app.core.tracing import tracer
+from app.services.login_info_writer import login_info_writer
+from app.services.ai.chat_context import token_counter
+from app.services.ai.chat_summary import chat_summarizer
+from app.services.ai.token_usage import token_usage_writer
+from app.utils.password import shutdown_hash_executor
 import logging
 
 def create_app() -> FastAPI:
@@ -24,9 +34,49 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # 请求耗时与进行中请求数指标（/api/v1/metrics）
+    app.add_middleware(MetricsMiddleware)
+    # 请求链路追踪（DEBUG_TRACES_ENABLED 开启时可通过 /api/v1/debug/traces 查看）
+    app.add_middleware(TracingMiddleware)
+
     # Include API router (包含认证路由)
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
+    @app.on_event("startup")
+    async def load_tokenizer():
+        # 首次加载可能需要下载编码文件，最多等待 CHAT_TOKENIZER_LOAD_TIMEOUT 秒，不在首个对话请求中加载
+        await run_in_threadpool(token_counter.load, settings.CHAT_TOKENIZER_LOAD_TIMEOUT)
+
+    @app.on_event("shutdown")
+    async def close_http_clients():
+        # 关闭模型平台的共享 HTTP 连接池
+        await http_client_pool.aclose()
+
+    @app.on_event("shutdown")
+    async def flush_login_info():
+        # 写入尚未落库的登录信息
+        login_info_writer.stop()
+        shutdown_hash_executor()
+
+    @app.on_event("shutdown")
+    async def stop_chat_summarizer():
+        # 未完成的摘要合并在下一条回复时重新提交；先于 token 用量停止，摘要的用量才能写入
+        chat_summarizer.stop()
+
+    @app.on_event("shutdown")
+    async def flush_token_usage():
+        # 写入尚未汇总的 token 用量
+        token_usage_writer.stop()
+
+    @app.on_event("shutdown")
+    async def close_cache():
+        cache.close()
+
+    @app.on_event("shutdown")
+    async def flush_traces():
+        if tracer.exporter is not None:
+            tracer.exporter.stop()
+
     return app
 
 app = create_app()
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Index
 from sqlalchemy.sql import func
 from app.db.session import Base
 
 class ApiKey(Base):
     __tablename__ = "ai_api_key"
+    __table_args__ = (
+        Index("idx_api_key_user", "user_id", "deleted"),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True, comment="编号")
     user_id = Column(BigInteger, nullable=False, comment="用户编号")
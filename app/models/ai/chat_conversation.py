@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, Double, ForeignKey
+from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, Double, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
@@ -6,6 +6,12 @@ from datetime import datetime
 
 class ChatConversation(Base):
     __tablename__ = "ai_chat_conversation"
+    __table_args__ = (
+        # 对话列表：置顶在前，按编号倒序
+        Index("idx_chat_conversation_user", "user_id", "deleted", "pinned", "id"),
+        Index("idx_chat_conversation_user_time", "user_id", "deleted", "pinned", "create_time"),
+        Index("idx_chat_conversation_user_model", "user_id", "model_id", "deleted", "create_time"),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True, comment="对话编号")
     user_id = Column(BigInteger, nullable=False, comment="用户编号")
@@ -19,6 +25,7 @@ class ChatConversation(Base):
     temperature = Column(Double, nullable=False, comment="温度参数")
     max_tokens = Column(Integer, nullable=False, comment="单条回复的最大 Token 数量")
     max_contexts = Column(Integer, nullable=False, comment="上下文的最大 Message 数量")
+    summary_memory = Column(Boolean, nullable=False, default=False, comment="是否开启摘要记忆")
     
     # 通用字段
     creator = Column(String(64), comment="创建人")
@@ -30,8 +37,9 @@ class ChatConversation(Base):
     
     # 关联关系
     messages = relationship("ChatMessage", back_populates="conversation", lazy="dynamic")
-    role = relationship("ChatRole", foreign_keys=[role_id], lazy="joined")
-    ai_model = relationship("Model", foreign_keys=[model_id], lazy="joined")
+    # 默认按需加载，需要预先连接时由 CRUD 的加载配置指定
+    role = relationship("ChatRole", foreign_keys=[role_id], lazy="select")
+    ai_model = relationship("Model", foreign_keys=[model_id], lazy="select")
     
     def __repr__(self):
         return f"<ChatConversation(id={self.id}, title='{self.title}', user_id={self.user_id})>"
@@ -50,6 +58,7 @@ class ChatConversation(Base):
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
             'max_contexts': self.max_contexts,
+            'summary_memory': self.summary_memory,
             'create_time': int(self.create_time.timestamp() * 1000) if self.create_time else None,
             'role_avatar': self.role.avatar if self.role else None,
             'role_name': self.role.name if self.role else None,
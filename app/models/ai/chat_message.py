@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
@@ -6,6 +6,14 @@ import json
 
 class ChatMessage(Base):
     __tablename__ = "ai_chat_message"
+    __table_args__ = (
+        # 按对话分页
+        Index("idx_chat_message_conversation", "conversation_id", "user_id", "deleted", "id"),
+        # 按用户分页
+        Index("idx_chat_message_user", "user_id", "deleted", "id"),
+        # 上下文、最新消息、按对话统计消息数
+        Index("idx_chat_message_conversation_time", "conversation_id", "deleted", "create_time"),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True, comment="消息编号")
     conversation_id = Column(BigInteger, ForeignKey("ai_chat_conversation.id"), nullable=False, comment="对话编号")
@@ -18,6 +26,12 @@ class ChatMessage(Base):
     content = Column(Text, nullable=False, comment="消息内容")
     use_context = Column(Boolean, nullable=False, default=False, comment="是否携带上下文")
     segment_ids = Column(String(2048), comment="段落编号数组")
+    finish_reason = Column(String(16), comment="结束原因（stop 正常结束，truncated 客户端断开后截断）")
+    # AI回复的用量与耗时
+    prompt_tokens = Column(Integer, comment="输入 token 数")
+    completion_tokens = Column(Integer, comment="输出 token 数")
+    latency_ms = Column(Integer, comment="生成总耗时（毫秒）")
+    first_token_ms = Column(Integer, comment="首字耗时（毫秒）")
     
     # 通用字段
     creator = Column(String(64), comment="创建人")
@@ -28,9 +42,10 @@ class ChatMessage(Base):
     tenant_id = Column(BigInteger, comment="租户编号")
     
     # 关联关系
-    conversation = relationship("ChatConversation", back_populates="messages", lazy="joined")
-    role = relationship("ChatRole", foreign_keys=[role_id], lazy="joined")
-    ai_model = relationship("Model", foreign_keys=[model_id], lazy="joined")
+    # 默认按需加载，需要预先连接时由 CRUD 的加载配置指定
+    conversation = relationship("ChatConversation", back_populates="messages", lazy="select")
+    role = relationship("ChatRole", foreign_keys=[role_id], lazy="select")
+    ai_model = relationship("Model", foreign_keys=[model_id], lazy="select")
     
     def __repr__(self):
         return f"<ChatMessage(id={self.id}, type='{self.type}', conversation_id={self.conversation_id})>"
@@ -48,6 +63,11 @@ class ChatMessage(Base):
             'content': self.content,
             'use_context': self.use_context,
             'segment_ids': self.segment_ids,
+            'finish_reason': self.finish_reason,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'latency_ms': self.latency_ms,
+            'first_token_ms': self.first_token_ms,
             'creator': self.creator,
             'create_time': self.create_time.isoformat() if self.create_time else None,
             'updater': self.updater,
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, BigInteger, String, Integer, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
 class ChatRole(Base):
     __tablename__ = "ai_chat_role"
+    __table_args__ = (
+        # 角色分页、公开角色、按分类/模型查询
+        Index("idx_chat_role_sort", "deleted", "sort"),
+        Index("idx_chat_role_user", "user_id", "deleted", "sort"),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True, comment="角色编号")
     user_id = Column(BigInteger, comment="用户编号")
@@ -18,6 +23,7 @@ class ChatRole(Base):
     knowledge_ids = Column(String(256), comment="关联的知识库编号数组")
     tool_ids = Column(String(256), comment="关联的工具编号数组")
     public_status = Column(Boolean, nullable=False, comment="是否公开")
+    summary_memory = Column(Boolean, nullable=False, default=False, comment="是否开启摘要记忆")
     status = Column(Integer, comment="状态")
     
     # 通用字段
@@ -31,7 +37,7 @@ class ChatRole(Base):
     # 关联关系
     conversations = relationship("ChatConversation", back_populates="role", lazy="dynamic")
     messages = relationship("ChatMessage", back_populates="role", lazy="dynamic")
-    ai_model = relationship("Model", foreign_keys=[model_id], lazy="joined")
+    ai_model = relationship("Model", foreign_keys=[model_id], lazy="select")
     
     def __repr__(self):
         return f"<ChatRole(id={self.id}, name='{self.name}', category='{self.category}')>"
@@ -50,6 +56,7 @@ class ChatRole(Base):
             'knowledge_ids': self.knowledge_ids,
             'tool_ids': self.tool_ids,
             'public_status': self.public_status,
+            'summary_memory': self.summary_memory,
             'status': self.status,
             'creator': self.creator,
             'create_time': self.create_time.isoformat() if self.create_time else None,
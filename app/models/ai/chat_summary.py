@@ -0,0 +1,19 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, Text
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class ChatSummary(Base):
+    """对话的滚动摘要：较早的消息由后台增量合并进来，last_message_id 之前（含）的消息已包含在摘要中"""
+    __tablename__ = "ai_chat_summary"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="编号")
+    conversation_id = Column(BigInteger, nullable=False, unique=True, comment="对话编号")
+    content = Column(Text, nullable=False, comment="摘要内容")
+    last_message_id = Column(BigInteger, nullable=False, comment="已合并进摘要的最后一条消息编号")
+    message_count = Column(Integer, nullable=False, default=0, comment="已合并进摘要的消息数量")
+
+    create_time = Column(DateTime, nullable=False, server_default=func.now(), comment="创建时间")
+    update_time = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    def __repr__(self):
+        return f"<ChatSummary(conversation_id={self.conversation_id}, last_message_id={self.last_message_id})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship
@@ -7,6 +7,9 @@ from app.models.ai.api_key import ApiKey
 
 class Model(Base):
     __tablename__ = "ai_model"
+    __table_args__ = (
+        Index("idx_model_user", "user_id", "deleted", "sort"),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True, comment="编号")
     user_id = Column(BigInteger, nullable=False, comment="用户编号")
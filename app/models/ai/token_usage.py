@@ -0,0 +1,31 @@
+from sqlalchemy import Column, BigInteger, Integer, Date, DateTime, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class ChatTokenUsage(Base):
+    """按用户、模型、日期汇总的 token 用量（由 TokenUsageWriter 批量累加）"""
+    __tablename__ = "ai_chat_token_usage"
+    __table_args__ = (
+        UniqueConstraint("user_id", "model_id", "stat_date", name="uk_chat_token_usage_user_model_date"),
+        # 按模型统计
+        Index("idx_chat_token_usage_model_date", "model_id", "stat_date"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="编号")
+    user_id = Column(BigInteger, nullable=False, comment="用户编号")
+    model_id = Column(BigInteger, nullable=False, comment="模型编号")
+    stat_date = Column(Date, nullable=False, comment="统计日期")
+    request_count = Column(Integer, nullable=False, default=0, comment="调用次数")
+    prompt_tokens = Column(BigInteger, nullable=False, default=0, comment="输入 token 数")
+    completion_tokens = Column(BigInteger, nullable=False, default=0, comment="输出 token 数")
+    total_latency_ms = Column(BigInteger, nullable=False, default=0, comment="生成总耗时（毫秒）")
+
+    create_time = Column(DateTime, nullable=False, server_default=func.now(), comment="创建时间")
+    update_time = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    @property
+    def total_tokens(self) -> int:
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+    def __repr__(self):
+        return f"<ChatTokenUsage(user_id={self.user_id}, model_id={self.model_id}, stat_date={self.stat_date})>"
@@ -0,0 +1,27 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class EffectiveChatConfig(BaseModel):
+    """
+    一轮对话实际生效的配置快照
+
+    由 对话 -> 角色 -> 模型 -> API 密钥 解析而来，在发送消息时解析一次，
+    之后沿调用链传递，调用模型前不再查询这几张表。
+    """
+    conversation_id: int = Field(..., description="对话编号")
+    user_id: int = Field(..., description="对话所属用户编号")
+    role_id: Optional[int] = Field(None, description="生效的聊天角色编号")
+    system_message: Optional[str] = Field(None, description="生效的角色设定")
+    temperature: Optional[float] = Field(None, description="温度参数")
+    max_tokens: Optional[int] = Field(None, description="单条回复的最大 Token 数量")
+    max_contexts: int = Field(10, description="上下文的最大 Message 数量")
+    summary_memory: bool = Field(False, description="是否开启摘要记忆（对话或角色开启即生效）")
+    model_id: int = Field(..., description="生效的模型编号")
+    model: str = Field(..., description="写入消息记录的模型标识")
+    model_name: Optional[str] = Field(None, description="模型名字")
+    llm_model: Optional[str] = Field(None, description="调用平台时使用的模型标识")
+    platform: Optional[str] = Field(None, description="模型平台")
+    # 密钥不参与序列化与 repr，快照被记录或缓存时不会带出
+    api_key: Optional[str] = Field(None, description="API 密钥", exclude=True, repr=False)
+    api_url: Optional[str] = Field(None, description="自定义 API 地址")
+    error: Optional[str] = Field(None, description="模型不可用的原因，为空表示可以调用")
@@ -12,6 +12,7 @@ class ChatConversationBase(BaseModel):
     temperature: float = Field(..., description="温度参数")
     max_tokens: int = Field(..., description="单条回复的最大 Token 数量")
     max_contexts: int = Field(..., description="上下文的最大 Message 数量")
+    summary_memory: bool = Field(False, description="是否开启摘要记忆：较早的消息合并为摘要，提示词为摘要 + 最近的消息")
 
 class ChatConversationCreate(ChatConversationBase):
     pass
@@ -27,6 +28,7 @@ class ChatConversationUpdate(BaseModel):
     temperature: Optional[float] = Field(None, description="温度参数")
     max_tokens: Optional[int] = Field(None, description="单条回复的最大 Token 数量")
     max_contexts: Optional[int] = Field(None, description="上下文的最大 Message 数量")
+    summary_memory: Optional[bool] = Field(None, description="是否开启摘要记忆")
 
 class ChatConversationResp(ChatConversationBase, BaseResp):
     user_id: Optional[int] = Field(None, description="用户编号")
@@ -54,6 +56,7 @@ class ChatConversationSimpleResp(BaseModel):
     temperature: float = Field(..., description="温度参数")
     max_tokens: int = Field(..., description="单条回复的最大 Token 数量")
     max_contexts: int = Field(..., description="上下文的最大 Message 数量")
+    summary_memory: bool = Field(False, description="是否开启摘要记忆")
     create_time: Optional[int] = Field(None, description="创建时间")
     role_avatar: Optional[str] = Field(None, description="角色头像")
     role_name: Optional[str] = Field(None, description="角色名称")
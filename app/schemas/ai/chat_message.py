@@ -13,6 +13,11 @@ class ChatMessageBase(BaseModel):
     content: str = Field(..., description="消息内容")
     use_context: bool = Field(True, description="是否携带上下文")
     segment_ids: Optional[str] = Field(None, description="段落编号数组")
+    finish_reason: Optional[str] = Field(None, description="结束原因")
+    prompt_tokens: Optional[int] = Field(None, description="输入 token 数")
+    completion_tokens: Optional[int] = Field(None, description="输出 token 数")
+    latency_ms: Optional[int] = Field(None, description="生成总耗时（毫秒）")
+    first_token_ms: Optional[int] = Field(None, description="首字耗时（毫秒）")
 
 class ChatMessageCreate(ChatMessageBase):
     pass
@@ -14,6 +14,7 @@ class ChatRoleBase(BaseModel):
     knowledge_ids: Optional[str] = Field(None, description="关联的知识库编号数组")
     tool_ids: Optional[str] = Field(None, description="关联的工具编号数组")
     public_status: bool = Field(..., description="是否公开")
+    summary_memory: bool = Field(False, description="是否开启摘要记忆（使用该角色的对话均生效）")
     status: Optional[int] = Field(0, description="状态")
 
 class ChatRoleCreate(ChatRoleBase):
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+class ChatSummaryCreate(BaseModel):
+    conversation_id: int = Field(..., description="对话编号")
+    content: str = Field(..., description="摘要内容")
+    last_message_id: int = Field(..., description="已合并进摘要的最后一条消息编号")
+    message_count: int = Field(0, description="已合并进摘要的消息数量")
+
+class ChatSummaryUpdate(ChatSummaryCreate):
+    id: int = Field(..., description="编号")
@@ -0,0 +1,26 @@
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class TokenUsage(BaseModel):
+    """一次模型调用的用量，由 ChatService 在调用结束时填写"""
+    prompt_tokens: Optional[int] = Field(None, description="输入 token 数（平台未返回时为空）")
+    completion_tokens: Optional[int] = Field(None, description="输出 token 数（平台未返回时按增量块数估算）")
+    latency_ms: Optional[int] = Field(None, description="生成总耗时（毫秒）")
+    first_token_ms: Optional[int] = Field(None, description="首字耗时（毫秒，仅流式）")
+
+    @property
+    def total_tokens(self) -> int:
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+class ChatTokenUsageCreate(BaseModel):
+    user_id: int = Field(..., description="用户编号")
+    model_id: int = Field(..., description="模型编号")
+    stat_date: date = Field(..., description="统计日期")
+    request_count: int = Field(0, description="调用次数")
+    prompt_tokens: int = Field(0, description="输入 token 数")
+    completion_tokens: int = Field(0, description="输出 token 数")
+    total_latency_ms: int = Field(0, description="生成总耗时（毫秒）")
+
+class ChatTokenUsageUpdate(ChatTokenUsageCreate):
+    id: int = Field(..., description="编号")
@@ -1,3 +1,8 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Sequence
 from pydantic import BaseModel, Field
 
 class PageParam(BaseModel):
@@ -12,3 +17,33 @@ class PageParam(BaseModel):
     def get_limit(self) -> int:
         """获取限制的记录数"""
         return self.pageSize
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析，或与当前查询的排序键不匹配"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """将排序键的取值编码为不透明的游标字符串"""
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """解析游标字符串，格式错误时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("游标格式错误") from e
+    if not isinstance(values, list):
+        raise ValueError("游标格式错误")
+    return values
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"无法编码到游标中的类型: {type(value).__name__}")
@@ -12,12 +12,19 @@ class ResponseModel(BaseModel, Generic[DataT]):
 class PageParam(BaseModel):
     pageNo: int = 1
     pageSize: int = 10
+    # 游标分页：传入 cursor（首页传空字符串）时按排序键定位，忽略 pageNo，深分页与首页开销相同
+    cursor: Optional[str] = Field(None, description="游标，取上一页返回的 nextCursor；首页传空字符串")
+    withTotal: bool = Field(False, description="游标分页时是否统计总数")
+
+    def is_cursor_mode(self) -> bool:
+        return self.cursor is not None
 
 class PageResult(BaseModel, Generic[DataT]):
     list: List[DataT]
-    total: int
+    total: Optional[int] = None  # 游标分页且未要求统计时为空
     pageNo: int
     pageSize: int
+    nextCursor: Optional[str] = None  # 游标分页时下一页的游标，没有更多数据时为空
 
 class BaseResp(BaseModel):
     id: int
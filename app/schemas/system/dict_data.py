@@ -1,5 +1,6 @@
 from typing import Optional
 from pydantic import BaseModel, Field
+from app.schemas.common.response import PageParam
 
 class DictDataBase(BaseModel):
     sort: int = Field(..., description="排序")
@@ -32,9 +33,7 @@ class DictDataSimpleResp(BaseModel):
     color_type: Optional[str] = Field(None, description="颜色类型")
     css_class: Optional[str] = Field(None, description="CSS 样式")
 
-class DictDataPageReq(BaseModel):
+class DictDataPageReq(PageParam):
     label: Optional[str] = Field(None, description="字典标签")
     dict_type: Optional[str] = Field(None, description="字典类型")
     status: Optional[int] = Field(None, description="状态")
-    pageNo: int = Field(1, description="页码")
-    pageSize: int = Field(10, description="每页大小")
@@ -1,5 +1,6 @@
 from typing import Optional
 from pydantic import BaseModel, Field
+from app.schemas.common.response import PageParam
 
 class DictTypeBase(BaseModel):
     name: str = Field(..., description="字典名称")
@@ -22,9 +23,15 @@ class DictTypeResp(DictTypeBase):
     deleted: Optional[bool] = Field(None, description="是否删除")
     deleted_time: Optional[str] = Field(None, description="删除时间")
 
-class DictTypePageReq(BaseModel):
+class DictTypeSimpleResp(BaseModel):
+    id: int = Field(..., description="编号")
+    name: str = Field(..., description="字典名称")
+    type: str = Field(..., description="字典类型")
+
+    class Config:
+        from_attributes = True
+
+class DictTypePageReq(PageParam):
     name: Optional[str] = Field(None, description="字典名称")
     type: Optional[str] = Field(None, description="字典类型")
     status: Optional[int] = Field(None, description="状态")
-    pageNo: int = Field(1, description="页码")
-    pageSize: int = Field(10, description="每页大小")
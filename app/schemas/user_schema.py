@@ -84,6 +84,25 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserPrincipal(BaseModel):
+    """已认证用户的身份信息，由 get_current_user 返回并按用户ID缓存"""
+    id: int
+    username: str
+    nickname: str
+    email: Optional[str] = None
+    mobile: Optional[str] = None
+    avatar: Optional[str] = None
+    status: int
+    login_date: Optional[datetime] = None
+    create_time: datetime
+
+    class Config:
+        from_attributes = True
+
+    def is_active(self) -> bool:
+        """检查用户是否处于正常状态"""
+        return self.status == 0
+
 class LoginResponse(BaseModel):
     """登录响应"""
     code: int = 200
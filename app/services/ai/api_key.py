@@ -3,8 +3,10 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from app.crud.ai.api_key import api_key
 from app.schemas.ai.api_key import ApiKeyCreate, ApiKeyUpdate, ApiKeyPageReq, ApiKeyResp
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from app.models.ai.api_key import ApiKey
+from app.engine.model import ModelFactory
 
 class ApiKeyService:
     @staticmethod
@@ -38,7 +40,9 @@ class ApiKeyService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="API Key name already exists"
             )
+        old_api_key = db_api_key.api_key
         db_obj = api_key.update(db, db_obj=db_api_key, obj_in=api_key_in)
+        ModelFactory.invalidate_cached_models(api_key=old_api_key)
         return ResponseModel(data=ApiKeyResp.model_validate(db_obj))
 
     @staticmethod
@@ -50,6 +54,7 @@ class ApiKeyService:
                 detail="API Key not found"
             )
         db_obj = api_key.soft_delete(db, id=id)
+        ModelFactory.invalidate_cached_models(api_key=db_obj.api_key)
         return ResponseModel(data=ApiKeyResp.model_validate(db_obj))
     
     @staticmethod
@@ -63,6 +68,7 @@ class ApiKeyService:
             )
         # 恢复已删除的记录
         db_obj = api_key.restore(db, id=id)
+        ModelFactory.invalidate_cached_models(api_key=db_obj.api_key)
         return ResponseModel(data=ApiKeyResp.model_validate(db_obj))
 
     @staticmethod
@@ -82,11 +88,15 @@ class ApiKeyService:
 
     @staticmethod
     def get_api_key_page(db: Session, page: ApiKeyPageReq, user_id: int) -> ResponseModel[PageResult[ApiKeyResp]]:
-        items, total = api_key.get_page(db, page=page, user_id=user_id)
+        try:
+            items, total, next_cursor = api_key.get_page(db, page=page, user_id=user_id)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         page_result = PageResult(
             list=[ApiKeyResp.model_validate(item) for item in items],
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         return ResponseModel(data=page_result)
@@ -1,211 +1,343 @@
-from typing import List, Optional
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from langchain_openai import ChatOpenAI
 from sqlalchemy.orm import Session
-from app.crud.ai.chat_message import chat_message
-from app.crud.ai.model import model
-from app.crud.ai.api_key import api_key
+from app.core.config import settings
+from app.core.metrics import LLM_GENERATION_DURATION, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS_PER_SECOND
+from app.core.tracing import KIND_CLIENT, tracer
+from app.crud.ai.chat_message import ContextMessage, chat_message
+from app.crud.ai.chat_summary import chat_summary
 from app.engine.model import ModelFactory
-from app.services.chat.chat import get_session_history
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage
-from langchain_core.runnables import RunnableWithMessageHistory
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.schemas.ai.token_usage import TokenUsage
+from app.services.ai.chat_context import fit_context, get_context_budget, token_counter
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 import logging
 import json
+import time
 
 logger = logging.getLogger(__name__)
 
+# 消息类型 -> LangChain 消息类
+MESSAGE_CLASSES = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "assistant": AIMessage,
+}
+
+@lru_cache(maxsize=1024)
+def _render_system_prompt(model_name: Optional[str], llm_model: Optional[str], platform: Optional[str],
+                          system_message: Optional[str], language: str) -> str:
+    """渲染模型身份与角色设定组成的系统提示，相同的配置只渲染一次"""
+    model_identity_prompt = f"你是一个名为 {model_name} ({llm_model}) 的AI助手，你的平台是 {platform}。你只应该自称 {model_name} ({llm_model})，不要自称为DeepSeek或通义千问或任何其他平台/模型。"
+    # 如果有自定义的 system_message，则将其追加到模型身份之后
+    if system_message:
+        final_system_prompt_content = model_identity_prompt + system_message
+    else:
+        final_system_prompt_content = model_identity_prompt
+    return final_system_prompt_content + f"用{language}尽你所能回答所有问题。"
+
+
+class GenerationMetrics:
+    """
+    一次模型调用的耗时统计：首字耗时、总耗时与生成速度，仅在调用成功完成时记录指标；
+    同时在当前请求的 trace 中记录一个 llm.<mode> span，并把用量写入调用方传入的 usage
+    """
+
+    def __init__(self, config: EffectiveChatConfig, mode: str, usage: Optional[TokenUsage] = None):
+        self.labels = {"platform": config.platform or "", "model": config.llm_model or ""}
+        self.mode = mode
+        self.usage = usage
+        self.start = time.perf_counter()
+        self.first_token_time: Optional[float] = None
+        self.chunks = 0
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.span = tracer.start_span(f"llm.{mode}", KIND_CLIENT, **{
+            "llm.platform": self.labels["platform"],
+            "llm.model": self.labels["model"],
+        })
+
+    def on_chunk(self, chunk: BaseMessage) -> None:
+        """流式调用每收到一个增量块调用一次"""
+        self._add_usage(getattr(chunk, "usage_metadata", None))
+        if not chunk.content:
+            return
+        self.chunks += 1
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.observe(self.first_token_time - self.start, **self.labels)
+            if self.span is not None:
+                self.span.set_attribute("llm.time_to_first_token_ms", round((self.first_token_time - self.start) * 1000, 3))
+
+    def _add_usage(self, usage: Optional[dict]) -> None:
+        # 流式调用的用量在最后一个增量中返回（需要 stream_usage），按增量累加
+        if usage:
+            self.input_tokens = (self.input_tokens or 0) + usage.get("input_tokens", 0)
+            self.output_tokens = (self.output_tokens or 0) + usage.get("output_tokens", 0)
+
+    def _completion_tokens(self) -> Optional[int]:
+        # 流式且平台未返回用量时，OpenAI 兼容接口大致一个增量块对应一个 token
+        if self.output_tokens is not None:
+            return self.output_tokens
+        return self.chunks if self.mode == "stream" else None
+
+    def _fill_usage(self, end: float, tokens: Optional[int]) -> None:
+        if self.usage is None:
+            return
+        self.usage.prompt_tokens = self.input_tokens
+        self.usage.completion_tokens = tokens
+        self.usage.latency_ms = int((end - self.start) * 1000)
+        if self.first_token_time is not None:
+            self.usage.first_token_ms = int((self.first_token_time - self.start) * 1000)
+
+    def finish(self, response: Optional[BaseMessage] = None) -> None:
+        """调用成功结束；非流式调用传入完整回复"""
+        end = time.perf_counter()
+        LLM_GENERATION_DURATION.observe(end - self.start, mode=self.mode, **self.labels)
+
+        self._add_usage(getattr(response, "usage_metadata", None))
+        tokens = self._completion_tokens()
+        # 流式只统计首字之后的生成阶段，非流式无法区分排队与生成，按总耗时计算
+        elapsed = end - (self.first_token_time if self.first_token_time is not None else self.start)
+        if tokens and elapsed > 0:
+            LLM_TOKENS_PER_SECOND.observe(tokens / elapsed, **self.labels)
+        self._fill_usage(end, tokens)
+        if self.span is not None:
+            if self.input_tokens is not None:
+                self.span.set_attribute("llm.input_tokens", self.input_tokens)
+            if tokens is not None:
+                self.span.set_attribute("llm.output_tokens", tokens)
+            self.span.end()
+
+    def fail(self, error: BaseException) -> None:
+        """调用失败"""
+        if self.span is not None:
+            self.span.end(error)
+
+    def close(self) -> None:
+        """流式调用被调用方提前关闭（如客户端断开后取消生成）时记录已生成部分的用量并结束 span"""
+        if self.span is not None and self.span.end_ns is not None:
+            return
+        if self.usage is not None and self.usage.latency_ms is None:
+            self._fill_usage(time.perf_counter(), self._completion_tokens())
+        if self.span is not None:
+            self.span.set_attribute("llm.cancelled", True)
+            self.span.end()
+
+
+def _summary_page_size() -> int:
+    """
+    开启摘要记忆时每次读取的消息数量
+
+    合并器在未合并的消息达到 最近 + 一批 条时合并，再多留一批应对后台合并的滞后，
+    通常一页（且来自上下文缓存）就能读完摘要之后的消息。
+    """
+    return settings.CHAT_SUMMARY_RECENT_MESSAGES + 2 * settings.CHAT_SUMMARY_BATCH_MESSAGES
+
+
 class ChatService:
     
     @staticmethod
-    def get_ai_response(
-        db: Session,
-        conversation_id: int,
-        user_message: str,
-        model_id: int,
-        system_message: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 4096,
-        use_context: bool = True,
-        max_contexts: int = 10
-    ) -> str:
-        """获取AI回复"""
-        # 获取模型信息
-        db_model = model.get(db, id=model_id)
-        if not db_model:
-            logger.error(f"模型 {model_id} 不存在")
-            raise Exception("AI模型不存在")
-        
-        # 获取API密钥
-        db_api_key = api_key.get(db, id=db_model.key_id)
-        if not db_api_key:
-            logger.error(f"API密钥 {db_model.key_id} 不存在")
-            raise Exception("API密钥不存在")
-        
-        logger.info(f"使用模型 {db_model.name} ({db_model.platform}) 处理消息")
-        
-        # 构建最终的系统消息，包含模型身份
-        model_identity_prompt = f"你是一个名为 {db_model.name} ({db_model.model}) 的AI助手，你的平台是 {db_model.platform}。你只应该自称 {db_model.name} ({db_model.model})，不要自称为DeepSeek或通义千问或任何其他平台/模型。"
-        # 如果有自定义的 system_message，则将其追加到模型身份之后
-        if system_message:
-            final_system_prompt_content = model_identity_prompt + system_message
-        else:
-            final_system_prompt_content = model_identity_prompt
-        final_system_prompt_content += f"用{{language}}尽你所能回答所有问题。"
-        logger.info(f"最终系统提示: {final_system_prompt_content[:50]}...")
-        
-        try:
-            # 使用新的 ModelFactory 创建模型实例
-            custom_config = {}
-            if temperature is not None:
-                custom_config["temperature"] = temperature
-            if max_tokens is not None:
-                custom_config["max_tokens"] = max_tokens
+    def _build_context_messages(db: Session, conversation_id: int, max_contexts: int,
+                                exclude_message_id: Optional[int] = None,
+                                token_budget: Optional[int] = None,
+                                after_id: Optional[int] = None,
+                                summary_memory: bool = False) -> List[ContextMessage]:
+        """
+        构建上下文消息（按时间从旧到新）
 
-            logger.info(f"创建模型实例，自定义配置: {custom_config}")
-            llm = ModelFactory.create_model_with_config(
-                db=db,
-                model_id=model_id,
-                user_id=db_model.user_id,
-                custom_config=custom_config or None
-            )
+        给定 token_budget 时只保留预算内最近的消息；给定 after_id（已合并进摘要的最后一条消息）时
+        只保留其后的消息。开启摘要记忆时不受 max_contexts 限制，读取摘要之后的全部消息。
+        """
+        with tracer.span("chat.load_context", max_contexts=max_contexts) as span:
+            if summary_memory:
+                rows = ChatService._load_unsummarized_rows(
+                    db, conversation_id, exclude_message_id, token_budget, after_id
+                )
+            else:
+                rows = chat_message.get_context_rows(
+                    db, conversation_id=conversation_id, max_contexts=max_contexts, exclude_id=exclude_message_id
+                )
+                if after_id is not None:
+                    rows = [row for row in rows if row.id > after_id]
+            if token_budget is not None:
+                loaded = len(rows)
+                rows, tokens = fit_context(rows, token_budget)
+                span.set_attribute("token_budget", token_budget)
+                span.set_attribute("tokens", tokens)
+                span.set_attribute("dropped", loaded - len(rows))
+            span.set_attribute("messages", len(rows))
+            return rows
 
-            # 构建提示与链
-            prompt_template = ChatPromptTemplate.from_messages([
-                ('system', final_system_prompt_content),
-                MessagesPlaceholder(variable_name='chat_history'), # 放置对话历史
-                ('human', '{human_input}') # 放置当前用户输入
-            ])
-            chain = prompt_template | llm
-
-            runnable = RunnableWithMessageHistory(
-                chain,
-                input_messages_key='human_input', # 传递当前的用户输入
-                history_messages_key='chat_history', # 告诉 RunnableWithMessageHistory 历史消息的占位符变量名
-                get_session_history=lambda session_id: get_session_history(db, session_id, max_contexts) # 传递数据库会话和上下文限制
-            )
+    @staticmethod
+    def _load_unsummarized_rows(db: Session, conversation_id: int, exclude_message_id: Optional[int],
+                                token_budget: Optional[int], after_id: Optional[int]) -> List[ContextMessage]:
+        """
+        读取摘要之后的全部消息（按时间从旧到新）
 
-            config = {'configurable': {'session_id': str(conversation_id)}}
-            response = runnable.invoke({'human_input': user_message, 'language': '中文'},
-                config=config
+        先从上下文缓存读取最近的一页；合并器落后（合并失败、队列已满跳过、已有的长对话刚开启摘要记忆）
+        导致摘要之后的消息超过一页时，再从数据库往前逐页读取，直到读完或已超出 token 预算。
+        """
+        page_size = _summary_page_size()
+        rows = chat_message.get_context_rows(
+            db, conversation_id=conversation_id, max_contexts=page_size, exclude_id=exclude_message_id
+        )
+        complete = len(rows) < page_size
+        if after_id is not None:
+            unsummarized = [row for row in rows if row.id > after_id]
+            complete = complete or len(unsummarized) < len(rows)
+            rows = unsummarized
+        tokens = sum(token_counter.count_message(row) for row in rows) if token_budget is not None else 0
+        while not complete and (token_budget is None or tokens <= token_budget):
+            page = chat_message.get_rows_before(
+                db, conversation_id=conversation_id, before_id=rows[0].id, after_id=after_id, limit=page_size
             )
-            logger.info(f"模型原始回复: {response.content[:200]}...") # 打印模型原始回复
+            complete = len(page) < page_size
+            page = [row for row in page if row.id != exclude_message_id]
+            if token_budget is not None:
+                tokens += sum(token_counter.count_message(row) for row in page)
+            rows = page + rows
+        return rows
+
+    @staticmethod
+    def _load_summary(db: Session, config: EffectiveChatConfig) -> Tuple[Optional[str], Optional[int]]:
+        """读取对话的摘要记忆，返回 (摘要内容, 已合并的最后一条消息编号)，未开启或尚未生成时均为空"""
+        if not config.summary_memory:
+            return None, None
+        with tracer.span("chat.load_summary") as span:
+            summary = chat_summary.get_by_conversation_id(db, conversation_id=config.conversation_id)
+            span.set_attribute("found", summary is not None)
+        if summary is None:
+            return None, None
+        return summary.content, summary.last_message_id
+
+    @staticmethod
+    def _build_system_prompt(config: EffectiveChatConfig, system_message: Optional[str], language: str = '中文',
+                             summary: Optional[str] = None) -> str:
+        """构建最终的系统消息，包含模型身份，开启摘要记忆时附上此前对话的摘要"""
+        final_system_prompt_content = _render_system_prompt(
+            config.model_name, config.llm_model, config.platform, system_message, language
+        )
+        if summary:
+            final_system_prompt_content += f"\n\n以下是此前对话的摘要，请结合摘要与之后的对话回答：\n{summary}"
+        return final_system_prompt_content
 
-            return response.content
-            
+    @staticmethod
+    def _create_llm(config: EffectiveChatConfig) -> ChatOpenAI:
+        """按对话配置创建（或复用）模型实例"""
+        if config.error:
+            logger.error(f"模型 {config.model_id} 不可用: {config.error}")
+            raise Exception(config.error)
+
+        logger.info(f"使用模型 {config.model_name} ({config.platform}) 处理消息")
+        try:
+            custom_config = {}
+            if config.temperature is not None:
+                custom_config["temperature"] = config.temperature
+            if config.max_tokens is not None:
+                custom_config["max_tokens"] = config.max_tokens
+
+            logger.info(f"创建模型实例，自定义配置: {custom_config}")
+            return ModelFactory.create_model_from_config(config, **custom_config)
         except Exception as e:
-            logger.error(f"AI模型调用失败: {str(e)}", exc_info=True)
+            logger.error(f"AI模型创建失败: {str(e)}", exc_info=True)
             raise Exception(f"AI模型调用失败: {str(e)}")
-    
+
     @staticmethod
-    def _build_context_messages(db: Session, conversation_id: int, max_contexts: int) -> List[dict]:
-        """构建上下文消息"""
-        messages = chat_message.get_context_messages(db, conversation_id=conversation_id, max_contexts=max_contexts)
-        
-        context_messages = []
-        for msg in reversed(messages):  # 反转顺序，从旧到新
-            if msg.type == "user":
-                context_messages.append({"role": "user", "content": msg.content})
-            elif msg.type == "assistant":
-                context_messages.append({"role": "assistant", "content": msg.content})
-            elif msg.type == "system":
-                context_messages.append({"role": "system", "content": msg.content})
-        
-        return context_messages
-    
+    def _to_langchain_messages(context_messages: List[ContextMessage]) -> List[BaseMessage]:
+        """将上下文消息转换为 LangChain 的消息格式，未知类型的消息会被忽略"""
+        return [
+            MESSAGE_CLASSES[msg.type](content=msg.content)
+            for msg in context_messages
+            if msg.type in MESSAGE_CLASSES
+        ]
+
     @staticmethod
-    def stream_ai_response(
+    def _prepare_llm_call(
         db: Session,
-        conversation_id: int,
+        config: EffectiveChatConfig,
         user_message: str,
-        model_id: int,
-        system_message: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 4096,
         use_context: bool = True,
-        max_contexts: int = 10
-    ):
-        """流式获取AI回复（生成器）"""
-        # 获取模型信息
-        db_model = model.get(db, id=model_id)
-        if not db_model:
-            raise Exception("AI模型不存在")
-        
-        # 获取API密钥
-        db_api_key = api_key.get(db, id=db_model.key_id)
-        if not db_api_key:
-            raise Exception("API密钥不存在")
-        
-        # 构建最终的系统消息，包含模型身份
-        model_identity_prompt = f"你是一个名为 {db_model.name} ({db_model.model}) 的AI助手，你的平台是 {db_model.platform}。你只应该自称 {db_model.name} ({db_model.model})，不要自称为DeepSeek或通义千问或任何其他平台/模型。"
-        # 如果有自定义的 system_message，则将其追加到模型身份之后
-        if system_message:
-            final_system_prompt_content = model_identity_prompt + system_message
-        else:
-            final_system_prompt_content = model_identity_prompt
-        final_system_prompt_content += f"用{{language}}尽你所能回答所有问题。"
-        logger.info(f"最终系统提示 (流式): {final_system_prompt_content[:50]}...")
-
-        # 构建上下文消息（流式需要自己构建，因为get_session_history是针对RunnableWithMessageHistory的）
+        exclude_message_id: Optional[int] = None
+    ) -> Tuple[ChatOpenAI, List[BaseMessage]]:
+        """完成调用模型前的全部准备工作（只读取上下文消息），返回模型实例与完整的消息列表"""
+        llm = ChatService._create_llm(config)
+
+        summary_content, summary_last_id = ChatService._load_summary(db, config) if use_context else (None, None)
+        final_system_prompt_content = ChatService._build_system_prompt(
+            config, config.system_message, summary=summary_content
+        )
+        logger.info(f"最终系统提示: {final_system_prompt_content[:50]}...")
+
         context_messages = []
         if use_context:
-            context_messages = ChatService._build_context_messages(db, conversation_id, max_contexts)
-            logger.info(f"加载了 {len(context_messages)} 条上下文消息 (流式)")
-        
-        # 添加系统消息到上下文，作为对话的第一条消息
-        context_messages.insert(0, {"role": "system", "content": final_system_prompt_content})
-        logger.info("添加了系统消息到上下文 (流式)")
+            token_budget = get_context_budget(config, final_system_prompt_content, user_message)
+            # 开启摘要记忆时摘要之后的消息全部作为历史，只受 token 预算限制；max_contexts 只在未开启时生效
+            summary_memory = config.summary_memory and settings.CHAT_SUMMARY_BATCH_MESSAGES > 0
+            context_messages = ChatService._build_context_messages(
+                db, config.conversation_id, config.max_contexts, exclude_message_id, token_budget,
+                summary_last_id, summary_memory
+            )
+            logger.info(f"加载了 {len(context_messages)} 条上下文消息")
 
-        # 添加用户当前消息到上下文
-        context_messages.append({"role": "user", "content": user_message})
+        # 系统消息作为对话的第一条消息，用户当前消息作为最后一条
+        messages = [SystemMessage(content=final_system_prompt_content)]
+        messages.extend(ChatService._to_langchain_messages(context_messages))
+        messages.append(HumanMessage(content=user_message))
+        return llm, messages
 
+    @staticmethod
+    async def aget_ai_response(
+        db: Session,
+        config: EffectiveChatConfig,
+        user_message: str,
+        use_context: bool = True,
+        exclude_message_id: Optional[int] = None,
+        usage: Optional[TokenUsage] = None
+    ) -> str:
+        """获取AI回复（异步），数据库操作在线程池中执行，不阻塞事件循环"""
+        llm, messages = await run_in_threadpool(
+            ChatService._prepare_llm_call,
+            db, config, user_message, use_context, exclude_message_id
+        )
+        metrics = GenerationMetrics(config, mode="invoke", usage=usage)
         try:
-            # 使用新的 ModelFactory 创建模型实例
-            custom_config = {}
-            if temperature is not None:
-                custom_config["temperature"] = temperature
-            if max_tokens is not None:
-                custom_config["max_tokens"] = max_tokens
+            response = await llm.ainvoke(messages)
+        except Exception as e:
+            metrics.fail(e)
+            logger.error(f"AI模型调用失败: {str(e)}", exc_info=True)
+            raise Exception(f"AI模型调用失败: {str(e)}")
+        metrics.finish(response)
 
-            logger.info(f"创建模型实例，自定义配置: {custom_config}")
-            llm = ModelFactory.create_model_with_config(
-                db=db,
-                model_id=model_id,
-                user_id=db_model.user_id,
-                custom_config=custom_config or None
-            )
+        logger.info(f"模型原始回复: {response.content[:200]}...")
+        return response.content
 
-            # 由于 stream_ai_response 不直接使用 RunnableWithMessageHistory，我们需要手动构建消息列表
-            # 消息列表已经构建在 context_messages 中
-
-            # 这里应该调用一个直接与LLM交互的函数，而不是chat_with_model，
-            # chat_with_model 已经被重构为在 ChatService 中使用 LangChain 链。
-            # 暂时，我们仍然假设 ModelFactory.create_model_with_config 返回的 llm 可以直接被 invoke。
-            # 但是，llm.invoke 期望的是 LangChain 消息对象，不是字典列表。
-
-            # 将 context_messages 转换为 LangChain 的消息格式
-            from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
-            langchain_messages = []
-            for msg in context_messages:
-                if msg["role"] == "system":
-                    langchain_messages.append(SystemMessage(content=msg["content"]))
-                elif msg["role"] == "user":
-                    langchain_messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    langchain_messages.append(AIMessage(content=msg["content"]))
-
-            # 调用LLM进行流式生成
-            response_generator = llm.stream(langchain_messages)
-            full_response = ""
-            for chunk in response_generator:
-                full_response += chunk.content
-                yield chunk.content
-            logger.info(f"流式模型原始回复: {full_response[:200]}...") # 打印流式模型原始回复
-            
-            # stream_ai_response 的职责是返回流式内容，不应在此处创建消息或发送完成信号。
-            # 消息创建和完成信号应由调用者 (e.g., chat_message.py 中的 send_message_stream) 处理。
-            # 这里返回完整的响应内容，供调用者使用。
-            return full_response
-            
+    @staticmethod
+    async def astream_ai_response(
+        db: Session,
+        config: EffectiveChatConfig,
+        user_message: str,
+        use_context: bool = True,
+        exclude_message_id: Optional[int] = None,
+        usage: Optional[TokenUsage] = None
+    ) -> AsyncIterator[str]:
+        """流式获取AI回复（异步生成器），逐个产出模型返回的增量内容；usage 在生成结束或被关闭时填写"""
+        llm, messages = await run_in_threadpool(
+            ChatService._prepare_llm_call,
+            db, config, user_message, use_context, exclude_message_id
+        )
+        metrics = GenerationMetrics(config, mode="stream", usage=usage)
+        try:
+            async for chunk in llm.astream(messages):
+                metrics.on_chunk(chunk)
+                if chunk.content:
+                    yield chunk.content
+            metrics.finish()
         except Exception as e:
+            metrics.fail(e)
             logger.error(f"AI模型流式调用失败: {str(e)}", exc_info=True)
-            # 重新抛出异常，让调用者 (chat_message.py) 处理错误流
-            raise Exception(f"AI模型流式调用失败: {str(e)}")
\ No newline at end of file
+            raise Exception(f"AI模型流式调用失败: {str(e)}")
+        finally:
+            metrics.close()
@@ -0,0 +1,161 @@
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+from app.crud.ai.chat_config_cache import api_key_secrets, chat_config_cache, conversation_key, role_key, model_key
+from app.crud.ai.chat_conversation import chat_conversation
+from app.crud.ai.chat_role import chat_role
+from app.crud.ai.model import model
+from app.crud.ai.api_key import api_key
+from app.core.metrics import CHAT_CONFIG_CACHE
+from app.core.tracing import tracer
+from app.schemas.ai.chat_config import EffectiveChatConfig
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ChatConfigService:
+    """解析一轮对话生效的配置（对话 -> 角色 -> 模型 -> API 密钥），各部分优先读缓存"""
+
+    @staticmethod
+    def resolve(db: Session, conversation_id: int, role_id: Optional[int] = None) -> Optional[EffectiveChatConfig]:
+        """
+        解析对话配置
+
+        Args:
+            db: 数据库会话
+            conversation_id: 对话编号
+            role_id: 本条消息指定的角色编号，为空时使用对话上的角色
+
+        Returns:
+            Optional[EffectiveChatConfig]: 配置快照，对话不存在时返回 None
+        """
+        conversation = ChatConfigService._cached(
+            "conversation", conversation_key(conversation_id),
+            lambda: ChatConfigService._load_conversation(db, conversation_id)
+        )
+        if conversation is None:
+            return None
+
+        effective_role_id = role_id or conversation["role_id"]
+        system_message = conversation["system_message"]
+        # 旧版本写入的缓存可能没有该字段
+        summary_memory = bool(conversation.get("summary_memory"))
+        model_id = conversation["model_id"]
+        model_str = conversation["model"]
+        role_model = False
+
+        if effective_role_id:
+            role = ChatConfigService._cached(
+                "role", role_key(effective_role_id),
+                lambda: ChatConfigService._load_role(db, effective_role_id)
+            )
+            if role is not None:
+                # 优先使用角色上的 system_message 与 model_id（如存在）
+                if role["system_message"]:
+                    system_message = role["system_message"]
+                if role["model_id"]:
+                    model_id = role["model_id"]
+                    role_model = True
+                summary_memory = summary_memory or bool(role.get("summary_memory"))
+
+        llm = ChatConfigService._cached(
+            "model", model_key(model_id),
+            lambda: ChatConfigService._load_model(db, model_id)
+        )
+        if role_model and llm["model"]:
+            # 角色指定了模型时，消息记录使用该模型的标识
+            model_str = llm["model"]
+
+        return EffectiveChatConfig(
+            conversation_id=conversation_id,
+            user_id=conversation["user_id"],
+            role_id=effective_role_id,
+            system_message=system_message,
+            temperature=conversation["temperature"],
+            max_tokens=conversation["max_tokens"],
+            max_contexts=conversation["max_contexts"],
+            summary_memory=summary_memory,
+            model_id=model_id,
+            model=model_str,
+            model_name=llm["name"],
+            llm_model=llm["model"],
+            platform=llm["platform"],
+            api_key=ChatConfigService._api_key_secret(db, llm["key_id"]) if not llm["error"] else None,
+            api_url=llm["url"],
+            error=llm["error"],
+        )
+
+    @staticmethod
+    def _cached(part: str, key: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """读取缓存的配置片段；不存在的记录以空字典缓存，避免反复查询"""
+        with tracer.span(f"chat_config.{part}", key=key) as span:
+            data = chat_config_cache.get_json(key)
+            if data is not None:
+                CHAT_CONFIG_CACHE.inc(part=part, result="hit")
+                span.set_attribute("cache", "hit")
+                return data or None
+            CHAT_CONFIG_CACHE.inc(part=part, result="miss")
+            span.set_attribute("cache", "miss")
+            data = loader()
+            chat_config_cache.set_json(key, data or {})
+            return data
+
+    @staticmethod
+    def _api_key_secret(db: Session, key_id: int) -> Optional[str]:
+        """API 密钥只缓存在进程内，不写入共享缓存"""
+        def load() -> Optional[str]:
+            db_api_key = api_key.get(db, id=key_id)
+            return db_api_key.api_key if db_api_key else None
+        return api_key_secrets.get(key_id, load)
+
+    @staticmethod
+    def _load_conversation(db: Session, conversation_id: int) -> Optional[Dict[str, Any]]:
+        db_conversation = chat_conversation.get(db, id=conversation_id)
+        if not db_conversation:
+            return None
+        return {
+            "user_id": db_conversation.user_id,
+            "role_id": db_conversation.role_id,
+            "system_message": db_conversation.system_message,
+            "model_id": db_conversation.model_id,
+            "model": db_conversation.model,
+            "temperature": db_conversation.temperature,
+            "max_tokens": db_conversation.max_tokens,
+            "max_contexts": db_conversation.max_contexts,
+            "summary_memory": bool(db_conversation.summary_memory),
+        }
+
+    @staticmethod
+    def _load_role(db: Session, role_id: int) -> Optional[Dict[str, Any]]:
+        db_role = chat_role.get(db, id=role_id)
+        if not db_role:
+            return None
+        return {
+            "system_message": db_role.system_message,
+            "model_id": db_role.model_id,
+            "summary_memory": bool(db_role.summary_memory),
+        }
+
+    @staticmethod
+    def _load_model(db: Session, model_id: int) -> Dict[str, Any]:
+        """读取模型与API密钥，不可用时在 error 中记录原因（调用模型时才报错）"""
+        data = {"name": None, "model": None, "platform": None, "key_id": None, "url": None, "error": None}
+        db_model = model.get(db, id=model_id)
+        if not db_model:
+            logger.error(f"模型 {model_id} 不存在")
+            data["error"] = "AI模型不存在"
+            return data
+        data.update(name=db_model.name, model=db_model.model, platform=db_model.platform)
+        if db_model.status != 1:
+            data["error"] = f"模型 {model_id} 未启用"
+            return data
+
+        db_api_key = api_key.get(db, id=db_model.key_id)
+        if not db_api_key:
+            logger.error(f"API密钥 {db_model.key_id} 不存在")
+            data["error"] = "API密钥不存在"
+            return data
+        if db_api_key.status != 1:
+            data["error"] = f"API密钥 {db_model.key_id} 未启用"
+            return data
+        data.update(key_id=db_api_key.id, url=db_api_key.url)
+        return data
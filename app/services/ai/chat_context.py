@@ -0,0 +1,188 @@
+"""
+按 token 预算组装对话上下文
+
+max_contexts 只限制消息条数：几条长消息就可能超出模型的上下文窗口，而短消息又浪费了余量。
+这里从最新的消息往前填充，直到用完本轮的 token 预算：
+
+    预算 = 模型上下文窗口 - 回复预留（max_tokens） - 系统提示 - 当前用户消息
+
+token 数由 tiktoken 计算：编码在启动时由后台线程加载（首次加载可能需要下载编码文件），
+加载完成前、未安装 tiktoken 或无法加载编码文件时按字符数估算，计数不会等待加载；
+历史消息的 token 数按消息编号缓存，每轮对话只计算新增的消息。
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.crud.ai.context_cache import ContextMessage
+from app.schemas.ai.chat_config import EffectiveChatConfig
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OpenAI 对话格式中每条消息的角色与分隔符约占的 token 数
+MESSAGE_OVERHEAD_TOKENS = 4
+# 回复开头的引导 token
+REPLY_PRIMING_TOKENS = 3
+
+# 中日韩字符大约一个字符一个 token，其余字符大约四个字符一个 token
+_CJK_PATTERN = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """不依赖分词器的 token 数估算"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class TokenCounter:
+    """token 计数器：分词器在后台线程加载一次，消息的 token 数按消息编号缓存（LRU）"""
+
+    def __init__(self, encoding_name: str, cache_size: int):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = None
+        self._load_started = False
+        self._loaded = threading.Event()
+        # 消息编号 -> (内容长度, token 数)；流式回复的内容会增长，长度变化时重新计算
+        self._cache: "OrderedDict[int, Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, timeout: Optional[float] = None) -> bool:
+        """开始加载分词器并最多等待 timeout 秒，返回是否已可用；超时后加载在后台继续"""
+        self._start_loading()
+        if not self._loaded.wait(timeout):
+            logger.warning(f"分词器 {self.encoding_name} 加载超过 {timeout} 秒，加载完成前按字符数估算 token")
+        return self._encoding is not None
+
+    def _start_loading(self) -> None:
+        if self._load_started:
+            return
+        with self._lock:
+            if self._load_started:
+                return
+            self._load_started = True
+        if not self.encoding_name:
+            self._loaded.set()
+            return
+        # 下载编码文件可能很慢，在独立线程中进行，不持有计数器的锁
+        threading.Thread(target=self._load_encoding, name="tokenizer-loader", daemon=True).start()
+
+    def _load_encoding(self) -> None:
+        try:
+            import tiktoken
+        except ImportError:
+            logger.warning(f"未安装 tiktoken，按字符数估算 token（CHAT_TOKENIZER_ENCODING={self.encoding_name}）")
+            self._loaded.set()
+            return
+        try:
+            encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            # 无法下载编码文件（离线部署）等，只尝试一次
+            logger.warning(f"无法加载分词器 {self.encoding_name}，按字符数估算 token: {str(e)}")
+            self._loaded.set()
+            return
+        self._encoding = encoding
+        # 加载完成前按估算值缓存的 token 数作废
+        self.clear()
+        self._loaded.set()
+        logger.info(f"分词器 {self.encoding_name} 已加载")
+
+    def _get_encoding(self):
+        if not self._loaded.is_set():
+            # 未在启动时加载（如脚本、测试）时在后台开始加载，本次先按估算
+            self._start_loading()
+        return self._encoding
+
+    def count_text(self, text: str) -> int:
+        """计算一段文本的 token 数"""
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is None:
+            return estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def count_message(self, message: ContextMessage) -> int:
+        """计算一条上下文消息占用的 token 数（含消息格式开销），按消息编号缓存"""
+        content = message.content or ""
+        if self.cache_size <= 0:
+            return self.count_text(content) + MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            cached = self._cache.get(message.id)
+            if cached is not None and cached[0] == len(content):
+                self._cache.move_to_end(message.id)
+                return cached[1]
+
+        tokens = self.count_text(content) + MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            self._cache[message.id] = (len(content), tokens)
+            self._cache.move_to_end(message.id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+token_counter = TokenCounter(
+    encoding_name=settings.CHAT_TOKENIZER_ENCODING,
+    cache_size=settings.CHAT_TOKEN_COUNT_CACHE_SIZE,
+)
+
+
+def get_context_window(llm_model: Optional[str]) -> int:
+    """模型的上下文窗口大小，按模型标识的最长前缀匹配 MODEL_CONTEXT_WINDOWS"""
+    name = (llm_model or "").lower()
+    matched = ""
+    for prefix in settings.MODEL_CONTEXT_WINDOWS:
+        if name.startswith(prefix.lower()) and len(prefix) > len(matched):
+            matched = prefix
+    if matched:
+        return settings.MODEL_CONTEXT_WINDOWS[matched]
+    return settings.MODEL_CONTEXT_WINDOW_DEFAULT
+
+
+def get_context_budget(config: EffectiveChatConfig, system_prompt: str, user_message: str) -> int:
+    """本轮可用于历史消息的 token 数"""
+    reply_reserve = config.max_tokens or settings.CHAT_CONTEXT_REPLY_RESERVE
+    fixed = (
+        token_counter.count_text(system_prompt)
+        + token_counter.count_text(user_message)
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+        + REPLY_PRIMING_TOKENS
+    )
+    return max(get_context_window(config.llm_model) - reply_reserve - fixed, 0)
+
+
+def fit_context(messages: List[ContextMessage], token_budget: int) -> Tuple[List[ContextMessage], int]:
+    """
+    从最新的消息往前选取，直到超出 token 预算
+
+    遇到第一条放不下的消息即停止，保证保留的是连续的最近历史。
+
+    Args:
+        messages: 按时间从旧到新的候选消息
+        token_budget: 可用的 token 数
+
+    Returns:
+        Tuple[List[ContextMessage], int]: 按时间从旧到新的选中消息，以及它们占用的 token 数
+    """
+    used = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        tokens = token_counter.count_message(messages[index])
+        if used + tokens > token_budget:
+            break
+        used += tokens
+        start = index
+    if start > 0:
+        logger.info(f"上下文超出 token 预算 {token_budget}，丢弃较早的 {start} 条消息")
+    return messages[start:], used
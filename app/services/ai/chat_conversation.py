@@ -8,6 +8,7 @@ from app.crud.ai.chat_message import chat_message
 from app.schemas.ai.chat_conversation import (
     ChatConversationCreate, ChatConversationUpdate, ChatConversationPageReq, ChatConversationSimpleResp, ChatConversationResp
 )
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from app.models.ai.chat_conversation import ChatConversation
 
@@ -79,7 +80,7 @@ class ChatConversationService:
     @staticmethod
     def get_conversation(db: Session, id: int, user_id: int) -> ResponseModel[ChatConversationResp]:
         """获取单个对话"""
-        db_conversation = chat_conversation.get(db, id=id)
+        db_conversation = chat_conversation.get(db, id=id, profile="detail")
         if not db_conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -126,30 +127,17 @@ class ChatConversationService:
     @staticmethod
     def get_conversation_page(db: Session, page: ChatConversationPageReq, user_id: int) -> ResponseModel[PageResult[ChatConversationResp]]:
         """分页获取对话列表"""
-        # 这里可以实现分页逻辑，暂时返回所有对话
-        conversations = chat_conversation.get_by_user_id(db, user_id=user_id)
-        
-        # 应用过滤条件
-        if page.title:
-            conversations = [c for c in conversations if page.title.lower() in c.title.lower()]
-        if page.model_id:
-            conversations = [c for c in conversations if c.model_id == page.model_id]
-        if page.role_id:
-            conversations = [c for c in conversations if c.role_id == page.role_id]
-        if page.pinned is not None:
-            conversations = [c for c in conversations if c.pinned == page.pinned]
-        
-        # 分页
-        total = len(conversations)
-        start = (page.pageNo - 1) * page.pageSize
-        end = start + page.pageSize
-        page_conversations = conversations[start:end]
+        try:
+            conversations, total, next_cursor = chat_conversation.get_page(db, page=page, user_id=user_id)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
         page_result = PageResult(
-            list=[ChatConversationResp.model_validate(conv.to_dict()) for conv in page_conversations],
+            list=[ChatConversationResp.model_validate(conv.to_dict()) for conv in conversations],
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         
         return ResponseModel(data=page_result)
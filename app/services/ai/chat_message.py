@@ -1,67 +1,136 @@
 from typing import List, Optional
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.crud.ai.chat_message import chat_message
 from app.crud.ai.chat_conversation import chat_conversation
-from app.crud.ai.chat_role import chat_role
-from app.crud.ai.model import model
 from app.schemas.ai.chat_message import (
     ChatMessageCreate, ChatMessageUpdate, ChatMessagePageReq, ChatMessageSendReq, ChatMessageSendResp, ChatMessageResp
 )
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from app.models.ai.chat_message import ChatMessage
 from app.services.ai.chat import ChatService
+from app.services.ai.chat_config import ChatConfigService
+from app.services.ai.chat_stream import ChatStream, chat_stream_manager
+from app.services.ai.chat_summary import chat_summarizer
+from app.services.ai.token_usage import TokenQuotaService, token_usage_writer
+from app.schemas.ai.token_usage import TokenUsage
+from app.db.session import SessionLocal
+from app.core.metrics import CHAT_STREAMS
+from app.core.tracing import tracer
+from app.core.config import settings
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+class StreamReplyWriter:
+    """
+    流式回复的持久化
+
+    增量模式（CHAT_STREAM_CHECKPOINT）下，生成开始时即创建 finish_reason 为 streaming 的AI消息，
+    之后按时间或字节阈值批量追加内容，进程崩溃或重启时已生成的内容不会丢失；
+    关闭增量模式时在生成结束后一次性写入。
+    """
+
+    def __init__(self, db: Session, message_in: ChatMessageSendReq, user_id: int, target: dict):
+        self.db = db
+        self.message_in = message_in
+        self.user_id = user_id
+        self.target = target
+        self.content = ""
+        self.message_id: Optional[int] = None
+        # 由 ChatService 在生成结束（或被取消）时填写
+        self.usage = TokenUsage()
+        self._incremental = settings.CHAT_STREAM_CHECKPOINT
+        self._pending = ""
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+
+    async def start(self) -> None:
+        """创建AI消息（仅增量模式）"""
+        if self._incremental:
+            ai_msg = await run_in_threadpool(
+                ChatMessageService._save_ai_message, self.db, self.message_in, self.user_id, self.target,
+                "", "streaming"
+            )
+            self.message_id = ai_msg.id
+
+    async def append(self, delta: str) -> None:
+        self.content += delta
+        if not self._incremental:
+            return
+        self._pending += delta
+        self._pending_bytes += len(delta.encode("utf-8"))
+        if (self._pending_bytes >= settings.CHAT_STREAM_CHECKPOINT_BYTES
+                or time.monotonic() - self._last_flush >= settings.CHAT_STREAM_CHECKPOINT_INTERVAL):
+            await self._flush()
+
+    async def _flush(self, finish_reason: Optional[str] = None) -> None:
+        pending, self._pending, self._pending_bytes = self._pending, "", 0
+        self._last_flush = time.monotonic()
+        if finish_reason is None:
+            await run_in_threadpool(
+                chat_message.append_content, self.db, id=self.message_id, content=pending
+            )
+        else:
+            await run_in_threadpool(
+                chat_message.finish_streaming, self.db,
+                id=self.message_id, conversation_id=self.message_in.conversation_id,
+                content=pending, finish_reason=finish_reason, full_content=self.content, usage=self.usage
+            )
+
+    async def finish(self, finish_reason: str) -> int:
+        """写入剩余内容、结束原因与用量，返回AI消息ID"""
+        if self._incremental and self.message_id is None:
+            await self.start()
+        if self._incremental:
+            await self._flush(finish_reason=finish_reason)
+        else:
+            ai_msg = await run_in_threadpool(
+                ChatMessageService._save_ai_message, self.db, self.message_in, self.user_id, self.target,
+                self.content, finish_reason, self.usage
+            )
+            self.message_id = ai_msg.id
+        token_usage_writer.submit(self.user_id, self.target["model_id"], self.usage)
+        chat_summarizer.submit(self.target["llm_kwargs"]["config"])
+        return self.message_id
+
+    async def discard(self) -> None:
+        """删除已创建的AI消息"""
+        if self.message_id is not None:
+            await run_in_threadpool(chat_message.remove, self.db, id=self.message_id)
+            self.message_id = None
+
 class ChatMessageService:
     
     @staticmethod
-    def send_message(db: Session, message_in: ChatMessageSendReq, user_id: int) -> ResponseModel[ChatMessageSendResp]:
-        """发送消息并获取AI回复"""
-        # 检查对话是否存在且属于当前用户
-        db_conversation = chat_conversation.get(db, id=message_in.conversation_id)
+    def _prepare_send(db: Session, message_in: ChatMessageSendReq, user_id: int) -> dict:
+        """校验对话权限、解析生效的对话配置，并创建用户消息"""
+        # 解析对话生效的配置（对话 -> 角色 -> 模型 -> API 密钥），各部分优先读缓存
+        config = ChatConfigService.resolve(db, message_in.conversation_id, role_id=message_in.role_id)
         logger.info(f"处理会话ID {message_in.conversation_id} 的消息，用户ID: {user_id}")
         
-        if not db_conversation:
+        if not config:
             logger.error(f"会话 {message_in.conversation_id} 不存在")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="对话不存在"
             )
         
-        if db_conversation.user_id != user_id:
+        if config.user_id != user_id:
             logger.error(f"用户 {user_id} 无权访问会话 {message_in.conversation_id}")
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权限在此对话中发送消息"
             )
-        
-        # 解析有效的角色与模型
-        effective_role_id = message_in.role_id or db_conversation.role_id
-        effective_system_message = db_conversation.system_message
-        effective_model_id = db_conversation.model_id
-        effective_model_str = db_conversation.model
-        
-        logger.info(f"初始配置 - 角色ID: {effective_role_id}, 模型ID: {effective_model_id}, 模型: {effective_model_str}")
-
-        if effective_role_id:
-            db_role = chat_role.get(db, id=effective_role_id)
-            if db_role and not db_role.deleted:
-                logger.info(f"使用角色 {db_role.name} (ID: {db_role.id}) 的配置")
-                # 优先使用角色上的 system_message 与 model_id（如存在）
-                if db_role.system_message:
-                    effective_system_message = db_role.system_message
-                    logger.info(f"使用角色的系统提示: {effective_system_message[:50]}...")
-                if db_role.model_id:
-                    effective_model_id = db_role.model_id
-                    db_model = model.get(db, id=effective_model_id)
-                    if db_model:
-                        effective_model_str = db_model.model
-                        logger.info(f"使用角色指定的模型: {effective_model_str} (ID: {effective_model_id})")
-
-        logger.info(f"最终配置 - 角色ID: {effective_role_id}, 模型ID: {effective_model_id}, 模型: {effective_model_str}")
+
+        # 超出当日 token 配额时不调用模型，也不保存用户消息
+        TokenQuotaService.check_quota(db, user_id)
+
+        logger.info(f"最终配置 - 角色ID: {config.role_id}, 模型ID: {config.model_id}, 模型: {config.model}")
 
         # 创建用户消息
         user_msg = chat_message.create_user_message(
@@ -69,57 +138,156 @@ class ChatMessageService:
             conversation_id=message_in.conversation_id,
             user_id=user_id,
             content=message_in.content,
-            model_id=effective_model_id,
-            model=effective_model_str,
-            role_id=effective_role_id
+            model_id=config.model_id,
+            model=config.model,
+            role_id=config.role_id
         )
-        
-        # 获取AI回复
-        try:
-            logger.info(f"开始调用AI模型 {effective_model_str} (ID: {effective_model_id})")
-            ai_response = ChatService.get_ai_response(
-                db=db,
-                conversation_id=message_in.conversation_id,
-                user_message=message_in.content,
-                model_id=effective_model_id,
-                system_message=effective_system_message,
-                temperature=db_conversation.temperature,
-                max_tokens=db_conversation.max_tokens,
-                use_context=message_in.use_context,
-                max_contexts=db_conversation.max_contexts
-            )
-            
-            # 创建AI回复消息
-            ai_msg = chat_message.create_ai_message(
+
+        return {
+            "user_msg_id": user_msg.id,
+            "role_id": config.role_id,
+            "model_id": config.model_id,
+            "model": config.model,
+            "llm_kwargs": {
+                "config": config,
+                "user_message": message_in.content,
+                "use_context": message_in.use_context,
+                # 用户消息已先行保存，组装上下文时排除它，避免与末尾追加的当前消息重复
+                "exclude_message_id": user_msg.id,
+            },
+        }
+
+    @staticmethod
+    def _save_ai_message(db: Session, message_in: ChatMessageSendReq, user_id: int,
+                         target: dict, content: str, finish_reason: str,
+                         usage: Optional[TokenUsage] = None) -> ChatMessage:
+        """保存AI回复消息"""
+        with tracer.span("chat.save_ai_message", finish_reason=finish_reason):
+            return chat_message.create_ai_message(
                 db=db,
                 conversation_id=message_in.conversation_id,
                 user_id=user_id,
-                content=ai_response,
-                model_id=effective_model_id,
-                model=effective_model_str,
-                reply_id=user_msg.id,
-                role_id=effective_role_id
+                content=content,
+                model_id=target["model_id"],
+                model=target["model"],
+                reply_id=target["user_msg_id"],
+                role_id=target["role_id"],
+                finish_reason=finish_reason,
+                usage=usage
             )
-            
-            # 构建响应
-            response = ChatMessageSendResp(
-                message_id=ai_msg.id,
-                content=ai_response,
-                conversation_id=message_in.conversation_id,
-                model=effective_model_str
+
+    @staticmethod
+    def _finish_send(db: Session, message_in: ChatMessageSendReq, user_id: int,
+                     target: dict, ai_response: str, usage: TokenUsage) -> ResponseModel[ChatMessageSendResp]:
+        """保存AI回复消息（含用量）并构建响应"""
+        ai_msg = ChatMessageService._save_ai_message(db, message_in, user_id, target, ai_response, "stop", usage)
+        token_usage_writer.submit(user_id, target["model_id"], usage)
+        chat_summarizer.submit(target["llm_kwargs"]["config"])
+        
+        response = ChatMessageSendResp(
+            message_id=ai_msg.id,
+            content=ai_response,
+            conversation_id=message_in.conversation_id,
+            model=target["model"]
+        )
+        return ResponseModel(data=response)
+
+    @staticmethod
+    def _fail_send(db: Session, target: dict, e: Exception) -> HTTPException:
+        """AI回复失败时删除用户消息"""
+        logger.error(f"AI回复失败: {str(e)}", exc_info=True)
+        chat_message.remove(db, id=target["user_msg_id"])
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"AI回复失败: {str(e)}"
+        )
+
+    @staticmethod
+    async def asend_message(db: Session, message_in: ChatMessageSendReq, user_id: int) -> ResponseModel[ChatMessageSendResp]:
+        """发送消息并获取AI回复（异步），数据库操作在线程池中执行"""
+        with tracer.span("chat.prepare_send"):
+            target = await run_in_threadpool(ChatMessageService._prepare_send, db, message_in, user_id)
+
+        try:
+            logger.info(f"开始调用AI模型 {target['model']} (ID: {target['model_id']})")
+            usage = TokenUsage()
+            ai_response = await ChatService.aget_ai_response(db=db, usage=usage, **target["llm_kwargs"])
+            return await run_in_threadpool(
+                ChatMessageService._finish_send, db, message_in, user_id, target, ai_response, usage
             )
-            
-            return ResponseModel(data=response)
-            
         except Exception as e:
-            logger.error(f"AI回复失败: {str(e)}", exc_info=True)
-            # 如果AI回复失败，删除用户消息
-            chat_message.remove(db, id=user_msg.id)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"AI回复失败: {str(e)}"
-            )
+            raise await run_in_threadpool(ChatMessageService._fail_send, db, target, e)
     
+    @staticmethod
+    async def start_message_stream(db: Session, message_in: ChatMessageSendReq, user_id: int) -> ChatStream:
+        """
+        创建用户消息并在后台开始流式生成AI回复
+
+        Returns:
+            ChatStream: 生成过程的事件缓冲区，供 SSE 连接消费
+        """
+        start_time = time.perf_counter()
+        with tracer.span("chat.prepare_send"):
+            target = await run_in_threadpool(ChatMessageService._prepare_send, db, message_in, user_id)
+        stream = chat_stream_manager.create(user_id=user_id)
+        chat_stream_manager.start(
+            stream,
+            ChatMessageService._produce_stream_reply(stream, message_in, user_id, target, start_time)
+        )
+        return stream
+
+    @staticmethod
+    async def _produce_stream_reply(stream: ChatStream, message_in: ChatMessageSendReq, user_id: int,
+                                    target: dict, start_time: float) -> None:
+        """调用模型并把增量内容写入 stream；后台任务可能比请求活得更久，因此使用独立的数据库会话"""
+        db = SessionLocal()
+        writer = StreamReplyWriter(db, message_in, user_id, target)
+        first_chunk_time = None
+        ai_stream = ChatService.astream_ai_response(db=db, usage=writer.usage, **target["llm_kwargs"])
+        try:
+            try:
+                async for delta in ai_stream:
+                    if first_chunk_time is None:
+                        first_chunk_time = time.perf_counter()
+                        logger.info(f"流式生成 {stream.generation_id} 首字节耗时: {(first_chunk_time - start_time) * 1000:.0f}ms, conversation_id={message_in.conversation_id}")
+                        # 收到首个增量后再创建AI消息，避免空消息进入本轮上下文
+                        await writer.start()
+                    stream.publish({'content': delta, 'type': 'chunk'})
+                    await writer.append(delta)
+            except asyncio.CancelledError:
+                # 所有客户端断开且超过重连宽限期，关闭上游流以中止模型请求
+                CHAT_STREAMS.inc(result="cancelled")
+                await ai_stream.aclose()
+                logger.info(f"流式生成 {stream.generation_id} 已取消, 已生成长度: {len(writer.content)}, conversation_id={message_in.conversation_id}")
+                # 保存已生成的部分内容，标记为截断
+                if writer.content:
+                    await writer.finish("truncated")
+                else:
+                    await writer.discard()
+                raise
+            except Exception as e:
+                # 如果AI回复失败，删除用户消息
+                CHAT_STREAMS.inc(result="failed")
+                error_msg = f"AI回复失败: {str(e)}"
+                logger.error(error_msg, exc_info=True)
+                await writer.discard()
+                await run_in_threadpool(chat_message.remove, db, id=target["user_msg_id"])
+                stream.publish({'error': error_msg, 'type': 'error'})
+                return
+
+            logger.info(f"流式生成 {stream.generation_id} 完成, 总耗时: {(time.perf_counter() - start_time) * 1000:.0f}ms, 长度: {len(writer.content)}")
+            CHAT_STREAMS.inc(result="completed")
+
+            # 写入剩余内容并标记为正常结束
+            message_id = await writer.finish("stop")
+
+            # 发送完成信号
+            ttfb_ms = int((first_chunk_time - start_time) * 1000) if first_chunk_time else None
+            stream.publish({'content': '', 'type': 'done', 'message_id': message_id, 'ttfb_ms': ttfb_ms})
+        finally:
+            stream.close()
+            db.close()
+
     @staticmethod
     def get_message_list(db: Session, conversation_id: int, user_id: int, limit: int = 50) -> ResponseModel[List[ChatMessageResp]]:
         """获取对话的消息列表"""
@@ -162,29 +330,17 @@ class ChatMessageService:
     @staticmethod
     def get_message_page(db: Session, page: ChatMessagePageReq, user_id: int) -> ResponseModel[PageResult[ChatMessageResp]]:
         """分页获取消息列表"""
-        # 这里可以实现分页逻辑，暂时返回所有消息
-        if page.conversation_id:
-            messages = chat_message.get_by_conversation_id(db, conversation_id=page.conversation_id)
-        else:
-            messages = chat_message.get_by_user_id(db, user_id=user_id)
-        
-        # 应用过滤条件
-        if page.type:
-            messages = [m for m in messages if m.type == page.type]
-        if page.user_id:
-            messages = [m for m in messages if m.user_id == page.user_id]
-        
-        # 分页
-        total = len(messages)
-        start = (page.pageNo - 1) * page.pageSize
-        end = start + page.pageSize
-        page_messages = messages[start:end]
+        try:
+            messages, total, next_cursor = chat_message.get_page(db, page=page, user_id=user_id)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
         page_result = PageResult(
-            list=[ChatMessageResp.model_validate(msg.to_dict()) for msg in page_messages],
+            list=[ChatMessageResp.model_validate(msg.to_dict()) for msg in messages],
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         
         return ResponseModel(data=page_result)
\ No newline at end of file
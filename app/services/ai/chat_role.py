@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.crud.ai.chat_role import chat_role
 from app.crud.ai.model import model
 from app.schemas.ai.chat_role import ChatRoleCreate, ChatRoleUpdate, ChatRolePageReq, ChatRoleResp, ChatRoleResp
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from app.models.ai.chat_role import ChatRole
 
@@ -76,7 +77,7 @@ class ChatRoleService:
 
     @staticmethod
     def get_chat_role(db: Session, id: int, user_id: int) -> ResponseModel[ChatRoleResp]:
-        db_role = chat_role.get(db, id=id)
+        db_role = chat_role.get(db, id=id, profile="detail")
         if not db_role:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -95,7 +96,10 @@ class ChatRoleService:
 
     @staticmethod
     def get_chat_role_page(db: Session, page: ChatRolePageReq, user_id: int) -> ResponseModel[PageResult[ChatRoleResp]]:
-        items, total = chat_role.get_page(db, page=page)
+        try:
+            items, total, next_cursor = chat_role.get_page(db, page=page)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
         # 构建响应列表，包含模型信息
         role_resps = []
@@ -108,6 +112,7 @@ class ChatRoleService:
             list=role_resps,
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         return ResponseModel(data=page_result)
@@ -0,0 +1,157 @@
+"""
+可续传的流式生成
+
+每次流式生成分配一个 generation_id，由后台任务调用模型并把事件写入有界环形缓冲区，
+SSE 连接只是缓冲区的消费者。客户端断线后携带 Last-Event-ID 重新连接即可从断点继续，
+无需重新生成整条回复。
+
+- 所有连接断开后等待 CHAT_STREAM_RESUME_GRACE 秒，仍无人重连则取消生成；
+- 生成结束后缓冲区保留 CHAT_STREAM_RETENTION 秒供重连，之后被清理。
+
+缓冲区位于进程内存中，多 worker 部署时续传请求需要路由到同一个 worker。
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Coroutine, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StreamResumeExpired(Exception):
+    """请求续传的位置已被环形缓冲区淘汰"""
+
+
+class ChatStream:
+    """一次流式生成的事件缓冲区"""
+
+    def __init__(self, generation_id: str, user_id: int, buffer_size: int, resume_grace: float):
+        self.generation_id = generation_id
+        self.user_id = user_id
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._events: Deque[Tuple[int, dict]] = deque(maxlen=buffer_size)
+        self._next_seq = 1
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._resume_grace = resume_grace
+        self._expire_handle: Optional[asyncio.TimerHandle] = None
+
+    def publish(self, data: dict) -> None:
+        """追加一个事件并唤醒所有消费者"""
+        self._events.append((self._next_seq, data))
+        self._next_seq += 1
+        self._notify()
+
+    def close(self) -> None:
+        """标记生成结束"""
+        self.done = True
+        self.finished_at = time.monotonic()
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[Tuple[int, dict]]:
+        """
+        消费事件
+
+        Args:
+            after_seq: 客户端已收到的最后一个事件序号，0 表示从头开始
+
+        Yields:
+            Tuple[int, dict]: (事件序号, 事件内容)
+        """
+        self._attach()
+        try:
+            while True:
+                changed = self._changed
+                # 消费者挂起期间缓冲区可能继续写入或淘汰，每次都按序号重新定位
+                while self._events:
+                    first_seq = self._events[0][0]
+                    if after_seq + 1 < first_seq:
+                        raise StreamResumeExpired(self.generation_id)
+                    index = after_seq + 1 - first_seq
+                    if index >= len(self._events):
+                        break
+                    seq, data = self._events[index]
+                    yield seq, data
+                    after_seq = seq
+                if self.done and after_seq + 1 >= self._next_seq:
+                    return
+                await changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self._subscribers += 1
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+
+    def _detach(self) -> None:
+        self._subscribers -= 1
+        if self._subscribers == 0 and not self.done:
+            loop = asyncio.get_running_loop()
+            self._expire_handle = loop.call_later(self._resume_grace, self._expire)
+
+    def _expire(self) -> None:
+        """宽限期内没有客户端重连，取消上游生成"""
+        self._expire_handle = None
+        if self._subscribers == 0 and not self.done and self.task is not None:
+            logger.info(f"流式生成 {self.generation_id} 无客户端连接，取消生成")
+            self.task.cancel()
+
+
+class ChatStreamManager:
+    """进程内的流式生成登记表"""
+
+    def __init__(self):
+        self._streams: Dict[str, ChatStream] = {}
+
+    def create(self, user_id: int) -> ChatStream:
+        self._sweep()
+        stream = ChatStream(
+            generation_id=uuid.uuid4().hex,
+            user_id=user_id,
+            buffer_size=settings.CHAT_STREAM_BUFFER_SIZE,
+            resume_grace=settings.CHAT_STREAM_RESUME_GRACE,
+        )
+        self._streams[stream.generation_id] = stream
+        return stream
+
+    def start(self, stream: ChatStream, producer: Coroutine) -> None:
+        """在后台任务中运行生成过程，生成过程负责向 stream 写入事件并在结束时调用 close()"""
+        stream.task = asyncio.create_task(producer)
+        stream.task.add_done_callback(self._on_producer_done)
+
+    def get(self, generation_id: str) -> Optional[ChatStream]:
+        self._sweep()
+        return self._streams.get(generation_id)
+
+    @staticmethod
+    def _on_producer_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("流式生成任务异常退出", exc_info=task.exception())
+
+    def _sweep(self) -> None:
+        """清理已结束且超过保留时间的生成"""
+        deadline = time.monotonic() - settings.CHAT_STREAM_RETENTION
+        expired = [
+            generation_id for generation_id, stream in self._streams.items()
+            if stream.done and stream.finished_at < deadline
+        ]
+        for generation_id in expired:
+            del self._streams[generation_id]
+
+
+chat_stream_manager = ChatStreamManager()
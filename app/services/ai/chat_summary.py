@@ -0,0 +1,150 @@
+"""
+对话摘要记忆
+
+对话或角色开启 summary_memory 后，提示词由 摘要 + 摘要之后的全部消息 组成（不受 max_contexts 限制，只受 token 预算限制）：
+每次AI回复保存后，把对话交给 chat_summarizer，后台线程在最近 CHAT_SUMMARY_RECENT_MESSAGES 条之外
+积累了 CHAT_SUMMARY_BATCH_MESSAGES 条未合并的消息时，调用对话所用的模型把这批消息合并进已有摘要。
+
+摘要只做增量更新（已有摘要 + 新增的一批消息），从不从头重新生成；
+摘要与合并到的最后一条消息编号保存在 ai_chat_summary 表中，进程重启后继续使用。
+"""
+import threading
+from typing import Dict, List
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.core.background import BackgroundBatchWriter
+from app.core.config import settings
+from app.crud.ai.chat_message import chat_message
+from app.crud.ai.chat_summary import chat_summary
+from app.crud.ai.context_cache import ContextMessage
+from app.db.session import SessionLocal
+from app.engine.model import ModelFactory
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.schemas.ai.token_usage import TokenUsage
+from app.services.ai.chat import GenerationMetrics
+from app.services.ai.token_usage import token_usage_writer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 合并时每条消息最多保留的字符数，避免个别超长消息撑满摘要请求
+SUMMARY_MESSAGE_MAX_CHARS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "你负责维护一段对话的摘要。根据已有摘要和新增的对话内容，输出更新后的完整摘要："
+    "保留用户的目标、偏好、已确认的事实与结论、仍未解决的问题，省略寒暄与重复内容。"
+    "只输出摘要本身，不要添加任何说明。"
+)
+
+SPEAKERS = {"user": "用户", "assistant": "助手", "system": "系统"}
+
+
+class ChatSummarizer(BackgroundBatchWriter[int]):
+    """对话摘要的后台合并器：同一对话排队期间的多次提交只合并一次"""
+
+    # 停止时不再调用模型，尚未处理的对话在下一条回复时重新提交
+    flush_on_stop = False
+
+    def __init__(self, recent_messages: int, batch_messages: int, max_queue_size: int,
+                 flush_interval: float = 1.0):
+        super().__init__("chat-summarizer", flush_interval, max_queue_size)
+        self.recent_messages = recent_messages
+        self.batch_messages = batch_messages
+        # 排队中的对话 -> 最新的对话配置
+        self._pending: Dict[int, EffectiveChatConfig] = {}
+        self._pending_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.batch_messages > 0
+
+    def submit(self, config: EffectiveChatConfig) -> None:
+        """对话新增了消息，立即返回；未开启摘要记忆的对话忽略"""
+        if not config.summary_memory or not self.enabled:
+            return
+        with self._pending_lock:
+            queued = config.conversation_id in self._pending
+            self._pending[config.conversation_id] = config
+            if queued:
+                return
+            if not self._put(config.conversation_id):
+                # 丢弃后由该对话的下一条回复重新提交
+                del self._pending[config.conversation_id]
+                logger.warning(f"对话摘要队列已满，跳过对话 {config.conversation_id}")
+
+    def write(self, batch: List[int]) -> int:
+        """依次合并排队的对话，返回合并的批数"""
+        merged = 0
+        for conversation_id in batch:
+            with self._pending_lock:
+                config = self._pending.pop(conversation_id, None)
+            if config is None:
+                continue
+            try:
+                merged += self.summarize(config)
+            except Exception as e:
+                logger.error(f"合并对话 {conversation_id} 的摘要失败: {str(e)}", exc_info=True)
+        return merged
+
+    def summarize(self, config: EffectiveChatConfig) -> int:
+        """把最近消息之外未合并的消息按批合并进摘要，返回合并的批数"""
+        db = SessionLocal()
+        try:
+            batches = 0
+            while not self._stop.is_set():
+                summary = chat_summary.get_by_conversation_id(db, conversation_id=config.conversation_id)
+                rows = chat_message.get_rows_after(
+                    db, conversation_id=config.conversation_id, user_id=config.user_id,
+                    after_id=summary.last_message_id if summary else 0,
+                    limit=self.recent_messages + self.batch_messages
+                )
+                # 最近的消息保留原文，其之外积累满一批才合并
+                if len(rows) < self.recent_messages + self.batch_messages:
+                    break
+                batch = rows[:self.batch_messages]
+                content = self._merge(config, summary.content if summary else "", batch)
+                if not content:
+                    logger.warning(f"模型未返回对话 {config.conversation_id} 的摘要，跳过本次合并")
+                    break
+                saved = chat_summary.save_summary(
+                    db, conversation_id=config.conversation_id, content=content,
+                    last_message_id=batch[-1].id, folded=len(batch),
+                    expected_last_message_id=summary.last_message_id if summary else None
+                )
+                if not saved:
+                    logger.info(f"对话 {config.conversation_id} 的摘要已被其他进程更新，跳过本次合并")
+                    break
+                batches += 1
+                logger.info(f"对话 {config.conversation_id} 的摘要已合并至消息 {batch[-1].id}")
+            return batches
+        finally:
+            db.close()
+
+    @staticmethod
+    def _merge(config: EffectiveChatConfig, summary: str, messages: List[ContextMessage]) -> str:
+        """调用对话所用的模型，把一批消息合并进已有摘要"""
+        dialogue = "\n".join(
+            f"{SPEAKERS.get(msg.type, msg.type)}: {(msg.content or '')[:SUMMARY_MESSAGE_MAX_CHARS]}"
+            for msg in messages
+        )
+        llm = ModelFactory.create_model_from_config(config, temperature=0.3, max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS)
+        usage = TokenUsage()
+        metrics = GenerationMetrics(config, mode="summary", usage=usage)
+        try:
+            response = llm.invoke([
+                SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+                HumanMessage(content=f"已有摘要：\n{summary or '（无）'}\n\n新增对话：\n{dialogue}"),
+            ])
+        except Exception as e:
+            metrics.fail(e)
+            raise
+        metrics.finish(response)
+        # 摘要同样消耗用户的 token
+        token_usage_writer.submit(config.user_id, config.model_id, usage)
+        return response.content.strip()
+
+
+chat_summarizer = ChatSummarizer(
+    recent_messages=settings.CHAT_SUMMARY_RECENT_MESSAGES,
+    batch_messages=settings.CHAT_SUMMARY_BATCH_MESSAGES,
+    max_queue_size=settings.CHAT_SUMMARY_QUEUE_SIZE,
+)
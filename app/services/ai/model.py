@@ -4,8 +4,10 @@ from sqlalchemy.orm import Session
 from app.crud.ai.model import model
 from app.crud.ai.api_key import api_key
 from app.schemas.ai.model import ModelCreate, ModelUpdate, ModelPageReq, ModelResp
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from app.models.ai.model import Model
+from app.engine.model import ModelFactory
 
 class ModelService:
     @staticmethod
@@ -75,7 +77,9 @@ class ModelService:
                 detail="API Key does not belong to current user"
             )
         
+        old_model_name = db_model.model
         db_obj = model.update(db, db_obj=db_model, obj_in=model_in)
+        ModelFactory.invalidate_cached_models(model_name=old_model_name)
         return ResponseModel(data=ModelResp.model_validate(db_obj))
 
     @staticmethod
@@ -95,6 +99,7 @@ class ModelService:
             )
         
         db_obj = model.soft_delete(db, id=id)
+        ModelFactory.invalidate_cached_models(model_name=db_obj.model)
         return ResponseModel(data=ModelResp.model_validate(db_obj))
 
     @staticmethod
@@ -133,7 +138,10 @@ class ModelService:
 
     @staticmethod
     def get_model_page(db: Session, page: ModelPageReq, user_id: int) -> ResponseModel[PageResult[ModelResp]]:
-        items, total = model.get_page(db, page=page, user_id=user_id)
+        try:
+            items, total, next_cursor = model.get_page(db, page=page, user_id=user_id)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         # 构建响应列表，包含 API 密钥信息
         model_resps = []
         for m in items:
@@ -145,6 +153,7 @@ class ModelService:
             list=model_resps,
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         return ResponseModel(data=page_result)
@@ -0,0 +1,101 @@
+"""
+token 用量统计与配额
+
+每条AI回复的用量写在消息上（prompt_tokens / completion_tokens / latency_ms）；
+同时交给 token_usage_writer，由后台线程按 TOKEN_USAGE_FLUSH_INTERVAL 把同一用户、模型、日期的用量合并，
+在一个事务中累加到 ai_chat_token_usage 汇总表，不占用对话请求的数据库提交。
+
+TokenQuotaService 在调用模型前检查用户当天的用量（汇总表 + 尚未写入的部分）是否超过配额。
+"""
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from app.core.background import BackgroundBatchWriter
+from app.core.config import settings
+from app.crud.ai.token_usage import USAGE_FIELDS, UsageKey, chat_token_usage
+from app.db.session import SessionLocal
+from app.schemas.ai.token_usage import TokenUsage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenUsageWriter(BackgroundBatchWriter[Tuple[UsageKey, TokenUsage]]):
+    """token 用量的后台批量写入器"""
+
+    def __init__(self, flush_interval: float, max_queue_size: int):
+        super().__init__("token-usage-writer", flush_interval, max_queue_size)
+        # 已提交但尚未写入数据库的 token 数（用户 -> token 数），配额检查时计入
+        self._pending: Dict[int, int] = defaultdict(int)
+        self._pending_lock = threading.Lock()
+
+    def submit(self, user_id: int, model_id: int, usage: TokenUsage) -> None:
+        """记录一次模型调用的用量，立即返回"""
+        if not self._put(((user_id, model_id, date.today()), usage)):
+            logger.warning(f"token 用量队列已满，丢弃用户 {user_id} 的用量记录")
+            return
+        with self._pending_lock:
+            self._pending[user_id] += usage.total_tokens
+
+    def pending_tokens(self, user_id: int) -> int:
+        with self._pending_lock:
+            return self._pending.get(user_id, 0)
+
+    def write(self, batch: List[Tuple[UsageKey, TokenUsage]]) -> int:
+        """把一批用量合并后累加到汇总表，返回写入的汇总行数"""
+        rollup: Dict[UsageKey, Dict[str, int]] = {}
+        pending: Dict[int, int] = defaultdict(int)
+        for key, usage in batch:
+            values = rollup.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0))
+            values["request_count"] += 1
+            values["prompt_tokens"] += usage.prompt_tokens or 0
+            values["completion_tokens"] += usage.completion_tokens or 0
+            values["total_latency_ms"] += usage.latency_ms or 0
+            pending[key[0]] += usage.total_tokens
+
+        db = SessionLocal()
+        try:
+            chat_token_usage.add_usages(db, rollup)
+        finally:
+            db.close()
+            # 写入失败时这批用量丢弃，同样不再计入配额
+            with self._pending_lock:
+                for user_id, tokens in pending.items():
+                    left = self._pending.get(user_id, 0) - tokens
+                    if left > 0:
+                        self._pending[user_id] = left
+                    else:
+                        self._pending.pop(user_id, None)
+        return len(rollup)
+
+
+token_usage_writer = TokenUsageWriter(
+    flush_interval=settings.TOKEN_USAGE_FLUSH_INTERVAL,
+    max_queue_size=settings.TOKEN_USAGE_QUEUE_SIZE,
+)
+
+
+class TokenQuotaService:
+
+    @staticmethod
+    def get_daily_quota(user_id: int) -> int:
+        """用户每天可用的 token 数，0 表示不限制"""
+        return settings.TOKEN_DAILY_QUOTA_OVERRIDES.get(user_id, settings.TOKEN_DAILY_QUOTA)
+
+    @staticmethod
+    def check_quota(db: Session, user_id: int) -> None:
+        """用户当天的用量已达到配额时拒绝调用模型"""
+        quota = TokenQuotaService.get_daily_quota(user_id)
+        if quota <= 0:
+            return
+        used = chat_token_usage.get_user_tokens(db, user_id=user_id, stat_date=date.today())
+        used += token_usage_writer.pending_tokens(user_id)
+        if used >= quota:
+            logger.warning(f"用户 {user_id} 今日 token 用量 {used} 已达到配额 {quota}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="今日 token 用量已达上限，请明天再试"
+            )
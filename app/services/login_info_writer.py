@@ -0,0 +1,42 @@
+"""
+登录信息异步写入
+
+登录成功后需要记录最后登录IP与时间，这一写入不影响登录结果，却要占用一次数据库提交。
+登录请求只把记录放入队列即返回；后台线程按 LOGIN_INFO_FLUSH_INTERVAL 合并同一用户的多次登录，
+在一个事务中批量写入。队列满时丢弃新的记录，进程退出时写入剩余记录。
+"""
+from datetime import datetime
+from typing import Dict, List, Tuple
+from app.core.background import BackgroundBatchWriter
+from app.core.config import settings
+from app.services.user_service import UserService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LoginInfoWriter(BackgroundBatchWriter[Tuple[int, str, datetime]]):
+    """登录信息的后台批量写入器"""
+
+    def __init__(self, flush_interval: float, max_queue_size: int):
+        super().__init__("login-info-writer", flush_interval, max_queue_size)
+
+    def submit(self, user_id: int, login_ip: str) -> None:
+        """记录一次登录，立即返回"""
+        if not self._put((user_id, login_ip, datetime.now())):
+            logger.warning(f"登录信息队列已满，丢弃用户 {user_id} 的登录信息")
+
+    def write(self, batch: List[Tuple[int, str, datetime]]) -> int:
+        """写入一批登录记录，返回写入的用户数"""
+        # 同一用户在一个批次内多次登录时只保留最后一次
+        login_infos: Dict[int, Tuple[str, datetime]] = {
+            user_id: (login_ip, login_date) for user_id, login_ip, login_date in batch
+        }
+        UserService.update_login_infos(login_infos)
+        return len(login_infos)
+
+
+login_info_writer = LoginInfoWriter(
+    flush_interval=settings.LOGIN_INFO_FLUSH_INTERVAL,
+    max_queue_size=settings.LOGIN_INFO_QUEUE_SIZE,
+)
@@ -0,0 +1,129 @@
+"""
+字典快照缓存
+
+字典类型与字典数据很少修改，却在前端每次启动、每个下拉框渲染时被读取。
+这里把全部字典读入一份内存快照，响应体按请求参数预先序列化一次并计算 ETag，
+之后的请求直接返回同一份 bytes；客户端携带匹配的 If-None-Match 时返回 304。
+
+DictDataService / DictTypeService 的增删改会使快照失效，下一次读取时重建。
+失效通过缓存后端的 dict 命名空间广播，多个 worker 的快照一起失效。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.cache import cache
+from app.crud.system.dict_data import dict_data
+from app.crud.system.dict_type import dict_type
+from app.schemas.common.response import ResponseModel
+from app.schemas.system.dict_data import DictDataSimpleResp
+from app.schemas.system.dict_type import DictTypeSimpleResp
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每份快照最多保存的预序列化响应数量（按字典类型、批量组合区分）
+MAX_BODIES = 256
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+class DictSnapshot:
+    """某一时刻的全部字典"""
+
+    def __init__(self, types: List[dict], data_by_type: Dict[str, List[dict]], enabled_data: List[dict]):
+        self.types = types  # 启用的字典类型
+        self.data_by_type = data_by_type  # 字典类型 -> 未删除的字典数据（按 sort 排序）
+        self.enabled_data = enabled_data  # 启用的字典数据
+        self._bodies: "OrderedDict[Hashable, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def body(self, key: Hashable, build: Callable[[], object]) -> Tuple[bytes, str]:
+        """返回 key 对应的响应体与 ETag，首次请求时序列化 ResponseModel(data=build())"""
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is not None:
+                self._bodies.move_to_end(key)
+                return cached
+        body = ResponseModel(data=build()).model_dump_json().encode("utf-8")
+        cached = (body, make_etag(body))
+        with self._lock:
+            self._bodies[key] = cached
+            while len(self._bodies) > MAX_BODIES:
+                self._bodies.popitem(last=False)
+        return cached
+
+    def data_list(self, type: Optional[str] = None) -> Tuple[bytes, str]:
+        """字典数据列表：指定类型时返回该类型的全部数据，否则返回全部启用的数据"""
+        if type:
+            return self.body(("data", type), lambda: self.data_by_type.get(type, []))
+        return self.body(("data", None), lambda: self.enabled_data)
+
+    def data_by_types(self, types: List[str]) -> Tuple[bytes, str]:
+        """批量获取多个类型的字典数据：{类型: [数据]}"""
+        types = sorted(set(types))
+        return self.body(("types",) + tuple(types), lambda: {t: self.data_by_type.get(t, []) for t in types})
+
+    def type_list(self) -> Tuple[bytes, str]:
+        return self.body(("type", None), lambda: self.types)
+
+
+class DictCache:
+    """持有当前的字典快照"""
+
+    def __init__(self):
+        self._snapshot: Optional[DictSnapshot] = None
+        # 每次失效加一；加载期间发生失效时丢弃加载结果，避免缓存旧数据
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._namespace = cache.namespace("dict")
+        self._namespace.on_invalidate(lambda name, key: self._drop())
+
+    def get(self, db: Session) -> DictSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        # 同一时刻只有一个请求从数据库加载，其余请求等待后直接使用结果
+        with self._load_lock:
+            with self._lock:
+                if self._snapshot is not None:
+                    return self._snapshot
+                generation = self._generation
+            snapshot = self._load(db)
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        """字典被修改后调用，通知所有 worker 丢弃快照"""
+        self._drop()
+        self._namespace.invalidate_all()
+
+    def _drop(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    @staticmethod
+    def _load(db: Session) -> DictSnapshot:
+        types = [
+            DictTypeSimpleResp.model_validate(item).model_dump()
+            for item in dict_type.get_multi_by_status(db, status=0)
+        ]
+        data_by_type: Dict[str, List[dict]] = {}
+        enabled_data: List[dict] = []
+        for item in dict_data.get_all(db):
+            simple = DictDataSimpleResp.model_validate(item.to_dict()).model_dump()
+            data_by_type.setdefault(item.dict_type, []).append(simple)
+            if item.status == 0:
+                enabled_data.append(simple)
+        logger.info(f"加载字典快照: {len(types)} 个类型, {sum(len(v) for v in data_by_type.values())} 条数据")
+        return DictSnapshot(types, data_by_type, enabled_data)
+
+
+dict_cache = DictCache()
@@ -1,11 +1,13 @@
-from typing import List
+from typing import List, Tuple
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.crud.system.dict_data import dict_data
+from app.services.system.dict_cache import dict_cache
 from app.schemas.system.dict_data import (
-    DictDataCreate, DictDataUpdate, DictDataPageReq, DictDataResp, DictDataSimpleResp
+    DictDataCreate, DictDataUpdate, DictDataPageReq, DictDataResp
 )
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 from typing import List
 
@@ -23,6 +25,7 @@ class DictDataService:
             )
         
         db_obj = dict_data.create(db, obj_in=dict_data_in)
+        dict_cache.invalidate()
         return ResponseModel(data=db_obj.id)
 
     @staticmethod
@@ -46,6 +49,7 @@ class DictDataService:
             )
         
         dict_data.update(db, db_obj=db_dict_data, obj_in=dict_data_in)
+        dict_cache.invalidate()
         return ResponseModel(data=True)
 
     @staticmethod
@@ -59,6 +63,7 @@ class DictDataService:
         
         # 使用软删除
         dict_data.soft_remove(db, id=id)
+        dict_cache.invalidate()
         return ResponseModel(data=True)
 
     @staticmethod
@@ -73,25 +78,33 @@ class DictDataService:
 
     @staticmethod
     def get_dict_data_page(db: Session, page: DictDataPageReq) -> ResponseModel[PageResult[DictDataResp]]:
-        items, total = dict_data.get_page(db, page=page)
+        try:
+            items, total, next_cursor = dict_data.get_page(db, page=page)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         page_result = PageResult(
             list=[DictDataResp.model_validate(item.to_dict()) for item in items],
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         return ResponseModel(data=page_result)
 
     @staticmethod
-    def get_dict_data_list(db: Session, dict_type: str = None) -> ResponseModel[List[DictDataSimpleResp]]:
-        """获取字典数据列表（用于前端缓存）"""
-        if dict_type:
-            items = dict_data.get_multi_by_dict_type(db, dict_type=dict_type)
-        else:
-            items = dict_data.get_multi_by_status(db, status=0)  # 只查询启用状态
-        
-        # 将 SQLAlchemy 对象转换为字典，然后验证
-        return ResponseModel(data=[DictDataSimpleResp.model_validate(item.to_dict()) for item in items])
+    def get_dict_data_list(db: Session, dict_type: str = None) -> Tuple[bytes, str]:
+        """
+        获取字典数据列表（用于前端缓存）
+
+        指定类型时返回该类型的全部数据，否则只返回启用状态的数据。
+        数据来自字典快照，返回预先序列化的 ResponseModel[List[DictDataSimpleResp]] 与 ETag。
+        """
+        return dict_cache.get(db).data_list(dict_type)
+
+    @staticmethod
+    def get_dict_data_by_types(db: Session, dict_types: List[str]) -> Tuple[bytes, str]:
+        """批量获取多个类型的字典数据，返回预先序列化的 ResponseModel[Dict[str, List[DictDataSimpleResp]]] 与 ETag"""
+        return dict_cache.get(db).data_by_types(dict_types)
 
     @staticmethod
     def get_dict_data_by_type_and_value(db: Session, dict_type: str, value: str) -> ResponseModel[DictDataResp]:
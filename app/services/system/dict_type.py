@@ -1,8 +1,10 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from app.crud.system.dict_type import dict_type
+from app.services.system.dict_cache import dict_cache
 from app.schemas.system.dict_type import DictTypeCreate, DictTypeUpdate, DictTypePageReq, DictTypeResp
+from app.schemas.common.pagination import InvalidCursorError
 from app.schemas.common.response import PageResult, ResponseModel
 
 class DictTypeService:
@@ -17,6 +19,7 @@ class DictTypeService:
             )
         
         db_obj = dict_type.create(db, obj_in=dict_type_in)
+        dict_cache.invalidate()
         return ResponseModel(data=db_obj.id)
 
     @staticmethod
@@ -38,6 +41,7 @@ class DictTypeService:
             )
         
         dict_type.update(db, db_obj=db_dict_type, obj_in=dict_type_in)
+        dict_cache.invalidate()
         return ResponseModel(data=True)
 
     @staticmethod
@@ -51,6 +55,7 @@ class DictTypeService:
         
         # 使用软删除
         dict_type.soft_remove(db, id=id)
+        dict_cache.invalidate()
         return ResponseModel(data=True)
 
     @staticmethod
@@ -65,12 +70,16 @@ class DictTypeService:
 
     @staticmethod
     def get_dict_type_page(db: Session, page: DictTypePageReq) -> ResponseModel[PageResult[DictTypeResp]]:
-        items, total = dict_type.get_page(db, page=page)
+        try:
+            items, total, next_cursor = dict_type.get_page(db, page=page)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         page_result = PageResult(
             list=[DictTypeResp.model_validate(item) for item in items],
             total=total,
             pageNo=page.pageNo,
-            pageSize=page.pageSize
+            pageSize=page.pageSize,
+            nextCursor=next_cursor
         )
         return ResponseModel(data=page_result)
 
@@ -80,3 +89,8 @@ class DictTypeService:
         if db_dict_type:
             return ResponseModel(data=DictTypeResp.model_validate(db_dict_type))
         return ResponseModel(data=None)
+
+    @staticmethod
+    def get_simple_dict_type_list(db: Session) -> Tuple[bytes, str]:
+        """获取启用的字典类型列表，返回预先序列化的 ResponseModel[List[DictTypeSimpleResp]] 与 ETag"""
+        return dict_cache.get(db).type_list()
@@ -1,26 +1,46 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app.db.session import get_db  # 更新导入路径
+from fastapi.concurrency import run_in_threadpool
+from app.db.session import SessionLocal
 from app.models.user import SystemUser
-from app.utils.password import hash_password, verify_password, generate_default_password
-from app.schemas.user_schema import UserRegisterRequest
-from typing import Optional
+from app.utils.password import (
+    ahash_password, averify_password, hash_password, verify_password, needs_rehash, generate_default_password
+)
+from app.schemas.user_schema import UserPrincipal, UserRegisterRequest
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.metrics import AUTH_USER_CACHE
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 已认证用户信息缓存，键为用户ID
+principal_cache = cache.namespace("user_principal", ttl=settings.USER_PRINCIPAL_CACHE_TTL)
+
 class UserService:
     """用户服务类"""
     
     @staticmethod
     def get_db() -> Session:
-        """获取数据库会话"""
-        return next(get_db())
+        """获取数据库会话，调用方负责关闭"""
+        return SessionLocal()
     
     @staticmethod
     def create_user(user_data: UserRegisterRequest) -> Optional[SystemUser]:
         """创建新用户"""
+        return UserService._insert_user(user_data, hash_password(user_data.password))
+
+    @staticmethod
+    async def acreate_user(user_data: UserRegisterRequest) -> Optional[SystemUser]:
+        """创建新用户（异步）：密码在哈希线程池中加密，数据库写入在线程池中执行"""
+        hashed_password = await ahash_password(user_data.password)
+        return await run_in_threadpool(UserService._insert_user, user_data, hashed_password)
+
+    @staticmethod
+    def _insert_user(user_data: UserRegisterRequest, hashed_password: str) -> Optional[SystemUser]:
+        """写入新用户，密码已加密"""
         try:
             db = UserService.get_db()
             
@@ -35,7 +55,6 @@ class UserService:
                 return None
             
             # 创建新用户
-            hashed_password = hash_password(user_data.password)
             new_user = SystemUser(
                 username=user_data.username,
                 password=hashed_password,
@@ -69,6 +88,34 @@ class UserService:
     @staticmethod
     def authenticate_user(username: str, password: str) -> Optional[SystemUser]:
         """用户认证"""
+        user = UserService._get_login_user(username)
+        if not user:
+            return None
+        user = UserService._check_password(user, verify_password(password, user.password))
+        if user and needs_rehash(user.password):
+            UserService._save_rehashed_password(user, hash_password(password))
+        return user
+
+    @staticmethod
+    async def aauthenticate_user(username: str, password: str) -> Optional[SystemUser]:
+        """用户认证（异步）：查询在线程池中执行，密码在哈希线程池中验证，不阻塞事件循环"""
+        user = await run_in_threadpool(UserService._get_login_user, username)
+        if not user:
+            return None
+        try:
+            matched = await averify_password(password, user.password)
+        except Exception as e:
+            logger.error(f"用户认证失败: {str(e)}")
+            return None
+        user = UserService._check_password(user, matched)
+        if user and needs_rehash(user.password):
+            new_hash = await ahash_password(password)
+            await run_in_threadpool(UserService._save_rehashed_password, user, new_hash)
+        return user
+
+    @staticmethod
+    def _get_login_user(username: str) -> Optional[SystemUser]:
+        """查找可以登录的用户（存在且状态正常）"""
         try:
             db = UserService.get_db()
             
@@ -87,12 +134,6 @@ class UserService:
                 logger.warning(f"用户 {username} 认证失败: 状态异常 {user.status}")
                 return None
             
-            # 验证密码
-            if not verify_password(password, user.password):
-                logger.warning(f"用户 {username} 认证失败: 密码错误")
-                return None
-            
-            logger.info(f"用户 {username} 认证成功")
             return user
             
         except Exception as e:
@@ -100,6 +141,37 @@ class UserService:
             return None
         finally:
             db.close()
+
+    @staticmethod
+    def _check_password(user: SystemUser, matched: bool) -> Optional[SystemUser]:
+        if not matched:
+            logger.warning(f"用户 {user.username} 认证失败: 密码错误")
+            return None
+        logger.info(f"用户 {user.username} 认证成功")
+        return user
+
+    @staticmethod
+    def _save_rehashed_password(user: SystemUser, new_hash: str) -> bool:
+        """登录成功后用当前哈希参数重新保存密码；期间密码已被修改时不覆盖"""
+        try:
+            db = UserService.get_db()
+            
+            updated = db.query(SystemUser).filter(
+                SystemUser.id == user.id,
+                SystemUser.password == user.password
+            ).update({SystemUser.password: new_hash}, synchronize_session=False)
+            db.commit()
+            if updated:
+                user.password = new_hash
+                logger.info(f"用户 {user.username} 的密码哈希已按新参数重新计算")
+            return bool(updated)
+            
+        except Exception as e:
+            logger.error(f"重新计算密码哈希失败: {str(e)}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
     
     @staticmethod
     def update_login_info(user_id: int, login_ip: str) -> bool:
@@ -117,6 +189,7 @@ class UserService:
             user.update_time = datetime.now()
             
             db.commit()
+            UserService.invalidate_principal(user_id)
             logger.info(f"用户 {user.username} 登录信息更新成功")
             return True
             
@@ -127,6 +200,34 @@ class UserService:
         finally:
             db.close()
     
+    @staticmethod
+    def update_login_infos(login_infos: Dict[int, Tuple[str, datetime]]) -> bool:
+        """在一个事务中批量更新登录信息，login_infos 为 用户ID -> (登录IP, 登录时间)"""
+        if not login_infos:
+            return True
+        try:
+            db = UserService.get_db()
+            
+            users = db.query(SystemUser).filter(SystemUser.id.in_(list(login_infos))).all()
+            now = datetime.now()
+            for user in users:
+                user.login_ip, user.login_date = login_infos[user.id]
+                user.updater = "system"
+                user.update_time = now
+            
+            db.commit()
+            for user in users:
+                UserService.invalidate_principal(user.id)
+            logger.info(f"批量更新了 {len(users)} 个用户的登录信息")
+            return True
+            
+        except Exception as e:
+            logger.error(f"批量更新登录信息失败: {str(e)}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
     @staticmethod
     def get_user_by_id(user_id: int) -> Optional[SystemUser]:
         """根据ID获取用户"""
@@ -143,6 +244,27 @@ class UserService:
         finally:
             db.close()
     
+    @staticmethod
+    def get_principal(user_id: int) -> Optional[UserPrincipal]:
+        """获取已认证用户的身份信息，优先读缓存"""
+        raw = principal_cache.get(str(user_id))
+        if raw is not None:
+            AUTH_USER_CACHE.inc(result="hit")
+            return UserPrincipal.model_validate_json(raw)
+
+        AUTH_USER_CACHE.inc(result="miss")
+        user = UserService.get_user_by_id(user_id)
+        if not user:
+            return None
+        principal = UserPrincipal.model_validate(user)
+        principal_cache.set(str(user_id), principal.model_dump_json().encode("utf-8"))
+        return principal
+
+    @staticmethod
+    def invalidate_principal(user_id: int) -> None:
+        """用户信息变化后删除缓存（通过缓存后端通知所有 worker）"""
+        principal_cache.delete(str(user_id))
+
     @staticmethod
     def get_user_by_username(username: str) -> Optional[SystemUser]:
         """根据用户名获取用户"""
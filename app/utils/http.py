@@ -0,0 +1,19 @@
+from fastapi import Request, Response
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """请求头 If-None-Match 是否与 ETag 匹配（忽略弱校验前缀 W/）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [item.strip() for item in header.split(",")]
+    return "*" in candidates or etag in [c[2:] if c.startswith("W/") else c for c in candidates]
+
+
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """返回预先序列化的 JSON；客户端缓存仍然有效时返回 304"""
+    # no-cache：客户端可以缓存，但每次使用前都要带 If-None-Match 验证
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
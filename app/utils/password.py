@@ -1,16 +1,67 @@
+"""
+密码哈希
+
+项目中唯一的密码哈希实现（bcrypt），app/core/security.py 也委托到这里。
+成本因子由 PASSWORD_BCRYPT_ROUNDS 配置，每加 1 计算时间翻倍；
+调整后，旧参数生成的哈希会在用户下次登录成功时自动重新计算（见 needs_rehash）。
+"""
+import asyncio
 import bcrypt
+import os
 import secrets
 import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.core.config import settings
+
+# 密码哈希专用线程池：bcrypt 计算期间释放 GIL，可以多核并行；
+# 与数据库等 IO 任务使用的线程池分开，登录高峰时哈希任务排队，不会占满全部线程
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    thread_name_prefix="password-hash",
+)
+
+# bcrypt 只使用前 72 字节；旧版本 bcrypt 与 passlib 会静默截断，这里保持一致，已有的哈希仍然可以验证
+_BCRYPT_MAX_BYTES = 72
 
-def hash_password(password: str) -> str:
-    """对密码进行哈希加密"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+def _encode(password: str) -> bytes:
+    return password.encode('utf-8')[:_BCRYPT_MAX_BYTES]
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    """对密码进行哈希加密，rounds 默认取 PASSWORD_BCRYPT_ROUNDS"""
+    salt = bcrypt.gensalt(rounds=rounds or settings.PASSWORD_BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_encode(password), salt)
     return hashed.decode('utf-8')
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """验证密码，哈希格式无效时返回 False"""
+    try:
+        return bcrypt.checkpw(_encode(password), hashed_password.encode('utf-8'))
+    except ValueError:
+        return False
+
+def get_rounds(hashed_password: str) -> Optional[int]:
+    """从 bcrypt 哈希（$2b$12$...）中读取成本因子，格式无效时返回 None"""
+    parts = hashed_password.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(hashed_password: str) -> bool:
+    """哈希参数与当前配置不一致时需要重新计算"""
+    return get_rounds(hashed_password) != settings.PASSWORD_BCRYPT_ROUNDS
+
+async def ahash_password(password: str) -> str:
+    """在密码哈希线程池中加密，不阻塞事件循环"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, hash_password, password)
+
+async def averify_password(password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证，不阻塞事件循环"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, verify_password, password, hashed_password)
+
+def shutdown_hash_executor() -> None:
+    """关闭密码哈希线程池"""
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
 
 def is_password_strong(password: str) -> bool:
     """检查密码强度"""
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+系统提示渲染微基准
+
+对比异步对话接口（aget_ai_response / astream_ai_response）每轮在调用模型之前的准备耗时，
+即 ChatService._prepare_llm_call 组装 [系统提示, 历史, 当前消息] 的 CPU 时间：
+- 每轮渲染：系统提示每轮重新拼接（改动前的做法）；
+- 复用：相同配置的系统提示只渲染一次（_render_system_prompt）。
+
+上下文读取由进程内缓存返回固定的 10 条消息，模型实例提前创建，只统计组装本身；
+结果换算为给定 RPS 下占用的 CPU 核数。
+
+用法: python benchmark_chat_prompt.py [轮数] [RPS ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.crud.ai.chat_message import ContextMessage, chat_message
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.services.ai import chat as chat_service
+from app.services.ai.chat import ChatService
+
+CONFIG = EffectiveChatConfig(
+    conversation_id=1, user_id=1, model_id=1, model="deepseek-chat", model_name="DeepSeek",
+    llm_model="deepseek-chat", platform="deepseek", system_message="你是一名耐心的数学老师，" * 20,
+)
+HISTORY = [
+    ContextMessage(i, "user" if i % 2 == 0 else "assistant", f"第 {i // 2} 个{'问题' if i % 2 == 0 else '回答'}")
+    for i in range(10)
+]
+
+
+def _measure(rounds):
+    start = time.process_time()
+    for _ in range(rounds):
+        ChatService._prepare_llm_call(None, CONFIG, "你好")
+    return (time.process_time() - start) / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rps_list = [int(value) for value in sys.argv[2:]] or [100, 300, 500]
+
+    llm = object()
+    memoized = chat_service._render_system_prompt
+    create_llm = ChatService.__dict__["_create_llm"]
+    chat_message.get_context_rows = lambda db, **kwargs: list(HISTORY)
+    ChatService._create_llm = staticmethod(lambda config: llm)
+    try:
+        chat_service._render_system_prompt = memoized.__wrapped__
+        _, expected = ChatService._prepare_llm_call(None, CONFIG, "你好")
+        per_turn = _measure(rounds)
+        chat_service._render_system_prompt = memoized
+        _, actual = ChatService._prepare_llm_call(None, CONFIG, "你好")
+        assert actual == expected, "两种方式发给模型的消息应一致"
+        cached = _measure(rounds)
+    finally:
+        chat_service._render_system_prompt = memoized
+        del chat_message.get_context_rows
+        ChatService._create_llm = create_llm
+
+    print(f"每项 {rounds} 轮，CPU 时间（process_time），发送 {len(expected)} 条消息")
+    print(f"{'每轮渲染(μs)':>14}{'复用(μs)':>12}{'节省(μs)':>12}")
+    print(f"{per_turn * 1e6:>14.1f}{cached * 1e6:>12.1f}{(per_turn - cached) * 1e6:>12.1f}")
+    print()
+    print(f"{'RPS':>6}{'每轮渲染(核)':>14}{'复用(核)':>12}{'节省(核)':>12}")
+    for rps in rps_list:
+        print(f"{rps:>6}{per_turn * rps:>14.4f}{cached * rps:>12.4f}{(per_turn - cached) * rps:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
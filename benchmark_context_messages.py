@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+上下文组装微基准
+
+对比两种从数据库读取上下文并转换为 LangChain 消息的方式：
+- ORM：查询完整的 ChatMessage 对象（连接对话、角色、模型），再复制 type/content
+- 投影：chat_message.get_context_rows 只查询 (id, type, content)，直接转换
+
+在内存 SQLite 中构造一个长对话，分别统计 max_contexts 为 10、50、200 时
+每轮的平均耗时与内存分配峰值。
+
+用法: python benchmark_context_messages.py [轮数]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import Base
+from app.models import user  # noqa: F401
+from app.models.ai import api_key as api_key_model, chat_conversation as chat_conversation_model  # noqa: F401
+from app.models.ai import chat_role as chat_role_model, model as model_model  # noqa: F401
+from app.models.ai.chat_message import ChatMessage
+from app.services.ai.chat import ChatService
+
+CONVERSATION_ID = 1
+MESSAGE_COUNT = 400
+CONTEXT_SIZES = (10, 50, 200)
+
+
+def _setup():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    start = datetime(2024, 1, 1)
+    for i in range(MESSAGE_COUNT):
+        session.add(ChatMessage(
+            id=i + 1,
+            conversation_id=CONVERSATION_ID,
+            user_id=1,
+            type="user" if i % 2 == 0 else "assistant",
+            model="deepseek-chat",
+            model_id=1,
+            content=f"第 {i} 条消息，" + "这是一段用于测试的对话内容。" * 20,
+            use_context=True,
+            create_time=start + timedelta(seconds=i),
+            deleted=False,
+        ))
+    session.commit()
+    return session
+
+
+def orm_path(db, max_contexts):
+    """原实现：完整 ORM 对象 -> dict -> LangChain 消息"""
+    messages = db.query(ChatMessage).options(
+        joinedload(ChatMessage.conversation), joinedload(ChatMessage.role), joinedload(ChatMessage.ai_model)
+    ).filter(
+        ChatMessage.conversation_id == CONVERSATION_ID,
+        ChatMessage.deleted == 0
+    ).order_by(ChatMessage.create_time.desc()).limit(max_contexts).all()
+
+    context_messages = []
+    for msg in reversed(messages):
+        context_messages.append({"role": msg.type, "content": msg.content})
+
+    result = []
+    for msg in context_messages:
+        if msg["role"] == "system":
+            result.append(SystemMessage(content=msg["content"]))
+        elif msg["role"] == "user":
+            result.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            result.append(AIMessage(content=msg["content"]))
+    return result
+
+
+def projection_path(db, max_contexts):
+    """当前实现：(id, type, content) 元组 -> LangChain 消息"""
+    rows = ChatService._build_context_messages(db, CONVERSATION_ID, max_contexts)
+    return ChatService._to_langchain_messages(rows)
+
+
+def _measure(db, func, max_contexts, rounds):
+    # 每轮结束后清空会话，避免身份映射中的对象被复用
+    func(db, max_contexts)
+    db.expunge_all()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(db, max_contexts)
+        db.expunge_all()
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    func(db, max_contexts)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.expunge_all()
+    return elapsed, peak
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db = _setup()
+    try:
+        print(f"=== 上下文组装基准（{rounds} 轮） ===")
+        print(f"{'max_contexts':>12} | {'ORM 耗时':>10} | {'投影耗时':>10} | {'ORM 峰值':>10} | {'投影峰值':>10}")
+        for size in CONTEXT_SIZES:
+            assert [m.content for m in orm_path(db, size)] == [m.content for m in projection_path(db, size)]
+            orm_time, orm_peak = _measure(db, orm_path, size, rounds)
+            proj_time, proj_peak = _measure(db, projection_path, size, rounds)
+            print(
+                f"{size:>12} | {orm_time * 1000:>8.3f}ms | {proj_time * 1000:>8.3f}ms | "
+                f"{orm_peak / 1024:>8.1f}KB | {proj_peak / 1024:>8.1f}KB"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
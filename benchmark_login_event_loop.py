@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+登录时的事件循环延迟基准
+
+并发发起 N 次登录，同时运行一个每 5ms 唤醒一次的探测协程，记录它实际被唤醒的延迟：
+- 阻塞：原实现，在协程中直接调用 UserService.authenticate_user 与 update_login_info，
+  数据库查询与 bcrypt 校验都在事件循环线程上执行；
+- 卸载：当前实现，aauthenticate_user 把查询放入线程池、bcrypt 放入密码哈希线程池，
+  登录信息交给 login_info_writer 后台批量写入。
+
+探测延迟就是同一 worker 上其他请求在登录高峰期间需要额外等待的时间。
+数据库使用临时 SQLite 文件（sqlite_test_db.temp_sqlite），结束时恢复 SessionLocal 并删除。
+
+用法: python benchmark_login_event_loop.py [并发登录数]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import sessionmaker
+
+import app.services.user_service as user_service
+from app.models.user import SystemUser
+from app.services.login_info_writer import login_info_writer
+from app.services.user_service import UserService
+from app.utils.password import hash_password
+from sqlite_test_db import temp_sqlite
+
+PASSWORD = "benchmark-password"
+PROBE_INTERVAL = 0.005
+
+
+def _setup(session_factory: sessionmaker, count: int) -> None:
+    hashed = hash_password(PASSWORD)
+    db = session_factory()
+    for i in range(count):
+        db.add(SystemUser(username=f"user{i}", password=hashed, nickname=f"用户{i}", status=0, tenant_id=0))
+    db.commit()
+    db.close()
+
+
+async def login_blocking(username: str) -> bool:
+    user = UserService.authenticate_user(username, PASSWORD)
+    if user:
+        UserService.update_login_info(user.id, "127.0.0.1")
+    return user is not None
+
+
+async def login_offloaded(username: str) -> bool:
+    user = await UserService.aauthenticate_user(username, PASSWORD)
+    if user:
+        login_info_writer.submit(user.id, "127.0.0.1")
+    return user is not None
+
+
+async def _probe(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def _run(login, count: int):
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[login(f"user{i}") for i in range(count)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    assert all(results), "存在登录失败"
+    return elapsed, lags
+
+
+def _report(count: int) -> None:
+    print(f"=== 事件循环延迟（{count} 个并发登录，探测间隔 {PROBE_INTERVAL * 1000:.0f}ms，CPU {os.cpu_count()} 核） ===")
+    print(f"{'方式':<6} | {'总耗时':>8} | {'登录/秒':>8} | {'平均延迟':>8} | {'p99 延迟':>8} | {'最大延迟':>8}")
+    for label, login in (("阻塞", login_blocking), ("卸载", login_offloaded)):
+        elapsed, lags = asyncio.run(_run(login, count))
+        lags_ms = sorted(lag * 1000 for lag in lags)
+        p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+        print(
+            f"{label:<6} | {elapsed * 1000:>6.0f}ms | {count / elapsed:>8.1f} | "
+            f"{statistics.mean(lags_ms):>6.1f}ms | {p99:>6.1f}ms | {lags_ms[-1]:>6.1f}ms"
+        )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    with temp_sqlite(SystemUser.__table__, session_modules=[user_service]) as session_factory:
+        _setup(session_factory, count)
+        try:
+            _report(count)
+        finally:
+            # 剩余的登录信息在恢复 SessionLocal 之前写入临时库
+            login_info_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+密码哈希吞吐量基准
+
+对不同的 bcrypt 成本因子，测量：
+- 单核：单线程连续哈希，每秒可完成的哈希（即验证）次数；
+- 线程池：PASSWORD_HASH_WORKERS 个线程并发哈希（bcrypt 计算期间释放 GIL），实际的每秒次数。
+
+登录时验证一次密码的耗时与哈希相同，据此可以估算每个 worker 每秒能承受的登录数，
+再结合安全要求选择 PASSWORD_BCRYPT_ROUNDS。
+
+用法: python benchmark_password_hashing.py [最小成本] [最大成本]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.utils.password import get_rounds, hash_password, needs_rehash, verify_password
+
+PASSWORD = "benchmark-password"
+MIN_DURATION = 1.0  # 每项测量至少持续的秒数
+
+
+def _single_core(rounds: int) -> float:
+    count = 0
+    start = time.perf_counter()
+    while True:
+        hash_password(PASSWORD, rounds=rounds)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_DURATION and count >= 2:
+            return count / elapsed
+
+
+def _pool(rounds: int, workers: int, per_second: float) -> float:
+    # 让每个线程大约运行 MIN_DURATION 秒
+    count = max(workers * 2, int(per_second * workers * MIN_DURATION))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: hash_password(PASSWORD, rounds=rounds), range(count)))
+        return count / (time.perf_counter() - start)
+
+
+def main():
+    low = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    high = int(sys.argv[2]) if len(sys.argv) > 2 else 13
+    workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+    hashed = hash_password(PASSWORD)
+    assert verify_password(PASSWORD, hashed) and get_rounds(hashed) == settings.PASSWORD_BCRYPT_ROUNDS
+    assert not needs_rehash(hashed) and needs_rehash(hash_password(PASSWORD, rounds=low))
+
+    print(f"=== bcrypt 吞吐量（CPU {os.cpu_count()} 核，线程池 {workers} 线程，当前配置 rounds={settings.PASSWORD_BCRYPT_ROUNDS}） ===")
+    print(f"{'rounds':>6} | {'单次耗时':>10} | {'单核 次/秒':>10} | {'线程池 次/秒':>12}")
+    for rounds in range(low, high + 1):
+        per_second = _single_core(rounds)
+        pooled = _pool(rounds, workers, per_second)
+        marker = " *" if rounds == settings.PASSWORD_BCRYPT_ROUNDS else ""
+        print(f"{rounds:>6} | {1000 / per_second:>8.1f}ms | {per_second:>10.1f} | {pooled:>12.1f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
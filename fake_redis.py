@@ -0,0 +1,262 @@
+"""
+测试用的 Redis 协议服务器
+
+实现 RedisCacheBackend 用到的命令子集（GET/SET/DEL/INCRBY/PUBLISH/SUBSCRIBE 等），
+数据保存在内存中。测试时无需部署 Redis，即可验证缓存在多个连接、多个进程之间的共享与失效广播：
+
+    server = FakeRedisServer()
+    server.start()
+    backend = RedisCacheBackend(server.url)
+    ...
+    server.stop()
+"""
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class _RESPError(Exception):
+    pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        self.channels: Set[str] = set()
+        self.write_lock = threading.Lock()
+        try:
+            while True:
+                command = self._read_command()
+                if command is None:
+                    return
+                self._execute(command)
+        except (ConnectionError, OSError):
+            return
+        finally:
+            self.server.state.unsubscribe_all(self)
+
+    def _read_line(self) -> Optional[bytes]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return line.rstrip(b"\r\n")
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self._read_line()
+        if line is None:
+            return None
+        if not line.startswith(b"*"):
+            # inline 命令（例如 telnet 手动输入）
+            return line.split()
+        parts = []
+        for _ in range(int(line[1:])):
+            header = self._read_line()
+            if header is None:
+                return None
+            length = int(header[1:])
+            parts.append(self.rfile.read(length + 2)[:length])
+        return parts
+
+    def send(self, payload: bytes) -> None:
+        with self.write_lock:
+            self.wfile.write(payload)
+            self.wfile.flush()
+
+    def _execute(self, command: List[bytes]) -> None:
+        name = command[0].decode().upper()
+        args = command[1:]
+        try:
+            handler = getattr(self, f"cmd_{name.lower()}", None)
+            if handler is None:
+                raise _RESPError(f"ERR unknown command '{name}'")
+            handler(args)
+        except _RESPError as e:
+            self.send(b"-" + str(e).encode() + b"\r\n")
+
+    # ---- 命令 ----
+
+    def cmd_ping(self, args):
+        self.send(_bulk(args[0]) if args else b"+PONG\r\n")
+
+    def cmd_select(self, args):
+        self.send(b"+OK\r\n")
+
+    def cmd_client(self, args):
+        self.send(b"+OK\r\n")
+
+    def cmd_flushdb(self, args):
+        self.server.state.flush()
+        self.send(b"+OK\r\n")
+
+    def cmd_get(self, args):
+        self.send(_bulk(self.server.state.get(args[0])))
+
+    def cmd_set(self, args):
+        key, value, options = args[0], args[1], [a.decode().upper() for a in args[2:]]
+        ttl = None
+        if "EX" in options:
+            ttl = float(options[options.index("EX") + 1])
+        elif "PX" in options:
+            ttl = float(options[options.index("PX") + 1]) / 1000
+        exists = self.server.state.get(key) is not None
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            self.send(b"$-1\r\n")
+            return
+        self.server.state.set(key, value, ttl)
+        self.send(b"+OK\r\n")
+
+    def cmd_del(self, args):
+        self.send(_int(self.server.state.delete(args)))
+
+    def cmd_incr(self, args):
+        self.cmd_incrby([args[0], b"1"])
+
+    def cmd_incrby(self, args):
+        try:
+            self.send(_int(self.server.state.incr(args[0], int(args[1]))))
+        except ValueError:
+            raise _RESPError("ERR value is not an integer or out of range")
+
+    def cmd_expire(self, args):
+        self.send(_int(self.server.state.expire(args[0], float(args[1]))))
+
+    def cmd_publish(self, args):
+        self.send(_int(self.server.state.publish(args[0].decode(), args[1])))
+
+    def cmd_subscribe(self, args):
+        for channel in args:
+            channel = channel.decode()
+            self.channels.add(channel)
+            self.server.state.subscribe(channel, self)
+            self.send(b"*3\r\n" + _bulk(b"subscribe") + _bulk(channel.encode()) + _int(len(self.channels)))
+
+    def cmd_unsubscribe(self, args):
+        channels = [a.decode() for a in args] or list(self.channels)
+        for channel in channels:
+            self.channels.discard(channel)
+            self.server.state.unsubscribe(channel, self)
+            self.send(b"*3\r\n" + _bulk(b"unsubscribe") + _bulk(channel.encode()) + _int(len(self.channels)))
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+
+def _int(value: int) -> bytes:
+    return b":" + str(value).encode() + b"\r\n"
+
+
+class _State:
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.subscribers: Dict[str, Set[_Handler]] = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        with self.lock:
+            entry = self._alive(key)
+            return entry[0] if entry else None
+
+    def set(self, key: bytes, value: bytes, ttl: Optional[float]) -> None:
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, keys: List[bytes]) -> int:
+        with self.lock:
+            return sum(1 for key in keys if self._alive(key) and self.data.pop(key, None))
+
+    def incr(self, key: bytes, amount: int = 1) -> int:
+        with self.lock:
+            entry = self._alive(key)
+            value = int(entry[0]) + amount if entry else amount
+            self.data[key] = (str(value).encode(), entry[1] if entry else None)
+            return value
+
+    def expire(self, key: bytes, seconds: float) -> int:
+        with self.lock:
+            entry = self._alive(key)
+            if entry is None:
+                return 0
+            self.data[key] = (entry[0], time.monotonic() + seconds)
+            return 1
+
+    def flush(self) -> None:
+        with self.lock:
+            self.data.clear()
+
+    def subscribe(self, channel: str, handler: _Handler) -> None:
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(handler)
+
+    def unsubscribe(self, channel: str, handler: _Handler) -> None:
+        with self.lock:
+            self.subscribers.get(channel, set()).discard(handler)
+
+    def unsubscribe_all(self, handler: _Handler) -> None:
+        with self.lock:
+            for handlers in self.subscribers.values():
+                handlers.discard(handler)
+
+    def publish(self, channel: str, message: bytes) -> int:
+        with self.lock:
+            handlers = list(self.subscribers.get(channel, ()))
+        payload = b"*3\r\n" + _bulk(b"message") + _bulk(channel.encode()) + _bulk(message)
+        delivered = 0
+        for handler in handlers:
+            try:
+                handler.send(payload)
+                delivered += 1
+            except OSError:
+                pass
+        return delivered
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.state = _State()
+
+
+class FakeRedisServer:
+    """在后台线程中运行的内存版 Redis 协议服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _Server((host, port))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self) -> "FakeRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
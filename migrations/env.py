@@ -0,0 +1,60 @@
+"""
+Alembic 迁移环境
+
+数据库连接取自 app.core.config（与应用一致），alembic.ini 中的 sqlalchemy.url 会被覆盖。
+"""
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.session import Base, get_mysql_uri  # noqa: E402
+# 导入全部模型，使其注册到 Base.metadata
+from app.models import user  # noqa: E402,F401
+from app.models.ai import api_key, chat_conversation, chat_message, chat_role, chat_summary, model, token_usage  # noqa: E402,F401
+from app.models.system import dict_data, dict_type  # noqa: E402,F401
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# 允许通过 -x url=... 指定其他数据库（例如本地 SQLite）
+config.set_main_option("sqlalchemy.url", context.get_x_argument(as_dictionary=True).get("url", get_mysql_uri()))
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """生成 SQL 脚本而不连接数据库"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """连接数据库执行迁移"""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,60 @@
+"""chat hot query indexes
+
+为 app/crud/ai 中的高频查询补充复合索引，并补上流式回复的 finish_reason 列。
+表结构本身由已有的建表脚本创建，这里是迁移链的起点。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表名, 列) —— 与模型 __table_args__ 中的声明保持一致
+INDEXES = [
+    # get_page 按对话分页
+    ("idx_chat_message_conversation", "ai_chat_message", ["conversation_id", "user_id", "deleted", "id"]),
+    # get_page 按用户分页
+    ("idx_chat_message_user", "ai_chat_message", ["user_id", "deleted", "id"]),
+    # get_context_messages / get_latest_message / get_by_conversation_id / 按对话统计消息数
+    ("idx_chat_message_conversation_time", "ai_chat_message", ["conversation_id", "deleted", "create_time"]),
+    # get_page 对话列表
+    ("idx_chat_conversation_user", "ai_chat_conversation", ["user_id", "deleted", "pinned", "id"]),
+    # get_by_user_id / get_pinned_by_user_id
+    ("idx_chat_conversation_user_time", "ai_chat_conversation", ["user_id", "deleted", "pinned", "create_time"]),
+    # get_by_user_id_and_model
+    ("idx_chat_conversation_user_model", "ai_chat_conversation", ["user_id", "model_id", "deleted", "create_time"]),
+    # get_page / get_multi_by_status
+    ("idx_api_key_user", "ai_api_key", ["user_id", "deleted"]),
+    # get_page / get_multi_by_type_and_status
+    ("idx_model_user", "ai_model", ["user_id", "deleted", "sort"]),
+    # get_page / get_public_roles / get_by_category / get_by_model_id / get_default_roles
+    ("idx_chat_role_sort", "ai_chat_role", ["deleted", "sort"]),
+    # get_by_user_id
+    ("idx_chat_role_user", "ai_chat_role", ["user_id", "deleted", "sort"]),
+]
+
+
+def upgrade() -> None:
+    op.add_column(
+        "ai_chat_message",
+        sa.Column("finish_reason", sa.String(16), nullable=True, comment="结束原因（stop 正常结束，truncated 客户端断开后截断）"),
+    )
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_column("ai_chat_message", "finish_reason")
@@ -0,0 +1,55 @@
+"""chat token usage
+
+AI回复消息记录 token 用量与耗时，并新增按用户/模型/日期汇总的用量表。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MESSAGE_COLUMNS = [
+    sa.Column("prompt_tokens", sa.Integer(), nullable=True, comment="输入 token 数"),
+    sa.Column("completion_tokens", sa.Integer(), nullable=True, comment="输出 token 数"),
+    sa.Column("latency_ms", sa.Integer(), nullable=True, comment="生成总耗时（毫秒）"),
+    sa.Column("first_token_ms", sa.Integer(), nullable=True, comment="首字耗时（毫秒）"),
+]
+
+
+def upgrade() -> None:
+    for column in MESSAGE_COLUMNS:
+        op.add_column("ai_chat_message", column)
+
+    op.create_table(
+        "ai_chat_token_usage",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True, comment="编号"),
+        sa.Column("user_id", sa.BigInteger(), nullable=False, comment="用户编号"),
+        sa.Column("model_id", sa.BigInteger(), nullable=False, comment="模型编号"),
+        sa.Column("stat_date", sa.Date(), nullable=False, comment="统计日期"),
+        sa.Column("request_count", sa.Integer(), nullable=False, server_default="0", comment="调用次数"),
+        sa.Column("prompt_tokens", sa.BigInteger(), nullable=False, server_default="0", comment="输入 token 数"),
+        sa.Column("completion_tokens", sa.BigInteger(), nullable=False, server_default="0", comment="输出 token 数"),
+        sa.Column("total_latency_ms", sa.BigInteger(), nullable=False, server_default="0", comment="生成总耗时（毫秒）"),
+        sa.Column("create_time", sa.DateTime(), nullable=False, server_default=sa.func.now(), comment="创建时间"),
+        sa.Column("update_time", sa.DateTime(), nullable=False, server_default=sa.func.now(), comment="更新时间"),
+        sa.UniqueConstraint("user_id", "model_id", "stat_date", name="uk_chat_token_usage_user_model_date"),
+    )
+    op.create_index("idx_chat_token_usage_model_date", "ai_chat_token_usage", ["model_id", "stat_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_chat_token_usage_model_date", table_name="ai_chat_token_usage")
+    op.drop_table("ai_chat_token_usage")
+    for column in reversed(MESSAGE_COLUMNS):
+        op.drop_column("ai_chat_message", column.name)
@@ -0,0 +1,47 @@
+"""chat summary memory
+
+对话与角色新增摘要记忆开关，并新增保存对话滚动摘要的表。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SUMMARY_MEMORY_TABLES = ["ai_chat_conversation", "ai_chat_role"]
+
+
+def upgrade() -> None:
+    for table in SUMMARY_MEMORY_TABLES:
+        op.add_column(table, sa.Column(
+            "summary_memory", sa.Boolean(), nullable=False, server_default=sa.false(), comment="是否开启摘要记忆"
+        ))
+
+    op.create_table(
+        "ai_chat_summary",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True, comment="编号"),
+        sa.Column("conversation_id", sa.BigInteger(), nullable=False, comment="对话编号"),
+        sa.Column("content", sa.Text(), nullable=False, comment="摘要内容"),
+        sa.Column("last_message_id", sa.BigInteger(), nullable=False, comment="已合并进摘要的最后一条消息编号"),
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0", comment="已合并进摘要的消息数量"),
+        sa.Column("create_time", sa.DateTime(), nullable=False, server_default=sa.func.now(), comment="创建时间"),
+        sa.Column("update_time", sa.DateTime(), nullable=False, server_default=sa.func.now(), comment="更新时间"),
+        sa.UniqueConstraint("conversation_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ai_chat_summary")
+    for table in reversed(SUMMARY_MEMORY_TABLES):
+        op.drop_column(table, "summary_memory")
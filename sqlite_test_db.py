@@ -0,0 +1,40 @@
+"""
+测试用的临时 SQLite 库
+
+在临时目录中建表并返回会话工厂，同时把指定模块的 SessionLocal 换成该工厂（后台线程等自行创建会话的代码会用到）；
+退出时恢复各模块原来的 SessionLocal，关闭连接并删除临时目录：
+
+    with temp_sqlite(ChatMessage.__table__, session_modules=[chat_summary_service]) as session_factory:
+        db = session_factory()
+        ...
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+from sqlalchemy import Table, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+
+@contextmanager
+def temp_sqlite(*tables: Table, session_modules: Sequence = ()) -> Iterator[sessionmaker]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'test.db')}",
+                               connect_args={"check_same_thread": False})
+        # SQLite 只有 INTEGER PRIMARY KEY 才会自增；只改这几张表的建表语句，不影响同一进程中的其他测试
+        with engine.begin() as conn:
+            for table in tables:
+                ddl = str(CreateTable(table).compile(engine)).replace("id BIGINT NOT NULL", "id INTEGER NOT NULL", 1)
+                conn.exec_driver_sql(ddl)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        originals = [(module, module.SessionLocal) for module in session_modules]
+        for module in session_modules:
+            module.SessionLocal = session_factory
+        try:
+            yield session_factory
+        finally:
+            for module, session_local in originals:
+                module.SessionLocal = session_local
+            engine.dispose()
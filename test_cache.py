@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试缓存抽象
+
+- 进程内后端：读写、TTL、LRU 淘汰、命名空间版本失效；
+- Redis 后端：连接 fake_redis.py 的内存服务器，用两个 Cache 实例模拟两个 worker，
+  验证数据共享以及失效消息通过发布/订阅广播到另一个实例。
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.cache import Cache, LocalCacheBackend, RedisCacheBackend
+from fake_redis import FakeRedisServer
+
+
+def _wait_for(event: threading.Event, timeout: float = 5.0) -> bool:
+    return event.wait(timeout)
+
+
+def test_local_cache():
+    print("=== 进程内缓存 ===")
+    cache = Cache(LocalCacheBackend(max_size=2), prefix="t", default_ttl=None)
+
+    cache.set("a", b"1")
+    assert cache.get("a") == b"1"
+    cache.set("b", b"2", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("b") is None, "TTL 到期后应读不到"
+
+    cache.set("c", b"3")
+    cache.get("a")
+    cache.set("d", b"4")
+    assert cache.get("c") is None, "最久未使用的键应被淘汰"
+    assert cache.get("a") == b"1"
+    print("✅ 读写 / TTL / LRU")
+
+    ns = cache.namespace("user")
+    events = []
+    ns.on_invalidate(lambda name, key: events.append((name, key)))
+    ns.set_json("1", {"name": "张三"})
+    assert ns.get_json("1") == {"name": "张三"}
+    ns.delete("1")
+    assert ns.get("1") is None
+    ns.set_json("2", {"name": "李四"})
+    ns.invalidate_all()
+    assert ns.get("2") is None, "递增版本号后旧数据不可见"
+    assert events == [("user", "1"), ("user", None)], events
+    print("✅ 命名空间删除 / 版本失效 / 失效回调")
+
+    # 版本号不参与 LRU 淘汰：数据写满后，重新读取的版本号仍是递增后的值
+    backend = LocalCacheBackend(max_size=2)
+    ns = Cache(backend, prefix="t", default_ttl=None).namespace("user")
+    assert ns.invalidate_all() == 1
+    for key in ("2", "3", "4"):
+        ns.set_json(key, {"name": "新"})
+    assert Cache(backend, prefix="t", default_ttl=None).namespace("user").version() == 1
+    print("✅ 版本号不被淘汰")
+
+
+def test_redis_cache():
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        print("⚠️ 未安装 redis 包，跳过 Redis 后端测试")
+        return
+
+    print("=== Redis 后端（内存服务器） ===")
+    with FakeRedisServer() as server:
+        worker_a = Cache(RedisCacheBackend(server.url), prefix="t", default_ttl=60, version_check_interval=60)
+        worker_b = Cache(RedisCacheBackend(server.url), prefix="t", default_ttl=60, version_check_interval=60)
+        try:
+            ns_a = worker_a.namespace("dict")
+            ns_b = worker_b.namespace("dict")
+
+            ns_a.set("sex", b"[1,2]")
+            assert ns_b.get("sex") == b"[1,2]", "两个实例应共享数据"
+            print("✅ 多实例共享")
+
+            deleted = threading.Event()
+            bumped = threading.Event()
+            ns_b.on_invalidate(lambda name, key: (deleted if key else bumped).set())
+
+            ns_a.delete("sex")
+            assert _wait_for(deleted), "删除消息未送达另一个实例"
+            assert ns_b.get("sex") is None
+
+            ns_b.set("status", b"[0,1]")
+            ns_a.invalidate_all()
+            assert _wait_for(bumped), "版本失效消息未送达另一个实例"
+            # version_check_interval 很长，另一个实例能读到新版本只可能来自失效消息
+            assert ns_b.get("status") is None, "另一个实例仍在读取旧版本"
+            print("✅ 发布/订阅失效广播")
+        finally:
+            worker_a.close()
+            worker_b.close()
+
+
+if __name__ == "__main__":
+    test_local_cache()
+    test_redis_cache()
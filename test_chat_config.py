@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+测试对话配置缓存不保存 API 密钥
+
+- 缓存中的模型片段只记录密钥编号，密钥按编号保存在进程内；
+- 配置快照序列化时不带出密钥；
+- API 密钥修改（命名空间整体失效）后重新读取密钥。
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.services.ai.chat_config as chat_config_service
+from app.crud.ai import chat_config_cache
+from app.services.ai.chat_config import ChatConfigService
+
+CONVERSATION = SimpleNamespace(
+    id=101, user_id=1, role_id=None, system_message=None, model_id=201, model="deepseek-chat",
+    temperature=0.7, max_tokens=1024, max_contexts=10, summary_memory=False,
+)
+MODEL = SimpleNamespace(id=201, key_id=301, name="DeepSeek", model="deepseek-chat", platform="deepseek", status=1)
+
+
+def test_api_key_not_cached():
+    print("=== API 密钥不写入缓存 ===")
+    keys = {301: SimpleNamespace(id=301, api_key="sk-第一版", url="https://api.example.com", status=1)}
+    loads = []
+
+    def get_api_key(db, id):
+        loads.append(id)
+        return keys.get(id)
+
+    cruds = (chat_config_service.chat_conversation, chat_config_service.model, chat_config_service.api_key)
+    chat_config_service.chat_conversation.get = lambda db, id: CONVERSATION if id == CONVERSATION.id else None
+    chat_config_service.model.get = lambda db, id: MODEL if id == MODEL.id else None
+    chat_config_service.api_key.get = get_api_key
+    chat_config_cache.invalidate()
+    try:
+        config = ChatConfigService.resolve(None, CONVERSATION.id)
+        assert config.api_key == "sk-第一版" and config.api_url == "https://api.example.com"
+        cached = chat_config_cache.chat_config_cache.get(chat_config_cache.model_key(MODEL.id))
+        assert b"sk-" not in cached and b'"key_id": 301' in cached, cached
+        assert "api_key" not in config.model_dump() and "sk-" not in config.model_dump_json() and "sk-" not in repr(config)
+
+        calls = len(loads)
+        assert ChatConfigService.resolve(None, CONVERSATION.id).api_key == "sk-第一版"
+        assert len(loads) == calls, "密钥在进程内复用，不重复查询"
+
+        keys[301].api_key = "sk-第二版"
+        chat_config_cache.invalidate()
+        assert ChatConfigService.resolve(None, CONVERSATION.id).api_key == "sk-第二版", "密钥修改后应重新读取"
+    finally:
+        # 删除实例上的替身，恢复类上的方法
+        for crud in cruds:
+            del crud.get
+        chat_config_cache.invalidate()
+    print("✅ 缓存只有密钥编号 / 快照不序列化密钥 / 失效后重新读取")
+
+
+if __name__ == "__main__":
+    test_api_key_not_cached()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试按 token 预算组装上下文
+
+- 从最新的消息往前填充，遇到放不下的消息即停止；
+- 消息的 token 数按消息编号缓存，内容变化（流式回复写完）后重新计算；
+- 上下文窗口按模型标识的最长前缀匹配，预算扣除回复预留、系统提示与当前消息；
+- 分词器在后台加载，加载期间计数不等待，加载完成后改用分词器并丢弃按估算缓存的结果。
+"""
+
+import os
+import sys
+import threading
+import types
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.services.ai.chat_context as chat_context
+from app.crud.ai.context_cache import ContextMessage
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.services.ai.chat_context import (
+    MESSAGE_OVERHEAD_TOKENS, TokenCounter, estimate_tokens, fit_context, get_context_budget, get_context_window,
+)
+
+
+class CountingTokenCounter(TokenCounter):
+    """记录实际分词次数的计数器（使用字符估算，不依赖编码文件）"""
+
+    def __init__(self):
+        super().__init__(encoding_name="", cache_size=100)
+        self.calls = 0
+
+    def count_text(self, text):
+        self.calls += 1
+        return super().count_text(text)
+
+
+def _messages(*contents):
+    return [ContextMessage(index + 1, "user" if index % 2 == 0 else "assistant", content)
+            for index, content in enumerate(contents)]
+
+
+def test_estimate_tokens():
+    print("=== token 估算 ===")
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("你好，世界") == 5
+    assert estimate_tokens("你好 hello") == 2 + 2
+    print("✅ 中日韩字符 / 其他字符")
+
+
+def test_fit_context():
+    print("=== 按预算选取 ===")
+    original = chat_context.token_counter
+    counter = chat_context.token_counter = CountingTokenCounter()
+    try:
+        # 每条消息 = 内容 token + 格式开销
+        messages = _messages("a" * 400, "b" * 8, "c" * 8, "d" * 8)
+        small = 2 + MESSAGE_OVERHEAD_TOKENS
+        selected, used = fit_context(messages, token_budget=small * 3)
+        assert [msg.id for msg in selected] == [2, 3, 4] and used == small * 3
+        assert counter.calls == 4, "遇到放不下的消息前应逐条计数"
+
+        selected, _ = fit_context(messages, token_budget=small * 3 + 10_000)
+        assert [msg.id for msg in selected] == [1, 2, 3, 4]
+        assert counter.calls == 4, "再次组装时不应重新计算已缓存的消息"
+
+        messages[3] = ContextMessage(4, "assistant", "d" * 40)
+        longer = 10 + MESSAGE_OVERHEAD_TOKENS
+        selected, used = fit_context(messages, token_budget=longer + small + 1)
+        assert [msg.id for msg in selected] == [3, 4] and used == longer + small
+        assert counter.calls == 5, "内容变化的消息应重新计算"
+
+        selected, used = fit_context(messages, token_budget=0)
+        assert selected == [] and used == 0
+    finally:
+        chat_context.token_counter = original
+    print("✅ 最新优先 / 连续历史 / 按消息编号缓存")
+
+
+def test_context_budget():
+    print("=== 上下文窗口与预算 ===")
+    assert get_context_window("glm-4-flash") == 128000
+    assert get_context_window("gpt-4o-mini") == 128000, "应使用最长的前缀"
+    assert get_context_window("gpt-4-0613") == 8192
+    assert get_context_window("unknown-model") == chat_context.settings.MODEL_CONTEXT_WINDOW_DEFAULT
+    assert get_context_window(None) == chat_context.settings.MODEL_CONTEXT_WINDOW_DEFAULT
+
+    original = chat_context.token_counter
+    chat_context.token_counter = CountingTokenCounter()
+    try:
+        config = EffectiveChatConfig(conversation_id=1, user_id=1, model_id=1, model="gpt-4", llm_model="gpt-4",
+                                     max_tokens=2000)
+        fixed = 2 + 1 + 2 * MESSAGE_OVERHEAD_TOKENS + chat_context.REPLY_PRIMING_TOKENS
+        assert get_context_budget(config, "abcdefgh", "你") == 8192 - 2000 - fixed
+        config.max_tokens = None
+        assert get_context_budget(config, "abcdefgh", "你") == \
+            8192 - chat_context.settings.CHAT_CONTEXT_REPLY_RESERVE - fixed
+        assert get_context_budget(config, "你" * 10000, "") == 0
+    finally:
+        chat_context.token_counter = original
+    print("✅ 前缀匹配 / 回复预留 / 预算不为负")
+
+
+def test_background_tokenizer_load():
+    print("=== 后台加载分词器 ===")
+    release = threading.Event()
+
+    class FakeEncoding:
+        def encode(self, text, disallowed_special=()):
+            return list(text)
+
+    def get_encoding(name):
+        release.wait(5)
+        return FakeEncoding()
+
+    original = sys.modules.get("tiktoken")
+    sys.modules["tiktoken"] = types.SimpleNamespace(get_encoding=get_encoding)
+    try:
+        counter = TokenCounter(encoding_name="fake", cache_size=10)
+        message = ContextMessage(1, "user", "abcdefgh")
+        assert not counter.load(timeout=0.01), "超时后应返回，加载在后台继续"
+        assert counter.count_message(message) == 2 + MESSAGE_OVERHEAD_TOKENS, "加载完成前按字符数估算，不等待"
+        release.set()
+        assert counter.load(timeout=5)
+        assert counter.count_message(message) == 8 + MESSAGE_OVERHEAD_TOKENS, "加载完成后按估算缓存的结果作废"
+    finally:
+        release.set()
+        if original is None:
+            sys.modules.pop("tiktoken", None)
+        else:
+            sys.modules["tiktoken"] = original
+    print("✅ 加载超时不阻塞 / 加载完成后改用分词器")
+
+
+if __name__ == "__main__":
+    test_estimate_tokens()
+    test_fit_context()
+    test_context_budget()
+    test_background_tokenizer_load()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+验证聊天相关高频查询命中复合索引
+
+在临时 SQLite 库上按迁移前的状态建表（不含索引与迁移新增的列、表），执行 migrations 中的 Alembic 迁移，
+再对 app/crud/ai 中各查询实际发出的 SQL 执行 EXPLAIN QUERY PLAN，检查是否走了预期的索引。
+"""
+
+import os
+import sys
+import tempfile
+from argparse import Namespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from app.db.session import Base
+from app.models import user  # noqa: F401
+from app.models.ai import api_key as api_key_model, chat_conversation as chat_conversation_model  # noqa: F401
+from app.models.ai import chat_message as chat_message_model, chat_role as chat_role_model, model as model_model  # noqa: F401
+from app.models.system import dict_data as dict_data_model, dict_type as dict_type_model  # noqa: F401
+from app.crud.ai.api_key import api_key
+from app.crud.ai.chat_conversation import chat_conversation
+from app.crud.ai.chat_message import chat_message
+from app.crud.ai.chat_role import chat_role
+from app.crud.ai.model import model
+from app.schemas.ai.api_key import ApiKeyPageReq
+from app.schemas.ai.chat_conversation import ChatConversationPageReq
+from app.schemas.ai.chat_message import ChatMessagePageReq
+from app.schemas.ai.chat_role import ChatRolePageReq
+from app.schemas.ai.model import ModelPageReq
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (说明, 调用, 目标表, 预期索引)
+CASES = [
+    ("上下文消息", lambda db: chat_message.get_context_messages(db, conversation_id=1, max_contexts=10),
+     "ai_chat_message", "idx_chat_message_conversation_time"),
+    ("最新消息", lambda db: chat_message.get_latest_message(db, conversation_id=1),
+     "ai_chat_message", "idx_chat_message_conversation_time"),
+    ("对话消息数", lambda db: chat_message.get_message_count_by_conversation_ids(db, [1, 2, 3]),
+     "ai_chat_message", "idx_chat_message_conversation"),
+    ("消息分页（按对话）", lambda db: chat_message.get_page(db, page=ChatMessagePageReq(conversation_id=1), user_id=1),
+     "ai_chat_message", "idx_chat_message_conversation"),
+    ("消息分页（按用户）", lambda db: chat_message.get_page(db, page=ChatMessagePageReq(cursor=""), user_id=1),
+     "ai_chat_message", "idx_chat_message_user"),
+    ("对话分页", lambda db: chat_conversation.get_page(db, page=ChatConversationPageReq(cursor=""), user_id=1),
+     "ai_chat_conversation", "idx_chat_conversation_user"),
+    ("用户对话列表", lambda db: chat_conversation.get_by_user_id(db, user_id=1),
+     "ai_chat_conversation", "idx_chat_conversation_user_time"),
+    ("按模型的对话列表", lambda db: chat_conversation.get_by_user_id_and_model(db, user_id=1, model_id=1),
+     "ai_chat_conversation", "idx_chat_conversation_user_model"),
+    ("API 密钥分页", lambda db: api_key.get_page(db, page=ApiKeyPageReq(), user_id=1),
+     "ai_api_key", "idx_api_key_user"),
+    ("模型分页", lambda db: model.get_page(db, page=ModelPageReq(), user_id=1),
+     "ai_model", "idx_model_user"),
+    ("角色分页", lambda db: chat_role.get_page(db, page=ChatRolePageReq()),
+     "ai_chat_role", "idx_chat_role_sort"),
+    ("用户角色列表", lambda db: chat_role.get_by_user_id(db, user_id=1),
+     "ai_chat_role", "idx_chat_role_user"),
+]
+
+
+# 由迁移新增的表与列
+MIGRATION_TABLES = {"ai_chat_token_usage", "ai_chat_summary"}
+MIGRATION_COLUMNS = [
+    ("ai_chat_message", "finish_reason"),
+    ("ai_chat_message", "prompt_tokens"),
+    ("ai_chat_message", "completion_tokens"),
+    ("ai_chat_message", "latency_ms"),
+    ("ai_chat_message", "first_token_ms"),
+    ("ai_chat_conversation", "summary_memory"),
+    ("ai_chat_role", "summary_memory"),
+]
+
+
+def _create_tables_without_indexes(engine):
+    """按迁移前的状态建表：不建索引，也没有迁移新增的表与列"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in MIGRATION_TABLES:
+                conn.execute(CreateTable(table))
+        for table, column in MIGRATION_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+
+def _upgrade(url):
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    config.cmd_opts = Namespace(x=[f"url={url}"])
+    command.upgrade(config, "head")
+
+
+def _capture_statements(engine, db, call):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def _query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _check_indexes(tmpdir):
+    url = f"sqlite:///{os.path.join(tmpdir, 'index_check.db')}"
+    engine = create_engine(url)
+    _create_tables_without_indexes(engine)
+
+    print("=== 执行迁移 ===")
+    _upgrade(url)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        print("=== 检查查询计划 ===")
+        for label, call, table, index_name in CASES:
+            plans = [
+                _query_plan(engine, statement, parameters)
+                for statement, parameters in _capture_statements(engine, db, call)
+            ]
+            details = [detail for plan in plans for detail in plan]
+            full_scans = [detail for detail in details if detail.startswith(f"SCAN {table}") and "INDEX" not in detail]
+            used = any(f"INDEX {index_name} (" in detail for detail in details)
+            print(f"{'✅' if used and not full_scans else '❌'} {label}: {'; '.join(details)}")
+            assert used, f"{label} 未使用索引 {index_name}: {details}"
+            assert not full_scans, f"{label} 存在全表扫描: {full_scans}"
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_chat_indexes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _check_indexes(tmpdir)
+
+
+if __name__ == "__main__":
+    test_chat_indexes()
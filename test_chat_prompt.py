@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+测试系统提示的渲染
+
+- 相同配置的系统提示只渲染一次；
+- 开启摘要记忆时摘要追加在系统提示末尾。
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.services.ai.chat import ChatService
+
+
+def test_system_prompt_render():
+    print("=== 系统提示 ===")
+    config = EffectiveChatConfig(conversation_id=1, user_id=1, model_id=1, model="glm-4", model_name="GLM",
+                                 llm_model="glm-4", platform="zhipu")
+    first = ChatService._build_system_prompt(config, "你是老师。")
+    assert first is ChatService._build_system_prompt(config, "你是老师。"), "相同配置的系统提示只渲染一次"
+    assert first.startswith("你是一个名为 GLM (glm-4) 的AI助手") and "你是老师。" in first
+    with_summary = ChatService._build_system_prompt(config, "你是老师。", summary="用户在备考")
+    assert with_summary.startswith(first) and with_summary.endswith("用户在备考")
+    print("✅ 渲染结果复用 / 摘要追加在末尾")
+
+
+if __name__ == "__main__":
+    test_system_prompt_render()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+测试对话摘要记忆
+
+在临时 SQLite 库上：
+- 最近的消息保留原文，其之外每积累一批消息合并一次，摘要在已有摘要的基础上增量更新；
+- 摘要按 last_message_id 乐观并发写入，过期的合并结果被丢弃；
+- 开启摘要记忆后，提示词为 系统提示（含摘要） + 摘要之后的全部消息（只受 token 预算限制）。
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage
+
+import app.services.ai.chat_summary as chat_summary_service
+from app.crud.ai.chat_summary import chat_summary
+from app.crud.ai.context_cache import context_cache
+from app.engine.model import ModelFactory
+from app.models import user  # noqa: F401
+from app.models.ai import api_key as api_key_model, chat_conversation as chat_conversation_model  # noqa: F401
+from app.models.ai import chat_role as chat_role_model, model as model_model  # noqa: F401
+from app.models.ai.chat_message import ChatMessage
+from app.models.ai.chat_summary import ChatSummary
+from app.schemas.ai.chat_config import EffectiveChatConfig
+from app.services.ai.chat import ChatService
+from app.services.ai.chat_summary import ChatSummarizer
+from app.services.ai.token_usage import TokenUsageWriter
+from sqlite_test_db import temp_sqlite
+
+CONVERSATION_ID = 1
+
+
+class FakeSummaryModel:
+    """把收到的提示词记下来，依次返回 摘要#1、摘要#2 ..."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content=f" 摘要#{len(self.prompts)} ", usage_metadata={
+            "input_tokens": 100, "output_tokens": 20, "total_tokens": 120,
+        })
+
+
+@contextmanager
+def _temp_db(message_count):
+    with temp_sqlite(ChatMessage.__table__, ChatSummary.__table__,
+                     session_modules=[chat_summary_service]) as session_factory:
+        db = session_factory()
+        for i in range(message_count):
+            db.add(ChatMessage(
+                conversation_id=CONVERSATION_ID, user_id=1, type="user" if i % 2 == 0 else "assistant",
+                model="deepseek-chat", model_id=1, content=f"消息{i + 1}", use_context=True, deleted=False,
+            ))
+        db.commit()
+        db.close()
+        context_cache.invalidate(CONVERSATION_ID)
+        try:
+            yield session_factory
+        finally:
+            context_cache.invalidate(CONVERSATION_ID)
+
+
+def _config(**kwargs):
+    return EffectiveChatConfig(conversation_id=CONVERSATION_ID, user_id=1, model_id=1, model="deepseek-chat",
+                               llm_model="deepseek-chat", platform="deepseek", summary_memory=True, **kwargs)
+
+
+def test_incremental_summary():
+    print("=== 增量合并 ===")
+    with _temp_db(message_count=25) as session_factory:
+        fake = FakeSummaryModel()
+        # 取类字典中的 classmethod 本身，恢复后与原来完全一致
+        original = ModelFactory.__dict__["create_model_from_config"], chat_summary_service.token_usage_writer
+        writer = TokenUsageWriter(flush_interval=3600, max_queue_size=100)
+        ModelFactory.create_model_from_config = staticmethod(lambda config, **kwargs: fake)
+        chat_summary_service.token_usage_writer = writer
+        try:
+            summarizer = ChatSummarizer(recent_messages=5, batch_messages=10, max_queue_size=10)
+            assert summarizer.summarize(_config()) == 2, "最近 5 条之外的 20 条消息应分两批合并"
+            assert "（无）" in fake.prompts[0] and "消息1" in fake.prompts[0] and "消息10" in fake.prompts[0]
+            assert "摘要#1" in fake.prompts[1] and "消息11" in fake.prompts[1] and "消息10\n" not in fake.prompts[1], \
+                "第二批只应包含已有摘要与新增的消息"
+
+            db = session_factory()
+            summary = chat_summary.get_by_conversation_id(db, conversation_id=CONVERSATION_ID)
+            assert (summary.content, summary.last_message_id, summary.message_count) == ("摘要#2", 20, 20)
+            assert summarizer.summarize(_config()) == 0, "未积累满一批时不合并"
+            assert writer.pending_tokens(1) == 240, "摘要消耗的 token 计入用户用量"
+
+            assert not chat_summary.save_summary(db, conversation_id=CONVERSATION_ID, content="过期", last_message_id=30,
+                                                 folded=10, expected_last_message_id=10)
+            assert not chat_summary.save_summary(db, conversation_id=CONVERSATION_ID, content="重复", last_message_id=30,
+                                                 folded=10, expected_last_message_id=None)
+            db.expire_all()
+            assert chat_summary.get_by_conversation_id(db, conversation_id=CONVERSATION_ID).content == "摘要#2"
+            db.close()
+        finally:
+            ModelFactory.create_model_from_config, chat_summary_service.token_usage_writer = original
+    print("✅ 分批合并 / 基于已有摘要 / 乐观并发")
+
+
+def test_prompt_with_summary():
+    print("=== 摘要 + 最近消息 ===")
+    with _temp_db(message_count=25) as session_factory:
+        db = session_factory()
+        chat_summary.save_summary(db, conversation_id=CONVERSATION_ID, content="用户在准备考试", last_message_id=20,
+                                  folded=20, expected_last_message_id=None)
+        original = ModelFactory.__dict__["create_model_from_config"]
+        ModelFactory.create_model_from_config = staticmethod(lambda config, **kwargs: object())
+        try:
+            _, messages = ChatService._prepare_llm_call(db, _config(max_contexts=10), "你好", exclude_message_id=25)
+            assert "用户在准备考试" in messages[0].content
+            assert [message.content for message in messages[1:]] == ["消息21", "消息22", "消息23", "消息24", "你好"]
+
+            _, messages = ChatService._prepare_llm_call(db, _config(max_contexts=3).model_copy(update={"summary_memory": False}),
+                                                        "你好", exclude_message_id=25)
+            assert "用户在准备考试" not in messages[0].content
+            assert [message.content for message in messages[1:]] == ["消息22", "消息23", "消息24", "你好"]
+        finally:
+            ModelFactory.create_model_from_config = original
+            db.close()
+    print("✅ 系统提示含摘要 / 只保留摘要之后的消息 / 未开启时不读取摘要")
+
+
+def test_prompt_keeps_unsummarized_messages():
+    print("=== 摘要之外的消息全部发送 ===")
+    # 摘要只合并到消息 10，合并器落后两批以上：11～51 共 41 条未合并，超过一页（最近 + 两批 = 30 条）
+    with _temp_db(message_count=51) as session_factory:
+        db = session_factory()
+        chat_summary.save_summary(db, conversation_id=CONVERSATION_ID, content="用户在准备考试", last_message_id=10,
+                                  folded=10, expected_last_message_id=None)
+        original = ModelFactory.__dict__["create_model_from_config"]
+        ModelFactory.create_model_from_config = staticmethod(lambda config, **kwargs: object())
+        try:
+            _, messages = ChatService._prepare_llm_call(db, _config(max_contexts=10), "你好", exclude_message_id=51)
+            assert [message.content for message in messages[1:-1]] == [f"消息{i}" for i in range(11, 51)], \
+                "摘要之后的消息不受 max_contexts 与页大小限制，不应有既未合并也未发送的消息"
+
+            # 已有的长对话刚开启摘要记忆、尚未生成摘要时同样发送全部消息
+            db.query(ChatSummary).delete()
+            db.commit()
+            _, messages = ChatService._prepare_llm_call(db, _config(max_contexts=10), "你好", exclude_message_id=51)
+            assert "用户在准备考试" not in messages[0].content
+            assert [message.content for message in messages[1:-1]] == [f"消息{i}" for i in range(1, 51)]
+
+            # token 预算不足时从最新的消息往前保留，读满预算即停止翻页
+            rows = ChatService._build_context_messages(db, CONVERSATION_ID, 10, exclude_message_id=51,
+                                                       token_budget=20, summary_memory=True)
+            assert rows and rows[-1].content == "消息50" and len(rows) < 30
+        finally:
+            ModelFactory.create_model_from_config = original
+            db.close()
+    print("✅ 摘要之后的消息跨页读取，只受 token 预算限制")
+
+
+if __name__ == "__main__":
+    test_incremental_summary()
+    test_prompt_with_summary()
+    test_prompt_keeps_unsummarized_messages()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+测试指标统计
+
+- Histogram / Gauge 的取值与 Prometheus 文本输出；
+- MetricsMiddleware 按路由模板统计请求耗时；
+- instrument_engine 统计语句耗时与连接获取等待时间（SQLite 临时文件）。
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import (
+    DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_WAIT, DB_QUERY_DURATION, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT,
+    MetricsRegistry,
+)
+from app.core.middleware import MetricsMiddleware
+from app.db.instrumentation import InstrumentedQueuePool, instrument_engine
+
+
+def test_histogram_and_gauge():
+    print("=== Histogram / Gauge ===")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("t_seconds", "test", ["op"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, op="a")
+    histogram.observe(0.1, op="a")
+    histogram.observe(5, op="a")
+    assert histogram.get_count(op="a") == 3
+    assert abs(histogram.get_sum(op="a") - 5.15) < 1e-9
+
+    gauge = registry.gauge("t_gauge", "test")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.get() == 1
+
+    output = registry.render()
+    assert "# TYPE t_seconds histogram" in output
+    assert 't_seconds_bucket{op="a",le="0.1"} 2' in output, "边界值应计入该桶"
+    assert 't_seconds_bucket{op="a",le="1.0"} 2' in output
+    assert 't_seconds_bucket{op="a",le="+Inf"} 3' in output
+    assert 't_seconds_count{op="a"} 3' in output
+    assert "t_gauge 1" in output
+
+    gauge.set_function(lambda: 7)
+    assert "t_gauge 7" in registry.render()
+    print("✅ 分桶累积 / 求和 / 计数 / 回调取值")
+
+
+def test_middleware_route_labels():
+    print("=== HTTP 请求指标 ===")
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = HTTP_REQUEST_DURATION.get_count(method="GET", route="/items/{item_id}", status="200")
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    assert HTTP_REQUEST_DURATION.get_count(method="GET", route="/items/{item_id}", status="200") == before + 2, \
+        "应按路由模板而不是实际路径统计"
+    assert HTTP_REQUEST_DURATION.get_count(method="GET", route="unmatched", status="404") >= 1
+    assert HTTP_REQUESTS_IN_FLIGHT.get() == 0
+    print("✅ 路由模板标签 / 未匹配路由 / 进行中请求数")
+
+
+def test_engine_instrumentation():
+    print("=== 数据库指标 ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'metrics.db')}", poolclass=InstrumentedQueuePool)
+        # 只注册语句监听，不把进程唯一的连接池指标绑定到这个临时 engine
+        pool_function = DB_POOL_CHECKED_OUT._function
+        instrument_engine(engine)
+
+        checkouts = DB_POOL_CHECKOUT_WAIT.get_count()
+        selects = DB_QUERY_DURATION.get_count(operation="SELECT")
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("  select 2"))
+        finally:
+            engine.dispose()
+    assert DB_QUERY_DURATION.get_count(operation="SELECT") == selects + 2
+    assert DB_POOL_CHECKOUT_WAIT.get_count() == checkouts + 1
+    assert DB_POOL_CHECKED_OUT._function is pool_function, "测试 engine 不应替换连接池借出连接数的取值函数"
+    print("✅ 语句耗时 / 连接获取等待")
+
+
+if __name__ == "__main__":
+    test_histogram_and_gauge()
+    test_middleware_route_labels()
+    test_engine_instrumentation()
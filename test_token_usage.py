@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试 token 用量汇总与配额
+
+在临时 SQLite 库上：
+- TokenUsageWriter 合并同一用户/模型/日期的用量，多次写入在汇总行上累加；
+- TokenQuotaService 计入尚未写入的用量，达到配额时返回 429，按用户覆盖的配额优先。
+"""
+
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+
+import app.services.ai.token_usage as token_usage_service
+from app.core.config import settings
+from app.crud.ai.token_usage import chat_token_usage
+from app.models.ai.token_usage import ChatTokenUsage
+from app.schemas.ai.token_usage import TokenUsage
+from app.services.ai.token_usage import TokenQuotaService, TokenUsageWriter
+from sqlite_test_db import temp_sqlite
+
+
+def _temp_db():
+    return temp_sqlite(ChatTokenUsage.__table__, session_modules=[token_usage_service])
+
+
+def test_writer_rollup():
+    print("=== 用量汇总 ===")
+    with _temp_db() as session_factory:
+        writer = TokenUsageWriter(flush_interval=60, max_queue_size=100)
+        writer.submit(1, 10, TokenUsage(prompt_tokens=100, completion_tokens=20, latency_ms=500))
+        writer.submit(1, 10, TokenUsage(prompt_tokens=50, completion_tokens=5, latency_ms=300))
+        writer.submit(2, 10, TokenUsage(completion_tokens=7))
+        assert writer.pending_tokens(1) == 175
+        assert writer.flush() == 2, "同一用户/模型/日期应合并为一行"
+        assert writer.pending_tokens(1) == 0
+
+        writer.submit(1, 10, TokenUsage(prompt_tokens=1, completion_tokens=1, latency_ms=10))
+        writer.flush()
+        writer.stop()
+
+        db = session_factory()
+        row = db.query(ChatTokenUsage).filter_by(user_id=1, model_id=10).one()
+        assert (row.request_count, row.prompt_tokens, row.completion_tokens, row.total_latency_ms) == (3, 151, 26, 810)
+        assert chat_token_usage.get_user_tokens(db, user_id=2, stat_date=date.today()) == 7
+        assert chat_token_usage.get_user_tokens(db, user_id=3, stat_date=date.today()) == 0
+        db.close()
+    print("✅ 合并 / 累加 / 未写入用量计数")
+
+
+def test_quota():
+    print("=== 配额 ===")
+    with _temp_db() as session_factory:
+        db = session_factory()
+        chat_token_usage.add_usages(db, {(1, 10, date.today()): {"request_count": 1, "prompt_tokens": 60, "completion_tokens": 30}})
+
+        original = settings.TOKEN_DAILY_QUOTA, settings.TOKEN_DAILY_QUOTA_OVERRIDES
+        try:
+            settings.TOKEN_DAILY_QUOTA = 0
+            TokenQuotaService.check_quota(db, 1)
+
+            settings.TOKEN_DAILY_QUOTA = 100
+            TokenQuotaService.check_quota(db, 1)
+            token_usage_service.token_usage_writer.submit(1, 10, TokenUsage(completion_tokens=10))
+            try:
+                TokenQuotaService.check_quota(db, 1)
+                raise AssertionError("计入未写入的用量后应超出配额")
+            except HTTPException as e:
+                assert e.status_code == 429
+
+            settings.TOKEN_DAILY_QUOTA_OVERRIDES = {1: 0}
+            TokenQuotaService.check_quota(db, 1)
+        finally:
+            settings.TOKEN_DAILY_QUOTA, settings.TOKEN_DAILY_QUOTA_OVERRIDES = original
+            token_usage_service.token_usage_writer.flush()
+            token_usage_service.token_usage_writer.stop()
+            db.close()
+    print("✅ 不限制 / 未超出 / 超出返回 429 / 按用户覆盖")
+
+
+if __name__ == "__main__":
+    test_writer_rollup()
+    test_quota()
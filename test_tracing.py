@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试请求链路追踪
+
+- span 父子关系：同步代码块、线程池与后台任务中创建的 span 都挂到发起它们的 span 下；
+- 环形缓冲区按耗时返回最慢的请求，超出容量的请求被淘汰；
+- OTLP 文件导出：每行一个 ExportTraceServiceRequest。
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.tracing import OTLPFileExporter, Tracer
+
+
+def test_span_tree():
+    print("=== span 树 ===")
+    tracer = Tracer(enabled=True, buffer_size=10, max_spans=100)
+
+    def load():
+        leaf = tracer.start_span("db SELECT")
+        leaf.end()
+
+    async def handle():
+        with tracer.trace("GET /x") as root:
+            with tracer.span("service", part="a") as span:
+                span.set_attribute("cache", "miss")
+                await run_in_threadpool(load)
+            await asyncio.create_task(asyncio.to_thread(load))
+        return root
+
+    root = asyncio.run(handle())
+    tree = root.trace.to_dict()
+    assert tree["span_count"] == 4
+    service = tree["root"]["children"][0]
+    assert service["name"] == "service" and service["attributes"] == {"part": "a", "cache": "miss"}
+    assert [child["name"] for child in service["children"]] == ["db SELECT"], "线程池中的 span 应挂到当前 span 下"
+    assert [child["name"] for child in tree["root"]["children"]] == ["service", "db SELECT"]
+    assert tracer.start_span("outside") is None, "没有进行中的 trace 时不应创建 span"
+    print("✅ 父子关系 / 线程池与后台任务 / trace 外为空操作")
+
+
+def test_buffer_and_limits():
+    print("=== 环形缓冲区 ===")
+    tracer = Tracer(enabled=True, buffer_size=3, max_spans=2)
+    for delay in (0.0, 0.03, 0.01, 0.02):
+        with tracer.trace(f"req {delay}"):
+            for _ in range(3):
+                span = tracer.start_span("db SELECT")
+                if span is not None:
+                    span.end()
+            time.sleep(delay)
+    names = [trace.root.name for trace in tracer.buffer.slowest(limit=10)]
+    assert names == ["req 0.03", "req 0.02", "req 0.01"], names
+    assert tracer.buffer.slowest(limit=10, min_duration_ms=15)[-1].root.name == "req 0.02"
+    trace = tracer.buffer.slowest(limit=1)[0]
+    assert trace.to_dict()["span_count"] == 2 and trace.dropped == 2, "超出 max_spans 的 span 只计数"
+
+    with_error = Tracer(enabled=True, buffer_size=3, max_spans=10)
+    try:
+        with with_error.trace("boom"):
+            raise ValueError("x")
+    except ValueError:
+        pass
+    assert with_error.buffer.slowest()[0].root.error == "ValueError: x"
+    print("✅ 按耗时排序 / 容量淘汰 / span 数量上限 / 异常记录")
+
+
+def test_otlp_file_exporter():
+    print("=== OTLP 文件导出 ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "traces.jsonl")
+        exporter = OTLPFileExporter(path, "test-service")
+        tracer = Tracer(enabled=True, buffer_size=10, max_spans=100, exporter=exporter)
+        with tracer.trace("GET /a", **{"http.status_code": 200}):
+            with tracer.span("child"):
+                pass
+        exporter.stop()
+
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    assert len(lines) == 1
+    request = json.loads(lines[0])
+    resource = request["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"]["stringValue"] == "test-service"
+    root, child = resource["scopeSpans"][0]["spans"]
+    assert root["name"] == "GET /a" and "parentSpanId" not in root
+    assert root["attributes"] == [{"key": "http.status_code", "value": {"intValue": "200"}}]
+    assert child["parentSpanId"] == root["spanId"] and child["traceId"] == root["traceId"]
+    assert int(root["endTimeUnixNano"]) >= int(child["endTimeUnixNano"])
+    print("✅ OTLP JSON 结构 / 父子关系")
+
+
+if __name__ == "__main__":
+    test_span_tree()
+    test_buffer_and_limits()
+    test_otlp_file_exporter()